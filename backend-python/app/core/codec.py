@@ -0,0 +1,130 @@
+"""
+Payload codecs for AXS360 API
+Values written to Redis start with a version byte naming their codec; values
+without one are the original JSON format and keep decoding
+"""
+
+import json
+import logging
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Optional, Union
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # Optional, JSON falls back to the standard library
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional, only needed for REDIS_CODEC=msgpack
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+def _default(value: Any) -> Any:
+    """Types json.dumps(default=str) used to handle; datetimes stay ISO strings in every codec"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    if hasattr(value, "tolist"):
+        # numpy arrays and scalars, e.g. face encodings
+        return value.tolist()
+    return str(value)
+
+class Codec:
+    """Serializer for one payload format; prefix is the version byte written before the payload"""
+
+    name = ""
+    prefix = b""
+
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+class JsonCodec(Codec):
+    """The original format: plain JSON, no version byte, readable by older workers"""
+
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(value, default=_default, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data) if orjson is not None else json.loads(data)
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+    prefix = b"\x01"
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+    prefix = b"\x02"
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_default, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+_LEGACY = JsonCodec()
+
+# orjson payloads are JSON, so they stay readable through the standard library fallback
+CODECS: Dict[str, Codec] = {"json": _LEGACY, "orjson": OrjsonCodec()}
+if msgpack is not None:
+    CODECS["msgpack"] = MsgpackCodec()
+
+_BY_PREFIX: Dict[int, Codec] = {codec.prefix[0]: codec for codec in CODECS.values() if codec.prefix}
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """Codec by name, the configured REDIS_CODEC by default; missing libraries fall back to JSON"""
+    name = name or settings.REDIS_CODEC
+    codec = CODECS.get(name)
+    if codec is None:
+        logger.warning(f"Codec {name} is not available, writing JSON")
+        return _LEGACY
+    return codec
+
+def encode(value: Any, codec: Optional[Codec] = None) -> bytes:
+    """Serialize a value for Redis, prefixed with the codec's version byte"""
+    codec = codec or default_codec
+    return codec.prefix + codec.dumps(value)
+
+def decode(data: Union[bytes, str, None]) -> Any:
+    """
+    Deserialize a value written by encode() with any codec, or a legacy JSON value
+    Strings come from connections with decode_responses (surrogateescape keeps binary intact).
+    Raises ValueError for anything undecodable
+    """
+    if not data:
+        return None
+    if isinstance(data, str):
+        data = data.encode("utf-8", "surrogateescape")
+
+    codec = _BY_PREFIX.get(data[0])
+    try:
+        if codec is None:
+            return _LEGACY.loads(data)
+        return codec.loads(data[1:])
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Undecodable payload: {e}") from e
+
+def dumps_json(value: Any) -> str:
+    """Plain JSON text, for payloads leaving Redis as-is (pub/sub messages sent to clients)"""
+    return _LEGACY.dumps(value).decode("utf-8")
+
+def loads_json(data: Union[bytes, str]) -> Any:
+    return _LEGACY.loads(data)
+
+# Codec for new writes; keep "json" until every worker runs a release that can read the others
+default_codec = get_codec()
@@ -15,6 +15,16 @@ class Settings(BaseSettings):
     
     # Redis Configuration
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50  # Per worker; pub/sub listeners and stream readers each hold one
+    REDIS_POOL_TIMEOUT: float = 5.0  # seconds to wait for a free connection before failing
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 5.0
+    REDIS_SOCKET_TIMEOUT: Optional[float] = None  # Must stay unset or above any pub/sub idle period
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # seconds a connection may idle before it is checked on reuse
+    REDIS_CODEC: str = "json"  # json, orjson or msgpack for new writes; every codec is always readable
+    
+    # In-process cache tier in front of Redis (per worker)
+    LOCAL_CACHE_MAX_ENTRIES: int = 10000
+    LOCAL_CACHE_TTL: int = 30  # seconds, bounds staleness if an invalidation is missed
     
     # Security
     SECRET_KEY: str = "your-super-secret-jwt-key-256-bits-long-change-in-production"
@@ -22,9 +32,24 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     
+    # Offline-verifiable QR tokens (Ed25519, base64 32 byte seed)
+    QR_SIGNING_PRIVATE_KEY: Optional[str] = None
+    QR_SIGNING_KEY_ID: int = 1
+    QR_OFFLINE_RECONCILE_GRACE_SECONDS: int = 259200  # Offline-verifiable tokens stay reconcilable 3 days past expiry
+    
+    # Bulk QR issuance
+    QR_RENDER_WORKERS: int = 2
+    BULK_QR_MAX_ROWS: int = 10000
+    
+    # Token revocation filter
+    REVOCATION_FILTER_CAPACITY: int = 100000
+    REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    REVOCATION_SYNC_INTERVAL: int = 300  # seconds
+    
     # API Configuration
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "AXS360 API"
+    APP_URL: str = "http://localhost:5173"  # Public web app, used in QR codes and emails
     
     # CORS Origins
     BACKEND_CORS_ORIGINS: List[str] = [
@@ -48,10 +73,29 @@ class Settings(BaseSettings):
     TWILIO_ACCOUNT_SID: str = "your_twilio_account_sid"
     TWILIO_AUTH_TOKEN: str = "your_twilio_auth_token"
     TWILIO_PHONE_NUMBER: str = "+1234567890"
+    TWILIO_API_URL: str = "https://api.twilio.com"
+    TWILIO_RATE_LIMIT_PER_SECOND: float = 1.0  # Match the account/sender throughput
     
     # SendGrid Configuration
     SENDGRID_API_KEY: str = "your_sendgrid_api_key"
     FROM_EMAIL: str = "noreply@axs360.com"
+    SENDGRID_API_URL: str = "https://api.sendgrid.com"
+    SENDGRID_RATE_LIMIT_PER_SECOND: float = 10.0
+    
+    # Provider HTTP timeout (seconds)
+    NOTIFICATION_HTTP_TIMEOUT: float = 10.0
+    
+    # Email templates (Jinja2 bytecode cache, system temp dir if unset)
+    EMAIL_TEMPLATE_CACHE_DIR: Optional[str] = None
+    
+    # Business alert digests
+    ALERT_DIGEST_WINDOW_SECONDS: int = 900
+    ALERT_DIGEST_DAILY_BUDGET: int = 24  # Digest emails per business per day
+    
+    # Realtime gateway (WebSocket/SSE)
+    REALTIME_HEARTBEAT_SECONDS: int = 25
+    REALTIME_QUEUE_SIZE: int = 100  # Pending messages per connection before dropping the oldest
+    REALTIME_MAX_DROPPED: int = 500  # Dropped messages before a slow connection is closed
     
     # File Upload Configuration
     MAX_FILE_SIZE: int = 10485760  # 10MB
@@ -74,6 +118,11 @@ class Settings(BaseSettings):
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
     RATE_LIMIT_PER_HOUR: int = 1000
+    RATE_LIMIT_API_KEY_PER_MINUTE: int = 600  # Registered API keys without limits of their own
+    RATE_LIMIT_API_KEY_PER_HOUR: int = 20000
+    RATE_LIMIT_SYNC_SECONDS: float = 5.0  # Max time a worker admits requests without asking Redis
+    RATE_LIMIT_LOCAL_SHARE: float = 0.2  # Share of the remaining budget a worker may admit locally
+    RATE_LIMIT_LOCAL_MAX_CLIENTS: int = 50000
     
     # Production Security
     SECURE_COOKIES: bool = False
@@ -0,0 +1,370 @@
+"""
+Rate limiting for AXS360 API
+Sliding window counters checked and counted for every window in a single Lua call,
+behind a per-worker token bucket that answers most requests without Redis
+"""
+
+import hashlib
+import json
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.local_cache import LRUCache
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Sliding window counter: each window keeps a counter per fixed bucket, and the
+# previous bucket is weighted by how much of it still overlaps the window.
+# KEYS[2i-1], KEYS[2i] = current and previous bucket of window i
+# ARGV[1] = now (ms), ARGV[2] = cost (0 only reads), ARGV[3] = requests a worker already
+# admitted locally (counted unconditionally), ARGV[2i+2], ARGV[2i+3] = window (ms), limit
+# Returns {allowed, remaining_1, retry_ms_1, reset_ms_1, remaining_2, ...}
+# Rejected requests are not counted, so a client that keeps retrying is not locked out longer
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local served = tonumber(ARGV[3])
+local count = #KEYS / 2
+local state = {}
+local allowed = 1
+
+for i = 1, count do
+    local window = tonumber(ARGV[2 + 2 * i])
+    local limit = tonumber(ARGV[3 + 2 * i])
+    if served > 0 then
+        redis.call('INCRBY', KEYS[2 * i - 1], served)
+        redis.call('PEXPIRE', KEYS[2 * i - 1], window * 2)
+    end
+    local elapsed = now % window
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    local used = previous * (window - elapsed) / window + current
+    if used + cost > limit then
+        allowed = 0
+    end
+    state[i] = {window, limit, elapsed, current, previous, used}
+end
+
+local result = {allowed}
+for i = 1, count do
+    local window, limit, elapsed, current, previous, used = unpack(state[i])
+    if allowed == 1 and cost > 0 then
+        redis.call('INCRBY', KEYS[2 * i - 1], cost)
+        redis.call('PEXPIRE', KEYS[2 * i - 1], window * 2)
+        used = used + cost
+        current = current + cost
+    end
+
+    -- Time until one more request fits: the current bucket has to roll over,
+    -- or the previous bucket's weight has to decay far enough
+    local retry = 0
+    if used + 1 > limit then
+        if current + 1 > limit or previous == 0 then
+            retry = window - elapsed
+        else
+            retry = math.ceil(window - elapsed - (limit - current - 1) * window / previous)
+        end
+    end
+
+    table.insert(result, math.max(0, math.floor(limit - used)))
+    table.insert(result, math.max(0, retry))
+    table.insert(result, window - elapsed)
+end
+return result
+"""
+
+API_KEY_POLICIES_KEY = "rate_limit:api_keys"   # hash of key fingerprint -> JSON limits
+API_KEY_HEADER = "X-API-Key"
+
+class RateLimitPolicy:
+    """Named set of limits, window length in seconds -> requests allowed"""
+
+    def __init__(self, name: str, limits: Dict[int, int]):
+        self.name = name
+        self.limits = dict(sorted(limits.items()))
+
+    def header(self) -> str:
+        """RateLimit-Policy header value, e.g. 60;w=60, 1000;w=3600"""
+        return ", ".join(f"{limit};w={window}" for window, limit in self.limits.items())
+
+class RateLimitResult:
+    """Outcome of one check, with the standard response headers"""
+
+    def __init__(self, policy: RateLimitPolicy, allowed: bool, windows: List[Tuple[int, int, int, int]]):
+        # windows: (window seconds, remaining, retry ms, reset ms)
+        self.policy = policy
+        self.allowed = allowed
+        self.windows = windows
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds until a rejected request can be retried"""
+        return max((math.ceil(retry / 1000) for _, _, retry, _ in self.windows if retry), default=0)
+
+    def headers(self) -> Dict[str, str]:
+        # Report the most constraining window
+        window, remaining, retry, reset = min(self.windows, key=lambda item: (item[1], -item[0]))
+        headers = {
+            "RateLimit-Limit": str(self.policy.limits[window]),
+            "RateLimit-Remaining": str(remaining),
+            "RateLimit-Reset": str(max(1, math.ceil((retry or reset) / 1000))),
+            "RateLimit-Policy": self.policy.header()
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, self.retry_after))
+        return headers
+
+DEFAULT_POLICY = RateLimitPolicy("default", {
+    60: settings.RATE_LIMIT_PER_MINUTE,
+    3600: settings.RATE_LIMIT_PER_HOUR
+})
+
+# Registered API keys without limits of their own
+API_KEY_POLICY = RateLimitPolicy("api_key", {
+    60: settings.RATE_LIMIT_API_KEY_PER_MINUTE,
+    3600: settings.RATE_LIMIT_API_KEY_PER_HOUR
+})
+
+# Per-route policies, first match wins: (method or None, path prefix below API_V1_STR, policy)
+# Matched requests are counted against the route's own limits instead of the default ones
+ROUTE_POLICIES: List[Tuple[Optional[str], str, RateLimitPolicy]] = [
+    ("POST", "/api/access/bulk-generate-qr", RateLimitPolicy("bulk_qr", {60: 5, 3600: 50})),
+    ("POST", "/api/access/recognize-plate", RateLimitPolicy("plate_recognition", {60: 30, 3600: 600})),
+    # Gate devices scan continuously, often from one address
+    ("POST", "/api/access/scan-qr", RateLimitPolicy("qr_scan", {60: 300, 3600: 10000})),
+    ("POST", "/api/access/devices/", RateLimitPolicy("device_sync", {60: 120, 3600: 3000}))
+]
+
+def api_key_fingerprint(api_key: str) -> str:
+    """Keys are never stored or used in Redis key names in the clear"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:32]
+
+class RateLimiter:
+    """Sliding window limiter over Redis, one round trip per check"""
+
+    def __init__(self):
+        self._script = None
+        # fingerprint -> policy, or False for keys that are not registered
+        self._api_keys = LRUCache(maxsize=10000, ttl=60)
+        self.pre_limiter = LocalPreLimiter(
+            self,
+            sync_interval=settings.RATE_LIMIT_SYNC_SECONDS,
+            local_share=settings.RATE_LIMIT_LOCAL_SHARE,
+            max_clients=settings.RATE_LIMIT_LOCAL_MAX_CLIENTS
+        )
+
+    def _get_script(self, client):
+        if self._script is None or self._script.registered_client is not client:
+            self._script = client.register_script(SLIDING_WINDOW_SCRIPT)
+        return self._script
+
+    async def hit(self, scope: str, policy: RateLimitPolicy, cost: int = 1, served: int = 0) -> Optional[RateLimitResult]:
+        """
+        Count a request against every window of the policy, if all of them allow it
+        cost=0 only reports the current state; served requests were already admitted
+        locally and are counted either way. Returns None if Redis is unavailable
+        """
+        now_ms = int(time.time() * 1000)
+        keys = []
+        args = [now_ms, cost, served]
+        for window, limit in policy.limits.items():
+            window_ms = window * 1000
+            bucket = now_ms // window_ms
+            keys.append(f"rate_limit:{scope}:{window}:{bucket}")
+            keys.append(f"rate_limit:{scope}:{window}:{bucket - 1}")
+            args.extend([window_ms, limit])
+
+        try:
+            client = await redis_client.get_client()
+            raw = await self._get_script(client)(keys=keys, args=args)
+        except Exception as e:
+            logger.warning(f"Rate limiting error: {e}")
+            return None
+
+        windows = [
+            (window, int(raw[1 + 3 * index]), int(raw[2 + 3 * index]), int(raw[3 + 3 * index]))
+            for index, window in enumerate(policy.limits)
+        ]
+        return RateLimitResult(policy, bool(raw[0]), windows)
+
+    # Per-API-key policies
+
+    async def _api_key_policy(self, api_key: str) -> Optional[RateLimitPolicy]:
+        fingerprint = api_key_fingerprint(api_key)
+        policy = self._api_keys.get(fingerprint)
+        if policy is not None:
+            return policy or None
+
+        try:
+            client = await redis_client.get_client()
+            stored = await client.hget(API_KEY_POLICIES_KEY, fingerprint)
+        except Exception as e:
+            logger.warning(f"Rate limit policy lookup failed: {e}")
+            return None
+
+        policy = False
+        if stored:
+            try:
+                limits = {int(window): int(limit) for window, limit in json.loads(stored).items()}
+                policy = RateLimitPolicy("api_key", limits) if limits else API_KEY_POLICY
+            except (TypeError, ValueError):
+                policy = API_KEY_POLICY
+        self._api_keys.set(fingerprint, policy)
+        return policy or None
+
+    async def set_api_key_policy(self, api_key: str, per_minute: Optional[int] = None, per_hour: Optional[int] = None):
+        """Register an API key; without limits it gets API_KEY_POLICY"""
+        limits = {}
+        if per_minute is not None:
+            limits[60] = per_minute
+        if per_hour is not None:
+            limits[3600] = per_hour
+        client = await redis_client.get_client()
+        await client.hset(API_KEY_POLICIES_KEY, api_key_fingerprint(api_key), json.dumps(limits))
+        self._api_keys.delete(api_key_fingerprint(api_key))
+
+    async def remove_api_key_policy(self, api_key: str):
+        client = await redis_client.get_client()
+        await client.hdel(API_KEY_POLICIES_KEY, api_key_fingerprint(api_key))
+        self._api_keys.delete(api_key_fingerprint(api_key))
+
+    # Request resolution
+
+    @staticmethod
+    def route_policy(method: str, path: str) -> Optional[RateLimitPolicy]:
+        for route_method, prefix, policy in ROUTE_POLICIES:
+            if (route_method is None or route_method == method) and path.startswith(f"{settings.API_V1_STR}{prefix}"):
+                return policy
+        return None
+
+    async def resolve(self, request: Request) -> Tuple[str, RateLimitPolicy]:
+        """
+        Counter scope and policy for a request: registered API keys are limited per key,
+        everyone else per client address; route policies apply on top of either identity
+        """
+        api_key = request.headers.get(API_KEY_HEADER)
+        key_policy = await self._api_key_policy(api_key) if api_key else None
+
+        if key_policy is not None:
+            identity = f"key:{api_key_fingerprint(api_key)}"
+        else:
+            identity = f"ip:{request.client.host if request.client else 'unknown'}"
+
+        route_policy = self.route_policy(request.method, request.url.path)
+        if route_policy is not None:
+            return f"{identity}:{route_policy.name}", route_policy
+
+        return identity, key_policy or DEFAULT_POLICY
+
+    async def check(self, request: Request) -> Optional[RateLimitResult]:
+        scope, policy = await self.resolve(request)
+        return await self.pre_limiter.check(scope, policy)
+
+    def stats(self) -> Dict[str, int]:
+        return self.pre_limiter.stats()
+
+class _ClientBucket:
+    """Local state for one scope: token bucket plus the last answer from Redis"""
+
+    __slots__ = ("tokens", "refilled_at", "synced_at", "windows", "served", "blocked_until")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.refilled_at = now
+        self.synced_at = 0.0
+        self.windows: List[Tuple[int, int, int, int]] = []
+        self.served = 0           # admitted locally since the last sync
+        self.blocked_until = 0.0
+
+class LocalPreLimiter:
+    """
+    In-process token bucket per scope in front of the Redis limiter.
+    A client far below its limits is admitted locally against a share of the
+    remaining budget from the last sync; the admitted requests are reported in
+    the next sync, which happens every sync_interval seconds or as soon as the
+    share is used up, so near the threshold every request goes to Redis.
+    Clients Redis rejected, or that drain the bucket on this worker alone, are
+    rejected locally without a round trip until their retry time has passed.
+    Global limits can be overshot by at most local_share of the remaining budget
+    per worker and sync interval
+    """
+
+    def __init__(self, limiter: RateLimiter, sync_interval: float, local_share: float, max_clients: int):
+        self.limiter = limiter
+        self.sync_interval = sync_interval
+        self.local_share = local_share
+        self._buckets = LRUCache(maxsize=max_clients)
+        self.local = 0
+        self.synced = 0
+        self.shed = 0
+
+    @staticmethod
+    def _rate(policy: RateLimitPolicy) -> Tuple[float, float]:
+        """Bucket capacity and refill rate per second, from the shortest window"""
+        window, limit = next(iter(policy.limits.items()))
+        return float(limit), limit / window
+
+    def _reject(self, policy: RateLimitPolicy, retry: float) -> RateLimitResult:
+        self.shed += 1
+        retry_ms = max(1, int(retry * 1000))
+        return RateLimitResult(policy, False, [(window, 0, retry_ms, retry_ms) for window in policy.limits])
+
+    def _estimate(self, policy: RateLimitPolicy, bucket: _ClientBucket, now: float) -> RateLimitResult:
+        elapsed_ms = int((now - bucket.synced_at) * 1000)
+        windows = [
+            (window, max(0, remaining - bucket.served), 0, max(0, reset - elapsed_ms))
+            for window, remaining, _, reset in bucket.windows
+        ]
+        return RateLimitResult(policy, True, windows)
+
+    async def check(self, scope: str, policy: RateLimitPolicy) -> Optional[RateLimitResult]:
+        """Same contract as RateLimiter.hit, but only some calls reach Redis"""
+        now = time.monotonic()
+        capacity, rate = self._rate(policy)
+        bucket = self._buckets.get(scope)
+        if bucket is None:
+            bucket = _ClientBucket(capacity, now)
+            self._buckets.set(scope, bucket)
+
+        if now < bucket.blocked_until:
+            return self._reject(policy, bucket.blocked_until - now)
+
+        bucket.tokens = min(capacity, bucket.tokens + (now - bucket.refilled_at) * rate)
+        bucket.refilled_at = now
+        if bucket.tokens < 1:
+            return self._reject(policy, (1 - bucket.tokens) / rate)
+        bucket.tokens -= 1
+
+        if bucket.windows and now - bucket.synced_at < self.sync_interval:
+            budget = min(remaining for _, remaining, _, _ in bucket.windows) * self.local_share
+            if bucket.served + 1 <= budget:
+                bucket.served += 1
+                self.local += 1
+                return self._estimate(policy, bucket, now)
+
+        # Hand the locally admitted count over before awaiting, so concurrent
+        # requests for the same scope do not report it twice
+        served, bucket.served = bucket.served, 0
+        result = await self.limiter.hit(scope, policy, served=served)
+        self.synced += 1
+        if result is None:
+            bucket.windows = []
+            return None
+
+        bucket.windows = result.windows
+        bucket.synced_at = time.monotonic()
+        if not result.allowed:
+            bucket.blocked_until = bucket.synced_at + result.retry_after
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {"clients": len(self._buckets), "local": self.local, "synced": self.synced, "shed": self.shed}
+
+# Global rate limiter
+rate_limiter = RateLimiter()
@@ -0,0 +1,193 @@
+"""
+Realtime fan-out for AXS360 API
+One shared Redis pub/sub connection per worker, fanned out in process to WebSocket/SSE clients
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Optional, Set
+
+from app.core import codec
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+def user_notifications_channel(user_id: str) -> str:
+    return f"user_notifications:{user_id}"
+
+def dashboard_channel(business_id: str) -> str:
+    return f"dashboard_updates:{business_id}"
+
+class Subscriber:
+    """
+    One client connection: a bounded queue filled by the hub, drained by the endpoint.
+    When the client falls behind the oldest message is dropped; after too many drops
+    the connection is marked overflowed so the endpoint can close it and the client
+    reconnects (and resumes from its last notification id)
+    """
+
+    def __init__(self, queue_size: int, max_dropped: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.channels: Set[str] = set()
+        self.max_dropped = max_dropped
+        self.dropped = 0
+        self.overflowed = False
+
+    def offer(self, message: Dict[str, Any]):
+        """Called from the hub reader, never blocks"""
+        if self.overflowed:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            if self.dropped > self.max_dropped:
+                self.overflowed = True
+        self.queue.put_nowait(message)
+
+    async def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next message, or None when nothing arrived within timeout (time for a heartbeat)"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class RealtimeHub:
+    """Reference-counted channel subscriptions over a single pub/sub connection"""
+
+    def __init__(self, queue_size: int, max_dropped: int):
+        self.queue_size = queue_size
+        self.max_dropped = max_dropped
+        self._channels: Dict[str, Set[Subscriber]] = {}
+        self._pubsub = None
+        self._lock = asyncio.Lock()
+        self._connected = asyncio.Event()
+        self.delivered = 0
+        self.dropped = 0
+
+    def create_subscriber(self) -> Subscriber:
+        return Subscriber(self.queue_size, self.max_dropped)
+
+    async def subscribe(self, subscriber: Subscriber, channels: Iterable[str]):
+        """Attach a connection to channels, subscribing in Redis only on first use"""
+        async with self._lock:
+            new_channels = []
+            for channel in channels:
+                subscribers = self._channels.setdefault(channel, set())
+                if not subscribers:
+                    new_channels.append(channel)
+                subscribers.add(subscriber)
+                subscriber.channels.add(channel)
+
+            if new_channels and self._pubsub is not None:
+                await self._pubsub.subscribe(*new_channels)
+
+    async def unsubscribe(self, subscriber: Subscriber):
+        """Detach a connection, dropping Redis subscriptions nobody needs anymore"""
+        async with self._lock:
+            unused = []
+            for channel in subscriber.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._channels[channel]
+                    unused.append(channel)
+            subscriber.channels.clear()
+            self.dropped += subscriber.dropped
+
+            if unused and self._pubsub is not None:
+                try:
+                    await self._pubsub.unsubscribe(*unused)
+                except Exception as e:
+                    logger.warning(f"Realtime unsubscribe failed: {e}")
+
+    def _dispatch(self, channel: str, data: str):
+        subscribers = self._channels.get(channel)
+        if not subscribers:
+            return
+
+        try:
+            payload = codec.loads_json(data)
+        except ValueError:
+            payload = data
+
+        message = {"channel": channel, "data": payload}
+        for subscriber in tuple(subscribers):
+            subscriber.offer(message)
+            self.delivered += 1
+
+    def _broadcast(self, message: Dict[str, Any]):
+        seen = set()
+        for subscribers in self._channels.values():
+            for subscriber in subscribers:
+                if id(subscriber) not in seen:
+                    seen.add(id(subscriber))
+                    subscriber.offer(message)
+
+    async def _listen(self):
+        client = await redis_client.get_client()
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            async with self._lock:
+                if self._channels:
+                    await pubsub.subscribe(*self._channels)
+                self._pubsub = pubsub
+            self._connected.set()
+
+            while True:
+                if not pubsub.subscribed:
+                    await asyncio.sleep(0.5)
+                    continue
+                message = await pubsub.get_message(timeout=1.0)
+                if message and message.get("type") == "message":
+                    channel = message["channel"]
+                    data = message["data"]
+                    self._dispatch(
+                        channel.decode() if isinstance(channel, bytes) else channel,
+                        data.decode() if isinstance(data, bytes) else data
+                    )
+        finally:
+            self._connected.clear()
+            self._pubsub = None
+            await pubsub.close()
+
+    async def run(self):
+        """Background task: read the shared subscription and fan messages out"""
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Messages published while disconnected are lost; tell clients to catch up
+                logger.error(f"Realtime listener error: {e}")
+                self._broadcast({"channel": None, "data": {"type": "resync"}})
+                await asyncio.sleep(1)
+
+    def stats(self) -> Dict[str, int]:
+        connections = {id(s) for subscribers in self._channels.values() for s in subscribers}
+        return {
+            "connected": int(self._connected.is_set()),
+            "channels": len(self._channels),
+            "connections": len(connections),
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
+
+async def publish(channel: str, payload: Any) -> int:
+    """Publish a JSON payload, returns the number of workers listening"""
+    client = await redis_client.get_client()
+    data = payload if isinstance(payload, str) else codec.dumps_json(payload)
+    return await client.publish(channel, data)
+
+async def publish_dashboard_update(update) -> int:
+    """Publish a LiveDashboardUpdate to every worker serving that business"""
+    return await publish(dashboard_channel(update.business_id), update.json())
+
+# Global realtime hub
+realtime_hub = RealtimeHub(
+    queue_size=settings.REALTIME_QUEUE_SIZE,
+    max_dropped=settings.REALTIME_MAX_DROPPED
+)
@@ -4,46 +4,231 @@ Used for caching, sessions, and background tasks
 """
 
 import redis.asyncio as redis
+import asyncio
+import functools
 import json
 import logging
-from typing import Any, Optional, Union
+import math
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Union
 
+from app.core import codec
 from app.core.config import settings
+from app.core.local_cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
+def _serialize(value: Union[str, dict, list]) -> Union[str, bytes]:
+    return codec.encode(value) if isinstance(value, (dict, list)) else value
+
+def _deserialize_json(value: Optional[str]) -> Optional[Any]:
+    try:
+        return codec.decode(value)
+    except (TypeError, ValueError):
+        return None
+
+class RedisBatch:
+    """
+    Commands queued on one pipeline and sent in a single round trip when the
+    `async with redis_client.pipeline()` block exits. Values are serialized like
+    RedisClient.set; results are in .results (in call order) once the block exits
+    """
+    
+    def __init__(self, pipe):
+        self._pipe = pipe
+        self._decoders: List[Optional[Callable[[Any], Any]]] = []
+        self.results: List[Any] = []
+        self.error: Optional[Exception] = None
+    
+    def _queue(self, decoder: Optional[Callable[[Any], Any]] = None):
+        self._decoders.append(decoder)
+        return self
+    
+    def get(self, key: str) -> "RedisBatch":
+        self._pipe.get(key)
+        return self._queue()
+    
+    def get_json(self, key: str) -> "RedisBatch":
+        self._pipe.get(key)
+        return self._queue(_deserialize_json)
+    
+    def set(self, key: str, value: Union[str, dict, list], expire: Optional[int] = None) -> "RedisBatch":
+        self._pipe.set(key, _serialize(value), ex=expire)
+        return self._queue(bool)
+    
+    def setex(self, key: str, time: int, value: Union[str, dict, list]) -> "RedisBatch":
+        self._pipe.setex(key, time, _serialize(value))
+        return self._queue(bool)
+    
+    def delete(self, *keys: str) -> "RedisBatch":
+        self._pipe.delete(*keys)
+        return self._queue()
+    
+    def exists(self, key: str) -> "RedisBatch":
+        self._pipe.exists(key)
+        return self._queue(bool)
+    
+    def incr(self, key: str) -> "RedisBatch":
+        self._pipe.incr(key)
+        return self._queue()
+    
+    def expire(self, key: str, time: int) -> "RedisBatch":
+        self._pipe.expire(key, time)
+        return self._queue(bool)
+    
+    def __getattr__(self, name: str):
+        """Any other redis command, queued as is (hset, zadd, sadd, ...)"""
+        command = getattr(self._pipe, name)
+        
+        def queue(*args, **kwargs) -> "RedisBatch":
+            command(*args, **kwargs)
+            return self._queue()
+        
+        return queue
+    
+    def __len__(self) -> int:
+        return len(self._decoders)
+    
+    async def execute(self) -> List[Any]:
+        """Send the queued commands; on failure results are all None and .error is set"""
+        if not self._decoders:
+            return self.results
+        try:
+            raw = await self._pipe.execute()
+            self.results = [
+                decoder(value) if decoder and not isinstance(value, Exception) else value
+                for decoder, value in zip(self._decoders, raw)
+            ]
+        except Exception as e:
+            logger.error(f"Redis pipeline error ({len(self._decoders)} commands): {e}")
+            self.error = e
+            self.results = [None] * len(self._decoders)
+        self._decoders = []
+        return self.results
+
+class InstrumentedConnectionPool(redis.ConnectionPool):
+    """
+    Connection pool that waits up to `timeout` seconds for a free connection
+    instead of failing at max_connections, and records utilization and wait times
+    """
+    
+    def __init__(self, timeout: Optional[float] = 5.0, **kwargs):
+        super().__init__(**kwargs)
+        self.timeout = timeout
+        self._released = asyncio.Condition()
+        self.acquired = 0
+        self.waited = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.peak_in_use = 0
+    
+    async def get_connection(self, command_name, *keys, **options):
+        if not self.can_get_connection():
+            started = time.perf_counter()
+            self.waited += 1
+            try:
+                async with self._released:
+                    await asyncio.wait_for(self._released.wait_for(self.can_get_connection), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise redis.ConnectionError("No connection available") from None
+            finally:
+                waited = time.perf_counter() - started
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        
+        # Runs without yielding until the connection is marked in use
+        connection = await super().get_connection(command_name, *keys, **options)
+        self.acquired += 1
+        self.peak_in_use = max(self.peak_in_use, len(self._in_use_connections))
+        return connection
+    
+    async def release(self, connection):
+        await super().release(connection)
+        async with self._released:
+            self._released.notify()
+    
+    def stats(self) -> Dict[str, Union[int, float]]:
+        in_use = len(self._in_use_connections)
+        return {
+            "max_connections": self.max_connections,
+            "in_use": in_use,
+            "idle": len(self._available_connections),
+            "utilization": round(in_use / self.max_connections, 3),
+            "peak_in_use": self.peak_in_use,
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "timeouts": self.timeouts,
+            "wait_ms_avg": round(self.wait_seconds / self.waited * 1000, 3) if self.waited else 0.0,
+            "wait_ms_max": round(self.max_wait_seconds * 1000, 3)
+        }
+
 class RedisClient:
     def __init__(self):
-        self.redis_pool = None
-        self.redis_client = None
+        self.redis_pool: Optional[InstrumentedConnectionPool] = None
+        self.redis_client: Optional[redis.Redis] = None
+        self._connect_lock = asyncio.Lock()
     
     async def connect(self):
-        """Initialize Redis connection"""
-        try:
-            self.redis_pool = redis.ConnectionPool.from_url(
+        """
+        Create the shared pool; called from lifespan at startup. Concurrent callers
+        wait on the lock, so only one pool is ever created. If the server is down the
+        pool is kept (connections are opened on demand) and the error is raised
+        """
+        async with self._connect_lock:
+            if self.redis_client is not None:
+                return
+            
+            self.redis_pool = InstrumentedConnectionPool.from_url(
                 settings.REDIS_URL,
                 decode_responses=True,
-                max_connections=20
+                # Binary (msgpack) payloads survive the str round trip
+                encoding_errors="surrogateescape",
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+                health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL
             )
             self.redis_client = redis.Redis(connection_pool=self.redis_pool)
-            await self.redis_client.ping()
-            logger.info("Redis connection established successfully")
-        except Exception as e:
-            logger.error(f"Failed to connect to Redis: {e}")
-            raise
+            
+            try:
+                await self.redis_client.ping()
+                logger.info("Redis connection established successfully")
+            except Exception as e:
+                logger.error(f"Failed to connect to Redis: {e}")
+                raise
     
     async def disconnect(self):
         """Close Redis connection"""
-        if self.redis_client:
+        async with self._connect_lock:
+            if self.redis_client is None:
+                return
             await self.redis_client.close()
+            await self.redis_pool.disconnect()
+            self.redis_client = None
+            self.redis_pool = None
             logger.info("Redis connection closed")
     
+    async def get_client(self) -> redis.Redis:
+        """Get the underlying client for commands not wrapped here"""
+        if self.redis_client is None:
+            await self.connect()
+        return self.redis_client
+    
+    def pool_stats(self) -> Dict[str, Union[int, float]]:
+        """Pool utilization and connection wait times for /health"""
+        return self.redis_pool.stats() if self.redis_pool is not None else {}
+    
     async def get(self, key: str) -> Optional[str]:
         """Get value by key"""
         try:
-            if not self.redis_client:
-                await self.connect()
-            return await self.redis_client.get(key)
+            client = await self.get_client()
+            return await client.get(key)
         except Exception as e:
             logger.error(f"Redis GET error for key {key}: {e}")
             return None
@@ -56,13 +241,9 @@ class RedisClient:
     ) -> bool:
         """Set value with optional expiration"""
         try:
-            if not self.redis_client:
-                await self.connect()
+            client = await self.get_client()
             
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value)
-            
-            return await self.redis_client.set(key, value, ex=expire)
+            return await client.set(key, _serialize(value), ex=expire)
         except Exception as e:
             logger.error(f"Redis SET error for key {key}: {e}")
             return False
@@ -70,13 +251,9 @@ class RedisClient:
     async def setex(self, key: str, time: int, value: Union[str, dict, list]) -> bool:
         """Set value with expiration time"""
         try:
-            if not self.redis_client:
-                await self.connect()
-            
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value)
+            client = await self.get_client()
             
-            return await self.redis_client.setex(key, time, value)
+            return await client.setex(key, time, _serialize(value))
         except Exception as e:
             logger.error(f"Redis SETEX error for key {key}: {e}")
             return False
@@ -84,9 +261,8 @@ class RedisClient:
     async def delete(self, key: str) -> bool:
         """Delete key"""
         try:
-            if not self.redis_client:
-                await self.connect()
-            return bool(await self.redis_client.delete(key))
+            client = await self.get_client()
+            return bool(await client.delete(key))
         except Exception as e:
             logger.error(f"Redis DELETE error for key {key}: {e}")
             return False
@@ -94,9 +270,8 @@ class RedisClient:
     async def exists(self, key: str) -> bool:
         """Check if key exists"""
         try:
-            if not self.redis_client:
-                await self.connect()
-            return bool(await self.redis_client.exists(key))
+            client = await self.get_client()
+            return bool(await client.exists(key))
         except Exception as e:
             logger.error(f"Redis EXISTS error for key {key}: {e}")
             return False
@@ -104,9 +279,8 @@ class RedisClient:
     async def incr(self, key: str) -> Optional[int]:
         """Increment key value"""
         try:
-            if not self.redis_client:
-                await self.connect()
-            return await self.redis_client.incr(key)
+            client = await self.get_client()
+            return await client.incr(key)
         except Exception as e:
             logger.error(f"Redis INCR error for key {key}: {e}")
             return None
@@ -114,9 +288,8 @@ class RedisClient:
     async def expire(self, key: str, time: int) -> bool:
         """Set expiration time for key"""
         try:
-            if not self.redis_client:
-                await self.connect()
-            return await self.redis_client.expire(key, time)
+            client = await self.get_client()
+            return await client.expire(key, time)
         except Exception as e:
             logger.error(f"Redis EXPIRE error for key {key}: {e}")
             return False
@@ -124,9 +297,8 @@ class RedisClient:
     async def ping(self) -> bool:
         """Test Redis connection"""
         try:
-            if not self.redis_client:
-                await self.connect()
-            await self.redis_client.ping()
+            client = await self.get_client()
+            await client.ping()
             return True
         except Exception as e:
             logger.error(f"Redis PING error: {e}")
@@ -135,10 +307,7 @@ class RedisClient:
     async def get_json(self, key: str) -> Optional[dict]:
         """Get JSON value by key"""
         try:
-            value = await self.get(key)
-            if value:
-                return json.loads(value)
-            return None
+            return codec.decode(await self.get(key))
         except Exception as e:
             logger.error(f"Redis GET_JSON error for key {key}: {e}")
             return None
@@ -152,6 +321,99 @@ class RedisClient:
         """Set JSON value with optional expiration"""
         return await self.set(key, value, expire)
     
+    # Batch operations: one round trip for many keys
+    
+    async def mget(self, keys: Iterable[str]) -> List[Optional[str]]:
+        """Get many values in one round trip, None for missing keys"""
+        keys = list(keys)
+        if not keys:
+            return []
+        try:
+            client = await self.get_client()
+            return await client.mget(keys)
+        except Exception as e:
+            logger.error(f"Redis MGET error for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+    
+    async def mget_json(self, keys: Iterable[str]) -> Dict[str, Optional[Any]]:
+        """Get many JSON values, keyed by key; missing or invalid values are None"""
+        keys = list(keys)
+        values = await self.mget(keys)
+        return {key: _deserialize_json(value) for key, value in zip(keys, values)}
+    
+    async def mset(
+        self,
+        mapping: Dict[str, Union[str, dict, list]],
+        expire: Optional[int] = None
+    ) -> bool:
+        """Set many values in one round trip; with expire, SET EX per key in one transaction"""
+        if not mapping:
+            return True
+        try:
+            client = await self.get_client()
+            
+            serialized = {key: _serialize(value) for key, value in mapping.items()}
+            if expire is None:
+                return await client.mset(serialized)
+            
+            async with client.pipeline(transaction=True) as pipe:
+                for key, value in serialized.items():
+                    pipe.set(key, value, ex=expire)
+                return all(await pipe.execute())
+        except Exception as e:
+            logger.error(f"Redis MSET error for {len(mapping)} keys: {e}")
+            return False
+    
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        """Delete many keys in one round trip, returns how many existed"""
+        keys = list(keys)
+        if not keys:
+            return 0
+        try:
+            client = await self.get_client()
+            return await client.delete(*keys)
+        except Exception as e:
+            logger.error(f"Redis DELETE error for {len(keys)} keys: {e}")
+            return 0
+    
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[RedisBatch]:
+        """
+        Queue commands and send them in one round trip when the block exits
+        (MULTI/EXEC when transaction=True). Nothing is sent if the block raises
+        """
+        client = await self.get_client()
+        async with client.pipeline(transaction=transaction) as pipe:
+            batch = RedisBatch(pipe)
+            yield batch
+            await batch.execute()
+    
+    async def scan_iter(self, match: str, count: int = 500) -> AsyncIterator[str]:
+        """Iterate keys matching a pattern with SCAN (never KEYS), count is the per-call hint"""
+        try:
+            client = await self.get_client()
+            async for key in client.scan_iter(match=match, count=count):
+                yield key
+        except Exception as e:
+            logger.error(f"Redis SCAN error for pattern {match}: {e}")
+    
+    async def delete_matching(self, match: str, batch_size: int = 500) -> int:
+        """Delete keys matching a pattern in batches of UNLINK, returns how many were removed"""
+        removed = 0
+        batch = []
+        try:
+            client = await self.get_client()
+            async for key in self.scan_iter(match, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    removed += await client.unlink(*batch)
+                    batch = []
+            if batch:
+                removed += await client.unlink(*batch)
+        except Exception as e:
+            logger.error(f"Redis UNLINK error for pattern {match}: {e}")
+        return removed
+    
     async def close(self):
         """Close Redis connection"""
         await self.disconnect()
@@ -159,37 +421,419 @@ class RedisClient:
 # Global Redis client instance
 redis_client = RedisClient()
 
+def get_redis() -> redis.Redis:
+    """
+    Shared client for services that issue raw commands. The pool is created by
+    redis_client.connect() in lifespan, before any request or background task runs
+    """
+    if redis_client.redis_client is None:
+        raise RuntimeError("Redis client used before redis_client.connect()")
+    return redis_client.redis_client
+
+# Two-tier cache: per-worker LRU in front of Redis
+CACHE_INVALIDATION_CHANNEL = "cache_invalidations"
+
+# Stampede protection for get_or_load
+CACHE_LOCK_TTL_MS = 10000         # Upper bound for one recompute; the lock expires after it
+CACHE_LOCK_WAIT_SECONDS = 5.0     # How long other workers wait for the lock holder's value
+CACHE_LOCK_POLL_SECONDS = 0.05
+CACHE_EARLY_REFRESH_BETA = 1.0    # >1 refreshes earlier, 0 disables early refresh
+
+# Delete the lock only if we still own it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class TieredCache:
+    """
+    JSON values cached in a bounded per-worker LRU (with TTL) in front of Redis.
+    Writes and invalidations are published so other workers drop their local copy;
+    the local TTL bounds staleness if a message is missed. Treat returned values as read-only.
+    get_or_load adds stampede protection: concurrent misses in a worker share one load,
+    a Redis lock lets one worker recompute while the others wait, and hot keys are
+    refreshed probabilistically before they expire while the current value is still served
+    """
+    
+    registry: Dict[str, "TieredCache"] = {}
+    
+    def __init__(
+        self,
+        namespace: str,
+        ttl: int = 3600,
+        local_ttl: Optional[float] = None,
+        local_maxsize: Optional[int] = None
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local = LRUCache(
+            maxsize=local_maxsize or settings.LOCAL_CACHE_MAX_ENTRIES,
+            ttl=settings.LOCAL_CACHE_TTL if local_ttl is None else local_ttl
+        )
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.loads = 0
+        self.coalesced = 0
+        self.early_refreshes = 0
+        self._flights: Dict[str, asyncio.Future] = {}
+        self._refreshes: Set[asyncio.Task] = set()
+        self._load_seconds = 0.0   # Moving average of loader time, scales early refresh
+        self._release_script = None
+        TieredCache.registry[namespace] = self
+    
+    def redis_key(self, key: Any) -> str:
+        return f"{self.namespace}:{key}"
+    
+    async def get(self, key: Any) -> Optional[Any]:
+        """Local tier, then Redis (filling the local tier)"""
+        key = str(key)
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        
+        value = await redis_client.get_json(self.redis_key(key))
+        if value is None:
+            self.redis_misses += 1
+            return None
+        
+        self.redis_hits += 1
+        self.local.set(key, value)
+        return value
+    
+    async def get_many(self, keys: Iterable[Any]) -> Dict[str, Optional[Any]]:
+        """Like get for many keys; local misses are fetched with one MGET"""
+        result = {}
+        missing = []
+        for key in map(str, keys):
+            value = self.local.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                result[key] = value
+        
+        if missing:
+            fetched = await redis_client.mget_json(self.redis_key(key) for key in missing)
+            for key in missing:
+                value = fetched[self.redis_key(key)]
+                if value is None:
+                    self.redis_misses += 1
+                else:
+                    self.redis_hits += 1
+                    self.local.set(key, value)
+                result[key] = value
+        
+        return result
+    
+    async def set(self, key: Any, value: Any, ttl: Optional[int] = None, publish: bool = True) -> bool:
+        """Store in both tiers; publish=False when filling from the source of truth"""
+        key = str(key)
+        stored = await redis_client.set_json(self.redis_key(key), value, ttl or self.ttl)
+        if publish:
+            await self._publish(key)
+        self.local.set(key, value)
+        return stored
+    
+    async def set_many(self, values: Dict[Any, Any], ttl: Optional[int] = None) -> bool:
+        stored = await redis_client.mset(
+            {self.redis_key(key): value for key, value in values.items()},
+            ttl or self.ttl
+        )
+        await self._publish(*map(str, values))
+        for key, value in values.items():
+            self.local.set(str(key), value)
+        return stored
+    
+    async def invalidate(self, key: Any) -> bool:
+        """Remove from Redis and from every worker's local tier"""
+        key = str(key)
+        self.local.delete(key)
+        deleted = await redis_client.delete(self.redis_key(key))
+        await self._publish(key)
+        return deleted
+    
+    # Stampede protection
+    
+    async def get_or_load(
+        self,
+        key: Any,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None
+    ) -> Optional[Any]:
+        """
+        Cached value, computing it with loader() at most once per key at a time.
+        Callers in this worker that miss together await the same load
+        """
+        key = str(key)
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(self._fetch(key, loader, ttl))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _, key=key: self._flights.pop(key, None))
+        else:
+            self.coalesced += 1
+        
+        # A cancelled caller must not cancel the load the others are waiting on
+        return await asyncio.shield(flight)
+    
+    async def _fetch(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[int]) -> Optional[Any]:
+        redis_key = self.redis_key(key)
+        async with redis_client.pipeline() as batch:
+            batch.get_json(redis_key)
+            batch.pttl(redis_key)
+        value, remaining_ms = batch.results
+        
+        if value is not None:
+            self.redis_hits += 1
+            self.local.set(key, value)
+            if self._should_refresh_early(remaining_ms):
+                token = await self._acquire_lock(key)
+                if token:
+                    self.early_refreshes += 1
+                    task = asyncio.create_task(self._refresh(key, loader, ttl, token))
+                    self._refreshes.add(task)
+                    task.add_done_callback(self._refreshes.discard)
+            return value
+        
+        self.redis_misses += 1
+        token = await self._acquire_lock(key)
+        if token:
+            try:
+                return await self._load(key, loader, ttl)
+            finally:
+                await self._release_lock(key, token)
+        
+        # Another worker is recomputing: wait for its value rather than hitting the database too
+        deadline = time.monotonic() + CACHE_LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(CACHE_LOCK_POLL_SECONDS)
+            value = await redis_client.get_json(redis_key)
+            if value is not None:
+                self.local.set(key, value)
+                return value
+        
+        # Lock holder is slow or gone
+        return await self._load(key, loader, ttl)
+    
+    def _should_refresh_early(self, remaining_ms: Optional[int]) -> bool:
+        """
+        Probabilistic early expiration (XFetch): the closer to expiry and the slower
+        the loader, the likelier a read triggers a refresh, so one request renews a
+        hot key before it expires instead of all of them at once after
+        """
+        if not remaining_ms or remaining_ms < 0 or not self._load_seconds or CACHE_EARLY_REFRESH_BETA <= 0:
+            return False
+        gap = -self._load_seconds * CACHE_EARLY_REFRESH_BETA * math.log(1.0 - random.random())
+        return gap * 1000 >= remaining_ms
+    
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[int]) -> Optional[Any]:
+        started = time.monotonic()
+        value = await loader()
+        elapsed = time.monotonic() - started
+        self.loads += 1
+        self._load_seconds = elapsed if not self._load_seconds else 0.8 * self._load_seconds + 0.2 * elapsed
+        
+        if value is not None:
+            await self.set(key, value, ttl, publish=False)
+        return value
+    
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[int], token: str):
+        try:
+            # Other workers keep their local copy until the local TTL runs out
+            value = await loader()
+            if value is not None:
+                await self.set(key, value, ttl, publish=False)
+        except Exception as e:
+            logger.error(f"Early refresh failed for {self.redis_key(key)}: {e}")
+        finally:
+            await self._release_lock(key, token)
+    
+    async def _acquire_lock(self, key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        try:
+            client = await redis_client.get_client()
+            if await client.set(f"lock:{self.redis_key(key)}", token, nx=True, px=CACHE_LOCK_TTL_MS):
+                return token
+        except Exception as e:
+            # Without Redis every worker loads for itself
+            logger.error(f"Cache lock error for {self.redis_key(key)}: {e}")
+            return token
+        return None
+    
+    async def _release_lock(self, key: str, token: str):
+        try:
+            client = await redis_client.get_client()
+            if self._release_script is None or self._release_script.registered_client is not client:
+                self._release_script = client.register_script(RELEASE_LOCK_SCRIPT)
+            await self._release_script(keys=[f"lock:{self.redis_key(key)}"], args=[token])
+        except Exception as e:
+            logger.error(f"Cache lock release failed for {self.redis_key(key)}: {e}")
+    
+    async def _publish(self, *keys: str):
+        try:
+            client = await redis_client.get_client()
+            await client.publish(CACHE_INVALIDATION_CHANNEL, json.dumps({"namespace": self.namespace, "keys": keys}))
+        except Exception as e:
+            logger.error(f"Cache invalidation publish failed for {self.namespace} ({len(keys)} keys): {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit ratios per tier; the Redis tier only sees local misses"""
+        redis_total = self.redis_hits + self.redis_misses
+        return {
+            "local": self.local.stats(),
+            "redis": {
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+                "hit_ratio": round(self.redis_hits / redis_total, 4) if redis_total else 0.0
+            },
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "early_refreshes": self.early_refreshes
+        }
+
+def _default_cache_key(args: tuple, kwargs: dict) -> str:
+    parts = [str(arg) for arg in args]
+    parts.extend(f"{name}={value}" for name, value in sorted(kwargs.items()))
+    return ":".join(parts)
+
+def cached(
+    namespace: str,
+    ttl: int = 3600,
+    key: Optional[Callable[..., Any]] = None,
+    local_ttl: Optional[float] = None,
+    local_maxsize: Optional[int] = None
+):
+    """
+    Decorator for async loaders returning JSON-serializable values (None is not cached),
+    with stampede protection (see TieredCache.get_or_load).
+    The key defaults to the call arguments; the wrapper exposes .cache and .invalidate(*args)
+
+        @cached("business_summary", ttl=300)
+        async def load_business_summary(business_id: str) -> dict: ...
+    """
+    cache = TieredCache(namespace, ttl=ttl, local_ttl=local_ttl, local_maxsize=local_maxsize)
+    
+    def decorator(loader):
+        def cache_key(*args, **kwargs) -> str:
+            return key(*args, **kwargs) if key else _default_cache_key(args, kwargs)
+        
+        @functools.wraps(loader)
+        async def wrapper(*args, **kwargs):
+            return await cache.get_or_load(
+                cache_key(*args, **kwargs),
+                lambda: loader(*args, **kwargs)
+            )
+        
+        async def invalidate(*args, **kwargs) -> bool:
+            return await cache.invalidate(cache_key(*args, **kwargs))
+        
+        wrapper.cache = cache
+        wrapper.invalidate = invalidate
+        return wrapper
+    
+    return decorator
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-namespace, per-tier cache metrics for this worker"""
+    return {namespace: cache.stats() for namespace, cache in TieredCache.registry.items()}
+
+async def listen_for_cache_invalidations():
+    """Background task: drop local entries written or invalidated on other workers"""
+    while True:
+        client = await redis_client.get_client()
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    data = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                cache = TieredCache.registry.get(data.get("namespace"))
+                if cache is not None:
+                    for key in data.get("keys") or []:
+                        cache.local.delete(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Invalidations may have been missed while disconnected
+            logger.error(f"Cache invalidation listener error: {e}")
+            for cache in TieredCache.registry.values():
+                cache.local.clear()
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.close()
+
+user_cache = TieredCache("user")
+vehicle_cache = TieredCache("vehicle")
+
 # Cache decorators and utilities
 class CacheManager:
     @staticmethod
     async def get_cached_user(user_id: int) -> Optional[dict]:
         """Get cached user data"""
-        return await redis_client.get_json(f"user:{user_id}")
+        return await user_cache.get(user_id)
+    
+    @staticmethod
+    async def get_or_load_user(user_id: int, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        """Get cached user data, running loader once across concurrent misses"""
+        return await user_cache.get_or_load(user_id, loader)
     
     @staticmethod
     async def cache_user(user_id: int, user_data: dict, expire: int = 3600):
         """Cache user data for 1 hour by default"""
-        return await redis_client.set_json(f"user:{user_id}", user_data, expire)
+        return await user_cache.set(user_id, user_data, expire)
     
     @staticmethod
     async def invalidate_user_cache(user_id: int):
         """Remove user from cache"""
-        return await redis_client.delete(f"user:{user_id}")
+        return await user_cache.invalidate(user_id)
+    
+    @staticmethod
+    async def get_cached_users(user_ids: Iterable[int]) -> Dict[int, Optional[dict]]:
+        """Get many cached users in one round trip"""
+        user_ids = list(user_ids)
+        cached_users = await user_cache.get_many(user_ids)
+        return {user_id: cached_users[str(user_id)] for user_id in user_ids}
+    
+    @staticmethod
+    async def cache_users(users: Dict[int, dict], expire: int = 3600):
+        """Cache many users in one round trip"""
+        return await user_cache.set_many(users, expire)
     
     @staticmethod
     async def get_cached_vehicle(vehicle_id: int) -> Optional[dict]:
         """Get cached vehicle data"""
-        return await redis_client.get_json(f"vehicle:{vehicle_id}")
+        return await vehicle_cache.get(vehicle_id)
+    
+    @staticmethod
+    async def get_or_load_vehicle(vehicle_id: int, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        """Get cached vehicle data, running loader once across concurrent misses"""
+        return await vehicle_cache.get_or_load(vehicle_id, loader)
     
     @staticmethod
     async def cache_vehicle(vehicle_id: int, vehicle_data: dict, expire: int = 3600):
         """Cache vehicle data"""
-        return await redis_client.set_json(f"vehicle:{vehicle_id}", vehicle_data, expire)
+        return await vehicle_cache.set(vehicle_id, vehicle_data, expire)
     
     @staticmethod
     async def invalidate_vehicle_cache(vehicle_id: int):
         """Remove vehicle from cache"""
-        return await redis_client.delete(f"vehicle:{vehicle_id}")
+        return await vehicle_cache.invalidate(vehicle_id)
+    
+    @staticmethod
+    async def get_cached_vehicles(vehicle_ids: Iterable[int]) -> Dict[int, Optional[dict]]:
+        """Get many cached vehicles in one round trip"""
+        vehicle_ids = list(vehicle_ids)
+        cached_vehicles = await vehicle_cache.get_many(vehicle_ids)
+        return {vehicle_id: cached_vehicles[str(vehicle_id)] for vehicle_id in vehicle_ids}
 
 # Session management
 class SessionManager:
@@ -213,3 +857,15 @@ class SessionManager:
     async def refresh_session(user_id: int, expire: int = 86400):
         """Refresh session expiration"""
         return await redis_client.expire(f"session:{user_id}", expire)
+    
+    @staticmethod
+    async def get_sessions(user_ids: Iterable[int]) -> Dict[int, Optional[dict]]:
+        """Get many user sessions in one round trip"""
+        user_ids = list(user_ids)
+        sessions = await redis_client.mget_json(f"session:{user_id}" for user_id in user_ids)
+        return {user_id: sessions[f"session:{user_id}"] for user_id in user_ids}
+    
+    @staticmethod
+    async def delete_sessions(user_ids: Iterable[int]) -> int:
+        """Delete many user sessions in one round trip"""
+        return await redis_client.delete_many(f"session:{user_id}" for user_id in user_ids)
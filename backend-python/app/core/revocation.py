@@ -0,0 +1,182 @@
+"""
+Token revocation for AXS360 API
+In-process bloom filter of revoked JWT and QR token ids, synced from Redis
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Iterable, Optional
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Redis layout:
+#   blacklist:{token_id}  - authoritative revocation marker, expires with the token
+#   revoked_tokens        - zset of token_id scored by expiry, used to rebuild filters
+REVOKED_TOKENS_KEY = "revoked_tokens"
+REVOCATION_CHANNEL = "token_revocations"
+
+def _blacklist_key(token_id: str) -> str:
+    return f"blacklist:{token_id}"
+
+class BloomFilter:
+    """Fixed size bloom filter using double hashing over one blake2b digest"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+        return ((first + index * second) % self.size for index in range(self.hash_count))
+
+    def add(self, item: str):
+        """Add item to the filter"""
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class RevocationRegistry:
+    """
+    Answers "is this token revoked" without a Redis round trip in the common case.
+    A filter miss is definitive; a filter hit is confirmed against Redis. Until the
+    first sync, or while pub/sub is disconnected, every check goes to Redis.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter: Optional[BloomFilter] = None
+        self._pending: Optional[set] = None
+        self.synced_at: Optional[float] = None
+        self.filter_negatives = 0
+        self.redis_checks = 0
+        self.false_positives = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    def _add_local(self, token_id: str):
+        if self._filter is not None:
+            self._filter.add(token_id)
+        if self._pending is not None:
+            self._pending.add(token_id)
+
+    async def revoke(self, token_id: str, ttl: int):
+        """Revoke a token id until it would have expired anyway"""
+        if ttl <= 0:
+            return
+
+        client = await redis_client.get_client()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.setex(_blacklist_key(token_id), ttl, "1")
+            pipe.zadd(REVOKED_TOKENS_KEY, {token_id: int(time.time()) + ttl})
+            pipe.publish(REVOCATION_CHANNEL, token_id)
+            await pipe.execute()
+
+        self._add_local(token_id)
+
+    async def is_revoked(self, token_id: str) -> bool:
+        """Check whether a token id has been revoked"""
+        if self._filter is not None and token_id not in self._filter:
+            self.filter_negatives += 1
+            return False
+
+        self.redis_checks += 1
+        revoked = await redis_client.exists(_blacklist_key(token_id))
+        if self._filter is not None and not revoked:
+            self.false_positives += 1
+        return revoked
+
+    async def sync(self):
+        """Rebuild the filter from Redis, dropping expired revocations"""
+        client = await redis_client.get_client()
+        self._pending = set()
+        try:
+            now = int(time.time())
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zremrangebyscore(REVOKED_TOKENS_KEY, "-inf", now)
+                pipe.zrangebyscore(REVOKED_TOKENS_KEY, now, "+inf")
+                _, token_ids = await pipe.execute()
+
+            # Grow past the configured capacity rather than exceed the error rate
+            bloom = BloomFilter(max(self.capacity, 2 * len(token_ids)), self.error_rate)
+            for token_id in token_ids:
+                bloom.add(token_id.decode() if isinstance(token_id, bytes) else token_id)
+            for token_id in self._pending:
+                bloom.add(token_id)
+
+            self._filter = bloom
+            self.synced_at = time.time()
+        finally:
+            self._pending = None
+
+    def invalidate(self):
+        """Fall back to Redis for every check until the next sync"""
+        self._filter = None
+
+    def stats(self) -> dict:
+        """Filter counters for monitoring"""
+        return {
+            "ready": self.ready,
+            "revoked_ids": self._filter.count if self._filter else None,
+            "filter_size_bits": self._filter.size if self._filter else None,
+            "synced_at": self.synced_at,
+            "filter_negatives": self.filter_negatives,
+            "redis_checks": self.redis_checks,
+            "false_positives": self.false_positives
+        }
+
+    async def _listen(self):
+        client = await redis_client.get_client()
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(REVOCATION_CHANNEL)
+            # Subscribe before syncing so no revocation falls between the two
+            await self.sync()
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    data = message["data"]
+                    self._add_local(data.decode() if isinstance(data, bytes) else data)
+        finally:
+            await pubsub.close()
+
+    async def run(self):
+        """Background task: follow revocations over pub/sub and resync periodically"""
+        while True:
+            listener = asyncio.create_task(self._listen())
+            try:
+                while not listener.done():
+                    await asyncio.wait({listener}, timeout=settings.REVOCATION_SYNC_INTERVAL)
+                    if not listener.done() and self.ready:
+                        await self.sync()
+                listener.result()
+            except asyncio.CancelledError:
+                listener.cancel()
+                raise
+            except Exception as e:
+                # Revocations may have been missed while disconnected
+                logger.error(f"Revocation listener error: {e}")
+                self.invalidate()
+                listener.cancel()
+                await asyncio.sleep(1)
+
+# Global revocation registry
+revocation_registry = RevocationRegistry(
+    capacity=settings.REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.REVOCATION_FILTER_ERROR_RATE
+)
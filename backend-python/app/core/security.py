@@ -9,11 +9,14 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import math
 import secrets
 import string
 
 from app.core.config import settings
 from app.core.redis_client import redis_client
+from app.core.rate_limit import rate_limiter, RateLimitPolicy
+from app.core.revocation import revocation_registry
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -73,7 +76,7 @@ async def verify_refresh_token(token: str) -> Optional[dict]:
     # Check if token is blacklisted
     token_id = payload.get("jti")
     if token_id:
-        is_blacklisted = await redis_client.exists(f"blacklist:{token_id}")
+        is_blacklisted = await revocation_registry.is_revoked(token_id)
         if is_blacklisted:
             return None
     
@@ -89,7 +92,7 @@ async def blacklist_token(token: str):
             # Calculate remaining TTL
             current_time = datetime.utcnow().timestamp()
             ttl = max(0, int(exp - current_time))
-            await redis_client.setex(f"blacklist:{token_id}", ttl, "1")
+            await revocation_registry.revoke(token_id, ttl)
 
 class AuthenticationException(HTTPException):
     def __init__(self, detail: str = "Could not validate credentials"):
@@ -108,8 +111,10 @@ class AuthorizationException(HTTPException):
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Dependency to get current authenticated user"""
-    token = credentials.credentials
-    
+    return await get_user_from_token(credentials.credentials)
+
+async def get_user_from_token(token: str):
+    """Resolve an access token to an active user, for callers without an Authorization header"""
     # Verify token
     payload = verify_token(token)
     if not payload:
@@ -118,7 +123,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     # Check if token is blacklisted
     token_id = payload.get("jti")
     if token_id:
-        is_blacklisted = await redis_client.exists(f"blacklist:{token_id}")
+        is_blacklisted = await revocation_registry.is_revoked(token_id)
         if is_blacklisted:
             raise AuthenticationException("Token has been revoked")
     
@@ -178,27 +183,21 @@ def require_permissions(*permissions: str):
 
 # Rate limiting utilities
 async def check_rate_limit(key: str, limit: int, window: int) -> bool:
-    """Check if rate limit is exceeded"""
-    current = await redis_client.get(key)
-    if current is None:
-        await redis_client.setex(key, window, 1)
-        return True
-    
-    current_count = int(current)
-    if current_count >= limit:
-        return False
-    
-    await redis_client.incr(key)
-    return True
-
-async def get_rate_limit_info(key: str) -> dict:
-    """Get rate limit information"""
-    current = await redis_client.get(key)
-    ttl = await redis_client.ttl(key) if current else 0
+    """Check if rate limit is exceeded (sliding window, checked and counted atomically)"""
+    result = await rate_limiter.hit(key, RateLimitPolicy(key, {window: limit}))
+    return result is None or result.allowed
+
+async def get_rate_limit_info(key: str, limit: int = settings.RATE_LIMIT_PER_MINUTE, window: int = 60) -> dict:
+    """Get rate limit information without counting a request"""
+    result = await rate_limiter.hit(key, RateLimitPolicy(key, {window: limit}), cost=0)
+    if result is None:
+        return {"current": 0, "ttl": 0}
     
+    _, remaining, retry, reset = result.windows[0]
     return {
-        "current": int(current) if current else 0,
-        "ttl": ttl
+        "current": max(0, limit - remaining),
+        "remaining": remaining,
+        "ttl": math.ceil((retry or reset) / 1000)
     }
 
 # OTP utilities
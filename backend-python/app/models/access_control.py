@@ -1,7 +1,7 @@
 # Access Control Database Models
 # SQLAlchemy models for visitor management, access logs, and QR tracking
 
-from sqlalchemy import Column, String, DateTime, Integer, Float, Boolean, Text, JSON, ForeignKey
+from sqlalchemy import Column, String, DateTime, Integer, Float, Boolean, Text, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -165,6 +165,10 @@ class QRToken(Base):
     Manages token expiration and usage limits
     """
     __tablename__ = "qr_tokens"
+    __table_args__ = (
+        # Reporting queries: a business's tokens in a time range
+        Index("ix_qr_tokens_business_created", "business_id", "created_at"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     token = Column(String, unique=True, nullable=False, index=True)
@@ -175,7 +179,7 @@ class QRToken(Base):
     # Token configuration
     token_type = Column(String, default="single_use")  # single_use, multi_use, time_limited
     access_type = Column(String, default="check_in")  # check_in, check_out, checkout_only
-    max_uses = Column(Integer, default=1)
+    max_uses = Column(Integer, default=1)  # 0 = unlimited
     current_uses = Column(Integer, default=0)
     
     # Validity
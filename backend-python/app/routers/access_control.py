@@ -1,27 +1,73 @@
 # Access Control API - QR Scanning & Visitor Management
 # Multi-industry access control with QR codes, plate recognition, and visitor tracking
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, File, Form, UploadFile, Header, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from sqlalchemy import and_, or_, desc, func
 from typing import List, Optional
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import base64
+import csv
+import io
 import json
+import re
+import tempfile
+import zipfile
 
 from ..database import get_db
 from ..models.user import User
-from ..models.business import Business
-from ..models.access_control import AccessLog, Visitor, VehicleAccess
-from ..core.security import get_current_user, get_optional_user
+from ..models.business import Business, BusinessEmployee
+from ..models.access_control import AccessLog, Visitor, VehicleAccess, AccessDevice, QRToken
+from ..core.config import settings as app_settings
+from ..core.security import get_current_user, get_optional_user, require_roles
 from ..schemas.access import *
-from ..services.qr_service import generate_access_qr, validate_qr_token
-from ..services.notification_service import send_access_notification
+from ..services.qr_service import (
+    generate_access_qr,
+    consume_qr_token,
+    validate_qr_token,
+    issue_access_tokens_bulk,
+    discard_access_tokens_bulk,
+    iter_rendered_qr_images,
+    mint_checkout_token,
+    get_checkout_qr,
+    revoke_qr_token,
+    is_qr_token_revoked,
+    QR_IMAGE_FORMATS
+)
+from ..core.exceptions import QRCodeException
+from ..services.qr_signing import get_public_keys, is_signed_token, verify_signed_token
+from ..services.notification_outbox import enqueue_access_notification
 from ..services.plate_recognition import recognize_plate
+from ..services.plate_authorization import (
+    get_authorized_vehicle,
+    add_vehicle,
+    authorize_visitor,
+    revoke_visitor,
+    invalidate_business_plates
+)
 from ..services.face_recognition import verify_face
 
 router = APIRouter(prefix="/api/access", tags=["Access Control"])
 
+def _require_business_staff(db: Session, business_id: str, user: User):
+    """
+    Raise 403 unless the user is an active employee of the business
+    """
+    
+    employee = db.query(BusinessEmployee).filter(
+        BusinessEmployee.business_id == business_id,
+        BusinessEmployee.user_id == user.id,
+        BusinessEmployee.status == "active"
+    ).first()
+    
+    if not employee:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied to this business"
+        )
+
 # =====================================================
 # QR CODE GENERATION & VALIDATION
 # =====================================================
@@ -125,7 +171,9 @@ async def generate_access_qr_code(
         vehicle_id=vehicle_access.id if vehicle_access else None,
         valid_until=qr_request.valid_until,
         access_type=qr_request.access_type,
-        visit_purpose=qr_request.visit_purpose
+        visit_purpose=qr_request.visit_purpose,
+        image_format=qr_request.qr_format,
+        signed=qr_request.offline_verifiable
     )
     
     # Create initial access log entry
@@ -149,9 +197,13 @@ async def generate_access_qr_code(
     db.add(access_log)
     db.commit()
     
-    # Send notification to business if enabled
+    # Keep the plate access cache in sync with the new vehicle
+    if vehicle_access:
+        await add_vehicle(visitor, vehicle_access)
+    
+    # Queue notification if enabled (delivered by the outbox workers)
     if settings.get("notifications_enabled", True):
-        await send_access_notification(
+        await enqueue_access_notification(
             business=business,
             visitor=visitor,
             action="qr_generated",
@@ -179,8 +231,19 @@ async def scan_qr_code(
     Used by business employees at entry/exit points
     """
     
-    # Validate QR token
-    token_data = await validate_qr_token(scan_request.qr_token)
+    # Signed QR tokens are checked locally first, forgeries never reach Redis
+    access_token = scan_request.qr_token
+    if is_signed_token(access_token):
+        claims = verify_signed_token(access_token)
+        if not claims or await is_qr_token_revoked(claims["access_token"]):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid or expired QR code"
+            )
+        access_token = claims["access_token"]
+    
+    # Read the token without consuming it; a scan rejected below must not burn a single-use QR
+    token_data = await validate_qr_token(access_token)
     if not token_data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -198,6 +261,8 @@ async def scan_qr_code(
             detail="Business not found"
         )
     
+    _require_business_staff(db, business_id, current_user)
+    
     # Get visitor info
     visitor = db.query(Visitor).filter(Visitor.id == visitor_id).first()
     if not visitor:
@@ -206,6 +271,14 @@ async def scan_qr_code(
             detail="Visitor not found"
         )
     
+    # Validate and consume QR token atomically (concurrent scans of a single-use QR cannot both pass)
+    token_data = await consume_qr_token(access_token)
+    if not token_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid or expired QR code"
+        )
+    
     # Check for existing active access (already checked in)
     existing_access = db.query(AccessLog).filter(
         AccessLog.visitor_id == visitor_id,
@@ -224,7 +297,7 @@ async def scan_qr_code(
         access_method="qr_code",
         access_type=access_type,
         timestamp=datetime.utcnow(),
-        qr_token=scan_request.qr_token,
+        qr_token=access_token,
         location=scan_request.scan_location,
         scanned_by=current_user.id,
         notes=scan_request.notes,
@@ -245,21 +318,23 @@ async def scan_qr_code(
     db.commit()
     db.refresh(access_log)
     
-    # Auto-generate checkout QR if business has auto-checkout disabled
+    # Mint a checkout token if business has auto-checkout disabled
+    # The checkout QR image is only rendered if the visitor opens checkout_qr_url
     settings = business.settings or {}
-    checkout_qr = None
+    checkout = None
     if access_type == "check_in" and not settings.get("auto_checkout", False):
-        checkout_qr_data = await generate_access_qr(
-            business_id=business_id,
-            visitor_id=visitor_id,
-            access_type="checkout_only",
-            valid_until=datetime.utcnow() + timedelta(hours=24)
-        )
-        checkout_qr = checkout_qr_data["qr_code"]
+        try:
+            checkout = mint_checkout_token(
+                business_id=business_id,
+                visitor_id=visitor_id,
+                checkin_log_id=access_log.id
+            )
+        except QRCodeException:
+            checkout = None
     
-    # Send notifications
+    # Queue notifications, provider latency stays off the gate path
     if settings.get("notifications_enabled", True):
-        await send_access_notification(
+        await enqueue_access_notification(
             business=business,
             visitor=visitor,
             action=access_type,
@@ -277,10 +352,442 @@ async def scan_qr_code(
         timestamp=access_log.timestamp,
         location=scan_request.scan_location,
         visit_duration=existing_access.visit_duration if access_type == "check_out" else None,
-        checkout_qr=checkout_qr,
+        checkout_token=checkout["checkout_token"] if checkout else None,
+        checkout_qr_url=checkout["checkout_qr_url"] if checkout else None,
         message=f"Access {access_type.replace('_', ' ')} successful"
     )
 
+@router.get("/checkout-qr/{checkout_token}")
+async def get_checkout_qr_image(
+    checkout_token: str,
+    format: str = Query("png", regex="^(png|svg)$"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Checkout QR image, rendered on demand and cached
+    The signed checkout token is the credential, so guests can open it without logging in
+    """
+    
+    checkout_qr = await get_checkout_qr(checkout_token, image_format=format)
+    if not checkout_qr:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Invalid or expired checkout token"
+        )
+    
+    qr_image = checkout_qr["qr_image"]
+    headers = {
+        "ETag": qr_image["etag"],
+        "Cache-Control": "private, max-age=3600"
+    }
+    
+    if if_none_match == qr_image["etag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=qr_image["content"], media_type=qr_image["content_type"], headers=headers)
+
+@router.delete("/qr-tokens/{access_token}", response_model=dict)
+async def revoke_access_qr(
+    access_token: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Revoke an issued QR code before it expires
+    Also rejects signed copies that gate devices would otherwise accept
+    """
+    
+    if not await revoke_qr_token(access_token):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="QR token not found or already expired"
+        )
+    
+    return {"access_token": access_token, "revoked": True}
+
+# =====================================================
+# BULK QR ISSUANCE (EVENTS, SCHOOLS)
+# =====================================================
+
+BULK_ACCESS_TYPE_PATTERN = "^(single_use|multi_use|time_limited)$"
+
+BULK_VISITOR_FIELDS = [
+    "name", "email", "phone", "visit_purpose", "valid_until",
+    "vehicle_plate", "vehicle_make", "vehicle_model", "vehicle_color"
+]
+
+def _to_naive_utc(value: datetime) -> datetime:
+    """Timestamps in Redis and Postgres are naive UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _parse_bulk_visitors(content: bytes, filename: str, now: datetime) -> List[dict]:
+    """
+    Parse a CSV (header row) or NDJSON (one object per line) visitor upload
+    valid_until values are normalized to naive UTC and must be later than now
+    """
+    
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        line_number = content.count(b"\n", 0, e.start) + 1
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Line {line_number}: upload must be UTF-8 encoded"
+        )
+    
+    errors = []
+    
+    if filename.lower().endswith((".ndjson", ".jsonl")):
+        rows = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                errors.append(f"Line {line_number}: invalid JSON")
+                continue
+            if not isinstance(row, dict):
+                errors.append(f"Line {line_number}: expected a JSON object")
+                continue
+            rows.append((line_number, row))
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        try:
+            rows = [(reader.line_num, row) for row in reader]
+        except csv.Error as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Line {reader.line_num}: {e}"
+            )
+    
+    visitors = []
+    
+    for line_number, row in rows:
+        row = {field: (str(row.get(field)).strip() if row.get(field) not in (None, "") else None) for field in BULK_VISITOR_FIELDS}
+        
+        if not row["name"] or not row["email"]:
+            errors.append(f"Line {line_number}: name and email are required")
+            continue
+        
+        if row["valid_until"]:
+            try:
+                row["valid_until"] = _to_naive_utc(datetime.fromisoformat(row["valid_until"]))
+            except ValueError:
+                errors.append(f"Line {line_number}: invalid valid_until")
+                continue
+            if row["valid_until"] <= now:
+                errors.append(f"Line {line_number}: valid_until is in the past")
+                continue
+        
+        row["email"] = row["email"].lower()
+        visitors.append(row)
+    
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Invalid visitor rows", "errors": errors[:20], "error_count": len(errors)}
+        )
+    
+    return visitors
+
+def _safe_filename(value: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', value).strip('_')[:40] or "visitor"
+
+@router.post("/bulk-generate-qr")
+async def bulk_generate_access_qr(
+    business_id: str = Form(...),
+    visitors_file: UploadFile = File(...),
+    access_type: str = Form("single_use", regex=BULK_ACCESS_TYPE_PATTERN),
+    valid_until: Optional[datetime] = Form(None),
+    output: str = Form("ndjson", regex="^(ndjson|zip)$"),
+    qr_format: str = Form("png", regex="^(png|svg)$"),
+    offline_verifiable: bool = Form(False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles(["owner", "admin", "manager"]))
+):
+    """
+    Issue QR passes for a whole visitor list (CSV or NDJSON upload)
+    Visitors and QR tokens are batch inserted, Redis writes are pipelined and
+    images are rendered in a worker pool. Streams NDJSON results or a ZIP of images.
+    Visitors are not notified individually.
+    """
+    
+    business = db.query(Business).filter(
+        Business.id == business_id,
+        Business.status == "active"
+    ).first()
+    
+    if not business:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Business not found or inactive"
+        )
+    
+    # Bulk passes are pre-approved, so only staff of the business may issue them
+    _require_business_staff(db, business_id, current_user)
+    
+    now = datetime.utcnow()
+    if valid_until is not None:
+        valid_until = _to_naive_utc(valid_until)
+        if valid_until <= now:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="valid_until is in the past"
+            )
+    
+    rows = _parse_bulk_visitors(await visitors_file.read(), visitors_file.filename or "", now)
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No visitors in upload")
+    if len(rows) > app_settings.BULK_QR_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Bulk uploads are limited to {app_settings.BULK_QR_MAX_ROWS} visitors"
+        )
+    
+    # Reuse visitors already registered with this business (one IN query per chunk);
+    # stored emails are not normalized, so compare case-insensitively
+    emails = list({row["email"] for row in rows})
+    existing = {}
+    for offset in range(0, len(emails), 1000):
+        for visitor_id, email in db.query(Visitor.id, Visitor.email).filter(
+            Visitor.business_id == business_id,
+            func.lower(Visitor.email).in_(emails[offset:offset + 1000])
+        ):
+            existing[email.lower()] = visitor_id
+    
+    visitor_mappings = []
+    vehicle_mappings = []
+    token_entries = []
+    
+    for row in rows:
+        visitor_id = existing.get(row["email"])
+        if not visitor_id:
+            visitor_id = str(uuid.uuid4())
+            existing[row["email"]] = visitor_id
+            visitor_mappings.append({
+                "id": visitor_id,
+                "business_id": business_id,
+                "name": row["name"],
+                "email": row["email"],
+                "phone": row["phone"] or "",
+                "visitor_type": "guest",
+                "purpose": row["visit_purpose"],
+                "status": "approved",
+                "registered_by": current_user.id
+            })
+        
+        vehicle_id = None
+        if row["vehicle_plate"]:
+            vehicle_id = str(uuid.uuid4())
+            vehicle_mappings.append({
+                "id": vehicle_id,
+                "visitor_id": visitor_id,
+                "plate_number": row["vehicle_plate"].upper(),
+                "vehicle_make": row["vehicle_make"],
+                "vehicle_model": row["vehicle_model"],
+                "vehicle_color": row["vehicle_color"]
+            })
+        
+        token_entries.append({
+            "visitor_id": visitor_id,
+            "vehicle_id": vehicle_id,
+            "visit_purpose": row["visit_purpose"],
+            "valid_until": row["valid_until"] or valid_until
+        })
+    
+    db.bulk_insert_mappings(Visitor, visitor_mappings)
+    db.bulk_insert_mappings(VehicleAccess, vehicle_mappings)
+    
+    issued = await issue_access_tokens_bulk(
+        business_id=business_id,
+        entries=token_entries,
+        access_type=access_type,
+        signed=offline_verifiable
+    )
+    
+    # The tokens are already scannable in Redis; take them back if the rows cannot be committed
+    try:
+        db.bulk_insert_mappings(QRToken, [
+            {
+                "id": str(uuid.uuid4()),
+                "token": token["access_token"],
+                "business_id": business_id,
+                "visitor_id": token["visitor_id"],
+                "vehicle_access_id": entry["vehicle_id"],
+                "token_type": access_type,
+                "max_uses": 1 if access_type == "single_use" else 0,
+                "expires_at": token["valid_until"],
+                "visit_purpose": entry["visit_purpose"],
+                "generated_by": current_user.id,
+                "metadata": {"bulk": True}
+            }
+            for token, entry in zip(issued, token_entries)
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        await discard_access_tokens_bulk(business_id, issued)
+        raise
+    
+    if vehicle_mappings:
+        await invalidate_business_plates(business_id)
+    
+    payloads = [token["qr_data"] for token in issued]
+    content_type = QR_IMAGE_FORMATS[qr_format]
+    
+    def result_record(index: int) -> dict:
+        return {
+            "visitor_id": issued[index]["visitor_id"],
+            "name": rows[index]["name"],
+            "email": rows[index]["email"],
+            "access_token": issued[index]["access_token"],
+            "qr_data": issued[index]["qr_data"],
+            "valid_until": issued[index]["valid_until"].isoformat()
+        }
+    
+    if output == "zip":
+        async def zip_stream():
+            buffer = tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+            manifest = io.StringIO()
+            writer = csv.DictWriter(manifest, fieldnames=["file", "visitor_id", "name", "email", "access_token", "qr_data", "valid_until"])
+            writer.writeheader()
+            
+            # Images are already compressed, store them as-is
+            with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+                async for index, content in iter_rendered_qr_images(payloads, qr_format):
+                    filename = f"{index + 1:05d}_{_safe_filename(rows[index]['name'])}.{qr_format}"
+                    archive.writestr(filename, content)
+                    writer.writerow({"file": filename, **result_record(index)})
+                archive.writestr("manifest.csv", manifest.getvalue())
+            
+            buffer.seek(0)
+            while True:
+                chunk = buffer.read(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+            buffer.close()
+        
+        return StreamingResponse(
+            zip_stream(),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="qr_passes_{business_id}.zip"'}
+        )
+    
+    async def ndjson_stream():
+        yield json.dumps({
+            "business_id": business_id,
+            "business_name": business.name,
+            "issued": len(issued),
+            "new_visitors": len(visitor_mappings)
+        }) + "\n"
+        async for index, content in iter_rendered_qr_images(payloads, qr_format):
+            record = result_record(index)
+            record["qr_code"] = f"data:{content_type};base64,{base64.b64encode(content).decode()}"
+            yield json.dumps(record) + "\n"
+    
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+# =====================================================
+# OFFLINE GATE DEVICES
+# =====================================================
+
+@router.get("/devices/signing-keys", response_model=dict)
+async def get_qr_signing_keys():
+    """
+    Public keys for offline QR verification
+    Gate devices cache these and verify signed QR tokens locally
+    """
+    
+    return get_public_keys()
+
+@router.post("/devices/{device_id}/offline-scans", response_model=OfflineScanBatchResponse)
+async def reconcile_offline_scans(
+    device_id: str,
+    batch: OfflineScanBatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Reconcile scans a device accepted offline
+    Single-use consumption happens here, after the gate already opened
+    """
+    
+    device = db.query(AccessDevice).filter(
+        AccessDevice.device_id == device_id,
+        AccessDevice.is_active == True
+    ).first()
+    
+    if not device:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Device not found or inactive"
+        )
+    
+    results = []
+    accepted = 0
+    
+    for scan in batch.scans:
+        # Token must have been valid at the time of the scan
+        claims = verify_signed_token(scan.qr_token, now=scan.scanned_at)
+        if not claims or claims["business_id"] != device.business_id:
+            results.append(OfflineScanResult(
+                qr_token=scan.qr_token,
+                status="invalid",
+                message="Signature, expiry or business check failed"
+            ))
+            continue
+        
+        # Consumed as of the scan time, so scans reconciled after expiry still count
+        token_data = None
+        if not await is_qr_token_revoked(claims["access_token"]):
+            token_data = await consume_qr_token(claims["access_token"], used_at=scan.scanned_at)
+        consumed = token_data is not None
+        
+        access_log = AccessLog(
+            id=str(uuid.uuid4()),
+            business_id=device.business_id,
+            visitor_id=claims["visitor_id"],
+            vehicle_access_id=token_data.get("vehicle_id") if consumed else None,
+            access_method="qr_code",
+            access_type="check_in",
+            timestamp=scan.scanned_at,
+            qr_token=claims["access_token"],
+            location=scan.scan_location or device.location,
+            scanned_by=current_user.id,
+            scanner_device=device.device_id,
+            status="successful" if consumed else "denied",
+            notes=None if consumed else "Offline scan rejected on reconciliation: token already used or revoked",
+            metadata={
+                "offline": True,
+                "device_decision": scan.access_granted,
+                "reconciled_at": datetime.utcnow().isoformat()
+            }
+        )
+        db.add(access_log)
+        
+        if consumed:
+            accepted += 1
+        
+        results.append(OfflineScanResult(
+            qr_token=scan.qr_token,
+            status="accepted" if consumed else "rejected",
+            access_log_id=access_log.id,
+            message="Scan reconciled" if consumed else "Token already used or revoked"
+        ))
+    
+    device.last_heartbeat = datetime.utcnow()
+    db.commit()
+    
+    return OfflineScanBatchResponse(
+        device_id=device_id,
+        accepted=accepted,
+        rejected=len(results) - accepted,
+        results=results
+    )
+
 # =====================================================
 # VISITOR MANAGEMENT
 # =====================================================
@@ -384,9 +891,15 @@ async def approve_visitor(
     db.commit()
     db.refresh(visitor)
     
-    # Send notification to visitor
+    # Update plate access cache for the visitor's vehicles
+    if approval_data.approved:
+        await authorize_visitor(visitor)
+    else:
+        await revoke_visitor(visitor)
+    
+    # Queue notification to visitor
     business = db.query(Business).filter(Business.id == visitor.business_id).first()
-    await send_access_notification(
+    await enqueue_access_notification(
         business=business,
         visitor=visitor,
         action="visitor_approved" if approval_data.approved else "visitor_rejected",
@@ -431,6 +944,37 @@ async def get_access_logs(
     
     return [AccessLogResponse.from_orm(log) for log in logs]
 
+@router.get("/qr-history/{business_id}", response_model=List[QRTokenHistoryResponse])
+async def get_qr_token_history(
+    business_id: str,
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    active_only: bool = Query(False),
+    limit: int = Query(100, le=500),
+    offset: int = Query(0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Issued QR tokens for a business, from the durable Postgres copy
+    Rows are written behind the Redis gate path and may lag it by a few seconds
+    """
+    
+    query = db.query(QRToken).filter(QRToken.business_id == business_id)
+    
+    if date_from:
+        query = query.filter(QRToken.created_at >= date_from)
+    
+    if date_to:
+        query = query.filter(QRToken.created_at <= date_to)
+    
+    if active_only:
+        query = query.filter(QRToken.is_active == True)
+    
+    tokens = query.order_by(desc(QRToken.created_at)).offset(offset).limit(limit).all()
+    
+    return [QRTokenHistoryResponse.from_orm(token) for token in tokens]
+
 @router.get("/live-activity/{business_id}", response_model=LiveActivityResponse)
 async def get_live_activity(
     business_id: str,
@@ -507,14 +1051,14 @@ async def recognize_vehicle_plate(
     
     plate_number = plate_result["plate_number"]
     
-    # Look for registered vehicle
-    vehicle_access = db.query(VehicleAccess).join(Visitor).filter(
-        VehicleAccess.plate_number == plate_number.upper(),
-        Visitor.business_id == recognition_request.business_id,
-        Visitor.status == "approved"
-    ).first()
+    # Look up authorized vehicle in the plate access cache (no Postgres on the hot path)
+    authorized_vehicle = await get_authorized_vehicle(
+        recognition_request.business_id,
+        plate_number,
+        db=db
+    )
     
-    if not vehicle_access:
+    if not authorized_vehicle:
         return PlateRecognitionResponse(
             recognized=True,
             plate_number=plate_number,
@@ -527,8 +1071,8 @@ async def recognize_vehicle_plate(
     access_log = AccessLog(
         id=str(uuid.uuid4()),
         business_id=recognition_request.business_id,
-        visitor_id=vehicle_access.visitor_id,
-        vehicle_access_id=vehicle_access.id,
+        visitor_id=authorized_vehicle["visitor_id"],
+        vehicle_access_id=authorized_vehicle["vehicle_access_id"],
         access_method="plate_recognition",
         access_type="check_in",
         timestamp=datetime.utcnow(),
@@ -548,6 +1092,6 @@ async def recognize_vehicle_plate(
         plate_number=plate_number,
         vehicle_registered=True,
         access_granted=True,
-        visitor_name=vehicle_access.visitor.name,
+        visitor_name=authorized_vehicle["visitor_name"],
         message="Access granted via plate recognition"
     )
@@ -1,7 +1,8 @@
 # AXS360 - Business Management API
 # Multi-tenant business registration and management
 
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Header, Query, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import uuid
@@ -333,10 +334,12 @@ async def configure_access_methods(
 @router.get("/{business_id}/qr-code")
 async def get_business_qr_code(
     business_id: str,
+    format: str = Query("png", regex="^(png|svg)$"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_roles(["owner", "admin", "manager"]))
 ):
-    """Get QR code for business access"""
+    """Get QR code for business access (PNG or SVG, cacheable via ETag)"""
     
     business = db.query(Business).filter(Business.id == business_id).first()
     if not business:
@@ -345,14 +348,26 @@ async def get_business_qr_code(
             detail="Business not found"
         )
     
-    qr_data = await generate_business_qr(business_id)
+    qr_data = await generate_business_qr(business_id, image_format=format)
     
-    return {
-        "business_id": business_id,
-        "qr_code": qr_data["qr_code"],
-        "qr_url": qr_data["qr_url"],
-        "expires_at": qr_data["expires_at"]
+    cache_headers = {
+        "ETag": qr_data["qr_etag"],
+        "Cache-Control": "private, max-age=86400"
     }
+    
+    # Client already has this image
+    if if_none_match == qr_data["qr_etag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    
+    return JSONResponse(
+        content={
+            "business_id": business_id,
+            "qr_code": qr_data["qr_code"],
+            "qr_url": qr_data["qr_url"],
+            "expires_at": qr_data["expires_at"]
+        },
+        headers=cache_headers
+    )
 
 # =====================================================
 # EMPLOYEE MANAGEMENT
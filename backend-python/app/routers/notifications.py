@@ -0,0 +1,68 @@
+# Notifications API - Push Notification Feed
+# Per-user notification history backed by Redis Streams, with resumable paging and read cursors
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import Optional
+
+from ..models.user import User
+from ..core.security import get_current_user
+from ..schemas.notifications import *
+from ..services.notification_service import (
+    get_push_notifications,
+    mark_push_notifications_read,
+    get_push_read_state,
+    PUSH_STREAM_CONFIG
+)
+
+router = APIRouter(prefix="/api/notifications", tags=["Notifications"])
+
+_STREAM_ID_PATTERN = r"^\d+-\d+$"
+
+# =====================================================
+# PUSH NOTIFICATION FEED
+# =====================================================
+
+@router.get("/", response_model=PushNotificationPage)
+async def list_notifications(
+    after: Optional[str] = Query(None, regex=_STREAM_ID_PATTERN),
+    limit: int = Query(PUSH_STREAM_CONFIG["page_size"], ge=1, le=PUSH_STREAM_CONFIG["max_page_size"]),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Latest notifications, or everything after the last id the client has seen
+    Clients store last_id and send it back as `after` when they reconnect
+    """
+    
+    page = await get_push_notifications(str(current_user.id), after=after, limit=limit)
+    read_state = await get_push_read_state(str(current_user.id))
+    
+    return PushNotificationPage(**page, unread_count=read_state["unread_count"])
+
+@router.get("/unread-count", response_model=NotificationReadState)
+async def unread_count(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Badge count: notifications newer than the read cursor
+    """
+    
+    return NotificationReadState(**await get_push_read_state(str(current_user.id)))
+
+@router.post("/read", response_model=NotificationReadState)
+async def mark_read(
+    request: MarkNotificationsRead,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Move the read cursor forward; entries up to it are reported as read
+    """
+    
+    try:
+        await mark_push_notifications_read(str(current_user.id), request.up_to)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid notification id"
+        )
+    
+    return NotificationReadState(**await get_push_read_state(str(current_user.id)))
@@ -0,0 +1,228 @@
+# Realtime Gateway API - WebSocket & Server-Sent Events
+# Live user notifications and business dashboard updates, fanned out from one shared Redis subscription per worker
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
+from datetime import datetime
+import asyncio
+import json
+
+from ..core.database import SessionLocal
+from ..models.user import User
+from ..models.business import BusinessEmployee
+from ..core.config import settings
+from ..core.realtime import realtime_hub, Subscriber, user_notifications_channel, dashboard_channel
+from ..core.security import get_current_user, get_current_admin_user, get_user_from_token, AuthenticationException
+from ..services.notification_service import get_push_notifications, PUSH_STREAM_CONFIG
+
+router = APIRouter(prefix="/api/realtime", tags=["Realtime"])
+
+_STREAM_ID_PATTERN = r"^\d+-\d+$"
+
+# WebSocket close codes
+WS_CLOSE_UNAUTHORIZED = 4401
+WS_CLOSE_FORBIDDEN = 4403
+WS_CLOSE_TOO_SLOW = 4408   # Client fell behind; reconnect with last_id
+
+# =====================================================
+# SHARED EVENT STREAM
+# =====================================================
+
+def _authorized_business_ids(user: User, business_ids: List[str]) -> bool:
+    """
+    Dashboard updates are only streamed to active employees of the business
+    Uses its own short-lived session: a request-scoped one would stay checked out of the
+    pool for as long as the connection streams
+    """
+    
+    if not business_ids:
+        return True
+    
+    db = SessionLocal()
+    try:
+        allowed = db.query(BusinessEmployee.business_id).filter(
+            BusinessEmployee.business_id.in_(business_ids),
+            BusinessEmployee.user_id == user.id,
+            BusinessEmployee.status == "active"
+        ).all()
+    finally:
+        db.close()
+    
+    return {row[0] for row in allowed} >= set(business_ids)
+
+async def _gateway_events(
+    subscriber: Subscriber,
+    user_id: str,
+    last_id: Optional[str] = None
+) -> AsyncIterator[Tuple[str, Any, Optional[str]]]:
+    """
+    Yield (event, data, id) for one connection
+    Notifications the client missed since last_id are replayed from the stream first;
+    the subscription is already live, so replayed ids are skipped when they arrive again.
+    Idle periods yield a heartbeat; the generator ends when the client is too slow
+    """
+    
+    heartbeat = settings.REALTIME_HEARTBEAT_SECONDS
+    notifications_channel = user_notifications_channel(user_id)
+    replayed = set()
+    
+    while last_id:
+        page = await get_push_notifications(user_id, after=last_id, limit=PUSH_STREAM_CONFIG["max_page_size"])
+        for notification in page["notifications"]:
+            replayed.add(notification["id"])
+            yield "notification", notification, notification["id"]
+        if len(page["notifications"]) < PUSH_STREAM_CONFIG["max_page_size"]:
+            break
+        last_id = page["last_id"]
+    
+    while not subscriber.overflowed:
+        message = await subscriber.next(heartbeat)
+        if message is None:
+            yield "heartbeat", {"timestamp": datetime.utcnow().isoformat()}, None
+            continue
+    
+        channel = message["channel"]
+        data = message["data"]
+    
+        if channel is None:
+            # The worker lost its subscription for a moment; clients refetch
+            yield "resync", data, None
+        elif channel == notifications_channel:
+            event_id = data.get("id") if isinstance(data, dict) else None
+            if event_id in replayed:
+                continue
+            yield "notification", data, event_id
+        else:
+            yield "dashboard", data, None
+
+def _channels_for(user_id: str, business_ids: List[str]) -> List[str]:
+    return [user_notifications_channel(user_id)] + [dashboard_channel(business_id) for business_id in business_ids]
+
+# =====================================================
+# WEBSOCKET
+# =====================================================
+
+@router.websocket("/ws")
+async def realtime_websocket(
+    websocket: WebSocket,
+    token: str = Query(...),
+    business_id: List[str] = Query([]),
+    last_id: Optional[str] = Query(None, regex=_STREAM_ID_PATTERN)
+):
+    """
+    Live notifications for the authenticated user, plus dashboard updates for each business_id
+    Browsers cannot set headers on WebSockets, so the access token comes as a query parameter
+    """
+    
+    try:
+        user = await get_user_from_token(token)
+    except AuthenticationException:
+        await websocket.close(code=WS_CLOSE_UNAUTHORIZED)
+        return
+    
+    if not _authorized_business_ids(user, business_id):
+        await websocket.close(code=WS_CLOSE_FORBIDDEN)
+        return
+    
+    await websocket.accept()
+    
+    subscriber = realtime_hub.create_subscriber()
+    await realtime_hub.subscribe(subscriber, _channels_for(str(user.id), business_id))
+    
+    # Reading is only needed to notice the client going away
+    async def drain_client():
+        while True:
+            await websocket.receive_text()
+    
+    receiver = asyncio.create_task(drain_client())
+    
+    try:
+        async for event, data, event_id in _gateway_events(subscriber, str(user.id), last_id):
+            if receiver.done():
+                break
+            # A client that cannot take a message within a heartbeat is too slow
+            await asyncio.wait_for(
+                websocket.send_json({"event": event, "id": event_id, "data": data}),
+                timeout=settings.REALTIME_HEARTBEAT_SECONDS
+            )
+    
+        if not receiver.done():
+            await websocket.close(code=WS_CLOSE_TOO_SLOW)
+    except asyncio.TimeoutError:
+        await websocket.close(code=WS_CLOSE_TOO_SLOW)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        # Retrieve the disconnect (or cancellation) so it is not logged as never retrieved
+        await asyncio.gather(receiver, return_exceptions=True)
+        await realtime_hub.unsubscribe(subscriber)
+
+# =====================================================
+# SERVER-SENT EVENTS
+# =====================================================
+
+def _format_sse(event: str, data: Any, event_id: Optional[str]) -> str:
+    if event == "heartbeat":
+        return ": heartbeat\n\n"
+    
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+@router.get("/events")
+async def realtime_events(
+    request: Request,
+    business_id: List[str] = Query([]),
+    last_id: Optional[str] = Query(None, regex=_STREAM_ID_PATTERN),
+    last_event_id: Optional[str] = Header(None, regex=_STREAM_ID_PATTERN),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Server-Sent Events variant of the gateway
+    Reconnecting clients resume from Last-Event-ID (set automatically by EventSource) or last_id
+    """
+    
+    if not _authorized_business_ids(current_user, business_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied to this business"
+        )
+    
+    user_id = str(current_user.id)
+    
+    async def event_stream():
+        subscriber = realtime_hub.create_subscriber()
+        await realtime_hub.subscribe(subscriber, _channels_for(user_id, business_id))
+        try:
+            yield "retry: 3000\n\n"
+            async for event, data, event_id in _gateway_events(subscriber, user_id, last_event_id or last_id):
+                if await request.is_disconnected():
+                    break
+                yield _format_sse(event, data, event_id)
+        finally:
+            await realtime_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# =====================================================
+# GATEWAY STATS
+# =====================================================
+
+@router.get("/stats")
+async def realtime_stats(
+    current_user: User = Depends(get_current_admin_user)
+) -> Dict[str, int]:
+    """
+    Connections, shared channels and delivered/dropped messages on this worker
+    """
+    
+    return realtime_hub.stats()
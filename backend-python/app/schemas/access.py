@@ -59,9 +59,17 @@ class QRAccessRequest(BaseModel):
     # QR configuration
     valid_until: Optional[datetime] = None
     access_type: str = "single_use"  # single_use, multi_use, time_limited
+    qr_format: str = "png"  # png, svg
+    offline_verifiable: bool = False  # Embed a signed token gate devices can verify offline
     
     # Additional metadata
     device_info: Optional[Dict[str, Any]] = None
+    
+    @validator('qr_format')
+    def validate_qr_format(cls, v):
+        if v not in ('png', 'svg'):
+            raise ValueError('QR format must be png or svg')
+        return v
 
 class QRAccessResponse(BaseModel):
     qr_code: str  # Base64 encoded QR image
@@ -91,9 +99,36 @@ class AccessScanResponse(BaseModel):
     timestamp: datetime
     location: str
     visit_duration: Optional[int] = None  # in minutes
-    checkout_qr: Optional[str] = None  # For checkout QR if needed
+    checkout_qr: Optional[str] = None  # Deprecated, image is served by checkout_qr_url
+    checkout_token: Optional[str] = None
+    checkout_qr_url: Optional[str] = None  # Rendered on demand when the visitor opens it
+    message: str
+
+# =====================================================
+# OFFLINE DEVICE RECONCILIATION SCHEMAS
+# =====================================================
+
+class OfflineScan(BaseModel):
+    qr_token: str  # Signed token exactly as read from the QR
+    scanned_at: datetime
+    scan_location: Optional[str] = None
+    access_granted: bool = True  # Decision taken locally by the device
+
+class OfflineScanBatch(BaseModel):
+    scans: List[OfflineScan]
+
+class OfflineScanResult(BaseModel):
+    qr_token: str
+    status: str  # accepted, rejected, invalid
+    access_log_id: Optional[str] = None
     message: str
 
+class OfflineScanBatchResponse(BaseModel):
+    device_id: str
+    accepted: int
+    rejected: int
+    results: List[OfflineScanResult]
+
 # =====================================================
 # VISITOR MANAGEMENT SCHEMAS
 # =====================================================
@@ -175,6 +210,25 @@ class AccessLogResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class QRTokenHistoryResponse(BaseModel):
+    token: str
+    business_id: str
+    visitor_id: str
+    vehicle_access_id: Optional[str] = None
+    token_type: str
+    access_type: str
+    max_uses: Optional[int] = None
+    current_uses: int
+    created_at: datetime
+    expires_at: datetime
+    is_active: bool
+    first_used: Optional[datetime] = None
+    last_used: Optional[datetime] = None
+    visit_purpose: Optional[str] = None
+    
+    class Config:
+        orm_mode = True
+
 # =====================================================
 # LIVE ACTIVITY SCHEMAS
 # =====================================================
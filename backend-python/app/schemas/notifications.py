@@ -0,0 +1,30 @@
+# Notification Schemas
+# Pydantic models for push notification feeds and read state
+
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any
+
+# =====================================================
+# PUSH NOTIFICATION FEED
+# =====================================================
+
+class PushNotification(BaseModel):
+    id: str  # Redis stream id, also the resume position
+    title: Optional[str] = None
+    body: Optional[str] = None
+    data: Dict[str, Any] = {}
+    timestamp: Optional[str] = None
+    read: bool = False
+
+class PushNotificationPage(BaseModel):
+    notifications: List[PushNotification]
+    read_cursor: Optional[str] = None
+    last_id: Optional[str] = None  # Pass as `after` to resume
+    unread_count: int = 0
+
+class MarkNotificationsRead(BaseModel):
+    up_to: Optional[str] = Field(None, pattern=r"^\d+-\d+$")  # Last read id; omit to mark everything read
+
+class NotificationReadState(BaseModel):
+    read_cursor: Optional[str] = None
+    unread_count: int
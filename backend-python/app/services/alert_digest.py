@@ -0,0 +1,250 @@
+# Business Alert Digests
+# Coalesces business alerts per window and sends one digest email, honoring quiet hours and a send budget
+
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta, time as dt_time
+from html import escape
+from types import SimpleNamespace
+from typing import Dict, Any, List, Optional
+
+from ..core import codec
+from ..core.config import settings
+from ..models.business import Business
+from .notification_service import send_business_notification_email
+from .notification_preferences import get_business_notification_settings, quiet_hours_end
+from ..core.redis_client import get_redis
+
+# Digest configuration
+ALERT_DIGEST_CONFIG = {
+    "window_seconds": settings.ALERT_DIGEST_WINDOW_SECONDS,   # Alerts arriving within a window share one email
+    "daily_budget": settings.ALERT_DIGEST_DAILY_BUDGET,       # Digest emails per business per day
+    "max_alerts_listed": 20,          # Individual alerts shown per type, the rest are counted
+    "retry_delay_seconds": 300,       # Delay before retrying a digest that failed to send
+    "poll_interval": 5,
+    "flush_batch": 100
+}
+
+DUE_KEY = "alert_digest:due"   # zset of business ids scored by next flush time
+
+def _alerts_key(business_id: str) -> str:
+    return f"alert_digest:{business_id}"
+
+def _meta_key(business_id: str) -> str:
+    return f"alert_digest:{business_id}:meta"
+
+def _budget_key(business_id: str, day: str) -> str:
+    return f"alert_budget:{business_id}:{day}"
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+# =====================================================
+# AGGREGATION
+# =====================================================
+
+async def queue_business_alert(
+    business: Business,
+    alert_type: str,
+    message: str,
+    data: Dict[str, Any] = None
+) -> bool:
+    """
+    Add an alert to the business digest; the first alert of a window schedules its flush
+    Returns False if the business has email alerts turned off
+    """
+
+    notification_settings = get_business_notification_settings(business)
+    if not notification_settings.email_alerts:
+        return False
+
+    now = datetime.utcnow()
+    alert = {
+        "type": alert_type,
+        "message": message,
+        "data": data or {},
+        "timestamp": now.isoformat()
+    }
+    meta = {
+        "name": business.name,
+        "email": business.email or "",
+        "timezone": getattr(business, "timezone", None) or "UTC",
+        "quiet_hours_start": notification_settings.quiet_hours_start or "",
+        "quiet_hours_end": notification_settings.quiet_hours_end or ""
+    }
+
+    redis_client = get_redis()
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.rpush(_alerts_key(business.id), codec.encode(alert))
+        pipe.hset(_meta_key(business.id), mapping=meta)
+        # NX keeps the flush time of an open window (or a quiet hours / budget deferral)
+        pipe.zadd(DUE_KEY, {business.id: now.timestamp() + ALERT_DIGEST_CONFIG["window_seconds"]}, nx=True)
+        await pipe.execute()
+
+    return True
+
+def build_digest(business_name: str, alerts: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Group alerts by type into one digest email (subject and HTML)
+    """
+
+    grouped: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    for alert in alerts:
+        grouped.setdefault(alert.get("type") or "alert", []).append(alert)
+
+    sections = []
+    for alert_type, items in grouped.items():
+        shown = items[:ALERT_DIGEST_CONFIG["max_alerts_listed"]]
+        rows = "".join(
+            f"<li><strong>{escape(item['timestamp'][11:19])}</strong> {escape(str(item.get('message', '')))}</li>"
+            for item in shown
+        )
+        more = len(items) - len(shown)
+        sections.append(f"""
+    <h3>{escape(alert_type)} ({len(items)})</h3>
+    <ul>{rows}</ul>
+    {f"<p>... and {more} more</p>" if more else ""}""")
+
+    first = alerts[0]["timestamp"][:16].replace("T", " ")
+    last = alerts[-1]["timestamp"][:16].replace("T", " ")
+
+    subject = f"AXS360 Alerts - {business_name} ({len(alerts)} alert{'s' if len(alerts) != 1 else ''})"
+    content = f"""
+    <h2>Business Alert Digest</h2>
+    <p>{len(alerts)} alert(s) between {first} and {last} UTC.</p>
+    {"".join(sections)}
+
+    <p>Please log into your AXS360 dashboard for more details.</p>
+    """
+
+    return {"subject": subject, "content": content}
+
+# =====================================================
+# FLUSHING
+# =====================================================
+
+async def _take_alerts(redis_client, business_id: str) -> List[Dict[str, Any]]:
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.lrange(_alerts_key(business_id), 0, -1)
+        pipe.delete(_alerts_key(business_id))
+        raw_alerts, _ = await pipe.execute()
+
+    alerts = []
+    for raw in raw_alerts:
+        try:
+            alerts.append(codec.decode(raw))
+        except (TypeError, ValueError):
+            continue
+    return alerts
+
+async def _restore_alerts(redis_client, business_id: str, alerts: List[Dict[str, Any]], retry_at: datetime):
+    """Put unsent alerts back in front of any that arrived meanwhile"""
+    async with redis_client.pipeline(transaction=True) as pipe:
+        if alerts:
+            pipe.lpush(_alerts_key(business_id), *[codec.encode(alert) for alert in reversed(alerts)])
+        pipe.zadd(DUE_KEY, {business_id: retry_at.timestamp()})
+        await pipe.execute()
+
+async def flush_business_digest(business_id: str, now: Optional[datetime] = None) -> bool:
+    """
+    Send the pending digest of one business unless quiet hours or the budget defer it
+    Returns True if a digest email was sent
+    """
+
+    redis_client = get_redis()
+    now = now or datetime.utcnow()
+
+    meta = {_decode(k): _decode(v) for k, v in (await redis_client.hgetall(_meta_key(business_id))).items()}
+
+    # Quiet hours: keep collecting, flush when they end
+    quiet_end = quiet_hours_end(meta.get("quiet_hours_start"), meta.get("quiet_hours_end"), meta.get("timezone"), now)
+    if quiet_end:
+        await redis_client.zadd(DUE_KEY, {business_id: quiet_end.timestamp()})
+        return False
+
+    # Send budget: one counter per business per UTC day
+    budget_key = _budget_key(business_id, now.date().isoformat())
+    sent_today = int(await redis_client.get(budget_key) or 0)
+    if sent_today >= ALERT_DIGEST_CONFIG["daily_budget"]:
+        next_day = datetime.combine(now.date() + timedelta(days=1), dt_time.min)
+        await redis_client.zadd(DUE_KEY, {business_id: next_day.timestamp()})
+        return False
+
+    alerts = await _take_alerts(redis_client, business_id)
+    if not alerts:
+        return False
+
+    recipients = [meta["email"]] if meta.get("email") else None
+    business = SimpleNamespace(id=business_id, name=meta.get("name"), email=meta.get("email"))
+
+    # The alerts are out of Redis now; any failure from here on puts them back
+    try:
+        digest = build_digest(meta.get("name") or "your business", alerts)
+        sent = await send_business_notification_email(
+            business=business,
+            subject=digest["subject"],
+            content=digest["content"],
+            recipient_emails=recipients
+        )
+    except Exception as e:
+        print(f"Alert digest for {business_id} failed: {str(e)}")
+        sent = False
+
+    if not sent:
+        await _restore_alerts(
+            redis_client, business_id, alerts,
+            now + timedelta(seconds=ALERT_DIGEST_CONFIG["retry_delay_seconds"])
+        )
+        return False
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.incr(budget_key)
+        pipe.expire(budget_key, 2 * 86400)
+        await pipe.execute()
+
+    return True
+
+async def _flush_owned_digest(redis_client, business_id: str, now: datetime):
+    """
+    Flush a business this worker removed from DUE_KEY; on failure it is scheduled again,
+    otherwise nothing would ever flush it
+    """
+
+    try:
+        await flush_business_digest(business_id, now)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Alert digest for {business_id} failed: {str(e)}")
+        retry_at = datetime.utcnow() + timedelta(seconds=ALERT_DIGEST_CONFIG["retry_delay_seconds"])
+        try:
+            # NX keeps a flush time the failed attempt already set
+            await redis_client.zadd(DUE_KEY, {business_id: retry_at.timestamp()}, nx=True)
+        except Exception as e:
+            print(f"Alert digest reschedule for {business_id} failed: {str(e)}")
+
+async def run_alert_digest_flusher():
+    """
+    Background task: flush digests whose window has closed
+    ZREM decides which worker owns a due business, so each digest is sent once
+    """
+
+    while True:
+        try:
+            redis_client = get_redis()
+            now = datetime.utcnow()
+            due = await redis_client.zrangebyscore(
+                DUE_KEY, "-inf", now.timestamp(),
+                start=0, num=ALERT_DIGEST_CONFIG["flush_batch"]
+            )
+
+            for business_id in due:
+                business_id = _decode(business_id)
+                if await redis_client.zrem(DUE_KEY, business_id):
+                    await _flush_owned_digest(redis_client, business_id, now)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Alert digest flusher error: {str(e)}")
+
+        await asyncio.sleep(ALERT_DIGEST_CONFIG["poll_interval"])
@@ -0,0 +1,146 @@
+# Email Template Registry
+# Jinja2 templates compiled once, with the business-level render cached per (template, business)
+
+import hashlib
+import os
+from typing import Dict, Any, List, Optional, Union
+
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, Template, TemplateNotFound, select_autoescape
+from markupsafe import escape
+
+from ..core.config import settings
+from ..core.local_cache import LRUCache
+
+# Template configuration
+EMAIL_TEMPLATE_CONFIG = {
+    "directory": os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "email"),
+    "default_template": "default.html",
+    # Variables that change per recipient; everything else is business-level and cached
+    "recipient_fields": {"visitor_name", "timestamp", "details"},
+    "max_cached_renders": 4096
+}
+
+_FIELD_MARK = "\x00"
+
+class _FieldPlaceholder:
+    """
+    Stands in for a per-recipient variable while the business-level parts are rendered
+    Attribute and item access extend the path, so {{ details.location }} works too
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def __getattr__(self, name: str) -> "_FieldPlaceholder":
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _FieldPlaceholder(f"{self._path}.{name}")
+
+    def __getitem__(self, key) -> "_FieldPlaceholder":
+        return _FieldPlaceholder(f"{self._path}.{key}")
+
+    def __html__(self) -> str:
+        return f"{_FIELD_MARK}{self._path}{_FIELD_MARK}"
+
+    __str__ = __html__
+
+def _resolve(variables: Dict[str, Any], path: str) -> Any:
+    """Look up a dotted path in the render variables, missing values render empty"""
+
+    value: Any = variables
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part)
+        else:
+            value = getattr(value, part, None)
+        if value is None:
+            return ""
+    return value
+
+class EmailTemplateRegistry:
+    """
+    Compiles every email template once and renders them with autoescaping.
+    The output with business-level variables applied is cached as static
+    segments, so bulk sends only escape and join the per-recipient fields.
+    Recipient fields must be printed ({{ ... }}), not used in control flow
+    """
+
+    def __init__(self, directory: str, bytecode_cache_dir: Optional[str] = None):
+        self.environment = Environment(
+            loader=FileSystemLoader(directory),
+            autoescape=select_autoescape(["html", "xml"]),
+            bytecode_cache=FileSystemBytecodeCache(bytecode_cache_dir) if bytecode_cache_dir else FileSystemBytecodeCache(),
+            auto_reload=False
+        )
+        self._templates: Dict[str, Template] = {}
+        self._segments = LRUCache(maxsize=EMAIL_TEMPLATE_CONFIG["max_cached_renders"])
+
+    def load(self) -> int:
+        """Compile all templates, returns how many were loaded"""
+        self._templates = {
+            name: self.environment.get_template(name)
+            for name in self.environment.list_templates(extensions=["html"])
+        }
+        self._segments.clear()
+        return len(self._templates)
+
+    def get_template(self, template_name: str) -> Template:
+        template = self._templates.get(template_name)
+        if template is None:
+            try:
+                template = self.environment.get_template(template_name)
+            except TemplateNotFound:
+                template = self.environment.get_template(EMAIL_TEMPLATE_CONFIG["default_template"])
+            self._templates[template_name] = template
+        return template
+
+    def _business_segments(self, template_name: str, variables: Dict[str, Any], cache_key: Optional[str]) -> List[str]:
+        """
+        Render the template with recipient fields left as placeholders and split it
+        into [static, field path, static, field path, ..., static]
+        """
+
+        recipient_fields = EMAIL_TEMPLATE_CONFIG["recipient_fields"]
+        business_context = {
+            key: value for key, value in variables.items() if key not in recipient_fields
+        }
+
+        key = None
+        if cache_key is not None:
+            fingerprint = hashlib.sha1(repr(sorted(business_context.items())).encode()).hexdigest()
+            key = (template_name, cache_key, fingerprint)
+            segments = self._segments.get(key)
+            if segments is not None:
+                return segments
+
+        context = dict(business_context)
+        context.update({field: _FieldPlaceholder(field) for field in recipient_fields})
+        segments = self.get_template(template_name).render(**context).split(_FIELD_MARK)
+
+        if key is not None:
+            self._segments.set(key, segments)
+        return segments
+
+    def render(self, template_name: str, variables: Dict[str, Any], cache_key: Optional[str] = None) -> str:
+        """
+        Render a template; cache_key (e.g. the business id) enables the segment cache
+        """
+
+        segments = self._business_segments(template_name, variables, cache_key)
+
+        parts = []
+        for index, segment in enumerate(segments):
+            if index % 2:
+                parts.append(str(escape(_resolve(variables, segment))))
+            else:
+                parts.append(segment)
+        return "".join(parts)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {"templates": len(self._templates), **self._segments.stats()}
+
+# Global template registry, loaded at startup
+email_templates = EmailTemplateRegistry(
+    EMAIL_TEMPLATE_CONFIG["directory"],
+    bytecode_cache_dir=settings.EMAIL_TEMPLATE_CACHE_DIR
+)
@@ -11,10 +11,10 @@ import pickle
 from datetime import datetime, timedelta
 import asyncio
 
+from ..core import codec
 from ..core.config import settings
-from ..database import get_redis
+from ..core.redis_client import get_redis
 from ..models.access_control import FaceRecognitionData
-import json
 
 # Face recognition configuration
 FACE_RECOGNITION_CONFIG = {
@@ -24,6 +24,30 @@ FACE_RECOGNITION_CONFIG = {
     "upsamples": 1     # How many times to upsample image for detection
 }
 
+async def _load_face_records(redis_client, business_id: str, visitor_ids) -> List[tuple]:
+    """
+    Load the face data of many visitors with one MGET
+    Returns (visitor_id, face_data) pairs, skipping missing or corrupt entries
+    """
+    
+    visitor_ids = [
+        visitor_id.decode('utf-8') if isinstance(visitor_id, bytes) else visitor_id
+        for visitor_id in visitor_ids
+    ]
+    if not visitor_ids:
+        return []
+    
+    values = await redis_client.mget([f"face_data:{business_id}:{visitor_id}" for visitor_id in visitor_ids])
+    
+    records = []
+    for visitor_id, face_data_str in zip(visitor_ids, values):
+        if face_data_str:
+            try:
+                records.append((visitor_id, codec.decode(face_data_str)))
+            except ValueError:
+                continue
+    return records
+
 async def register_face(
     visitor_id: str,
     business_id: str,
@@ -92,7 +116,7 @@ async def register_face(
         # Store with business-specific key
         await redis_client.set(
             f"face_data:{business_id}:{visitor_id}",
-            json.dumps(face_data),
+            codec.encode(face_data),
             ex=30 * 24 * 60 * 60  # Expire in 30 days
         )
         
@@ -172,21 +196,16 @@ async def recognize_face(
         
         # Load all registered face encodings
         registered_faces = []
-        for visitor_id_bytes in registered_visitor_ids:
-            visitor_id = visitor_id_bytes.decode('utf-8')
-            face_data_str = await redis_client.get(f"face_data:{business_id}:{visitor_id}")
-            
-            if face_data_str:
-                try:
-                    face_data = json.loads(face_data_str)
-                    if face_data.get("is_active", True):
-                        registered_faces.append({
-                            "visitor_id": visitor_id,
-                            "visitor_name": face_data["visitor_name"],
-                            "encoding": np.array(face_data["face_encoding"])
-                        })
-                except (json.JSONDecodeError, KeyError):
-                    continue
+        for visitor_id, face_data in await _load_face_records(redis_client, business_id, registered_visitor_ids):
+            try:
+                if face_data.get("is_active", True):
+                    registered_faces.append({
+                        "visitor_id": visitor_id,
+                        "visitor_name": face_data["visitor_name"],
+                        "encoding": np.array(face_data["face_encoding"])
+                    })
+            except KeyError:
+                continue
         
         if not registered_faces:
             return {
@@ -256,11 +275,11 @@ async def update_face_recognition_stats(business_id: str, visitor_id: str) -> bo
         
         face_data_str = await redis_client.get(face_data_key)
         if face_data_str:
-            face_data = json.loads(face_data_str)
+            face_data = codec.decode(face_data_str)
             face_data["last_recognition"] = datetime.utcnow().isoformat()
             face_data["recognition_count"] = face_data.get("recognition_count", 0) + 1
             
-            await redis_client.set(face_data_key, json.dumps(face_data))
+            await redis_client.set(face_data_key, codec.encode(face_data))
             return True
             
     except Exception:
@@ -320,23 +339,18 @@ async def get_business_face_registrations(business_id: str) -> Dict[str, Any]:
         visitor_ids = await redis_client.smembers(f"face_index:{business_id}")
         
         registrations = []
-        for visitor_id_bytes in visitor_ids:
-            visitor_id = visitor_id_bytes.decode('utf-8')
-            face_data_str = await redis_client.get(f"face_data:{business_id}:{visitor_id}")
-            
-            if face_data_str:
-                try:
-                    face_data = json.loads(face_data_str)
-                    registrations.append({
-                        "visitor_id": visitor_id,
-                        "visitor_name": face_data["visitor_name"],
-                        "registered_at": face_data["registered_at"],
-                        "last_recognition": face_data.get("last_recognition"),
-                        "recognition_count": face_data.get("recognition_count", 0),
-                        "is_active": face_data.get("is_active", True)
-                    })
-                except (json.JSONDecodeError, KeyError):
-                    continue
+        for visitor_id, face_data in await _load_face_records(redis_client, business_id, visitor_ids):
+            try:
+                registrations.append({
+                    "visitor_id": visitor_id,
+                    "visitor_name": face_data["visitor_name"],
+                    "registered_at": face_data["registered_at"],
+                    "last_recognition": face_data.get("last_recognition"),
+                    "recognition_count": face_data.get("recognition_count", 0),
+                    "is_active": face_data.get("is_active", True)
+                })
+            except KeyError:
+                continue
         
         return {
             "success": True,
@@ -464,28 +478,18 @@ async def get_face_recognition_analytics(business_id: str) -> Dict[str, Any]:
         now = datetime.utcnow()
         recent_cutoff = now - timedelta(days=7)
         
-        for visitor_id_bytes in visitor_ids:
-            visitor_id = visitor_id_bytes.decode('utf-8')
-            face_data_str = await redis_client.get(f"face_data:{business_id}:{visitor_id}")
+        for visitor_id, face_data in await _load_face_records(redis_client, business_id, visitor_ids):
+            if face_data.get("is_active", True):
+                active_registrations += 1
             
-            if face_data_str:
-                try:
-                    face_data = json.loads(face_data_str)
-                    
-                    if face_data.get("is_active", True):
-                        active_registrations += 1
-                    
-                    recognition_count = face_data.get("recognition_count", 0)
-                    total_recognitions += recognition_count
-                    
-                    last_recognition = face_data.get("last_recognition")
-                    if last_recognition:
-                        last_recognition_date = datetime.fromisoformat(last_recognition)
-                        if last_recognition_date > recent_cutoff:
-                            recent_recognitions += recognition_count
-                            
-                except (json.JSONDecodeError, KeyError):
-                    continue
+            recognition_count = face_data.get("recognition_count", 0)
+            total_recognitions += recognition_count
+            
+            last_recognition = face_data.get("last_recognition")
+            if last_recognition:
+                last_recognition_date = datetime.fromisoformat(last_recognition)
+                if last_recognition_date > recent_cutoff:
+                    recent_recognitions += recognition_count
         
         return {
             "total_registrations": total_registrations,
@@ -532,21 +536,16 @@ async def bulk_face_recognition(business_id: str, image_data: str) -> Dict[str,
         registered_visitor_ids = await redis_client.smembers(f"face_index:{business_id}")
         
         registered_faces = []
-        for visitor_id_bytes in registered_visitor_ids:
-            visitor_id = visitor_id_bytes.decode('utf-8')
-            face_data_str = await redis_client.get(f"face_data:{business_id}:{visitor_id}")
-            
-            if face_data_str:
-                try:
-                    face_data = json.loads(face_data_str)
-                    if face_data.get("is_active", True):
-                        registered_faces.append({
-                            "visitor_id": visitor_id,
-                            "visitor_name": face_data["visitor_name"],
-                            "encoding": np.array(face_data["face_encoding"])
-                        })
-                except (json.JSONDecodeError, KeyError):
-                    continue
+        for visitor_id, face_data in await _load_face_records(redis_client, business_id, registered_visitor_ids):
+            try:
+                if face_data.get("is_active", True):
+                    registered_faces.append({
+                        "visitor_id": visitor_id,
+                        "visitor_name": face_data["visitor_name"],
+                        "encoding": np.array(face_data["face_encoding"])
+                    })
+            except KeyError:
+                continue
         
         # Compare each detected face
         recognized_faces = []
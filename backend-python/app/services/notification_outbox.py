@@ -0,0 +1,362 @@
+# Notification Outbox
+# Durable Redis Stream outbox so routers never wait on email, SMS or push providers
+
+import asyncio
+import json
+import os
+import random
+import socket
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, Any, List, Tuple
+
+import redis
+
+from ..core import codec
+from ..models.business import Business
+from ..models.access_control import Visitor
+from .notification_service import (
+    resolve_access_channels,
+    send_access_email,
+    send_access_sms,
+    send_access_push,
+    sendgrid_client,
+    twilio_client
+)
+from ..core.redis_client import get_redis
+
+# Outbox configuration
+OUTBOX_CONFIG = {
+    "stream": "notification_outbox",
+    "group": "notification_dispatchers",
+    "retry_key": "notification_outbox:retry",       # zset of scheduled retries, scored by due time
+    "dead_letter_stream": "notification_outbox:dead",
+    "max_stream_length": 100000,
+    "max_dead_letters": 10000,
+    "workers": 32,                   # Deliveries in flight per process
+    "channel_concurrency": {         # Deliveries in flight per channel per process
+        "email": 8,
+        "sms": 4,
+        "push": 16
+    },
+    "delivery_timeout": 30,          # Seconds before a delivery attempt counts as failed
+    "max_attempts": 5,
+    "retry_base_delay": 5,           # Seconds, doubled on every attempt
+    "retry_max_delay": 900,
+    "block_ms": 1000,
+    "claim_idle_ms": 300000,         # Take over deliveries left pending by a dead worker
+    "claim_interval": 60
+}
+
+# Move due retries back into the stream atomically, so two workers cannot both requeue one
+# KEYS[1] = retry zset, KEYS[2] = outbox stream
+# ARGV[1] = now (epoch seconds), ARGV[2] = batch size, ARGV[3] = stream max length
+PROMOTE_RETRIES_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, member in ipairs(due) do
+    local fields = {}
+    for field, value in pairs(cjson.decode(member)) do
+        table.insert(fields, field)
+        table.insert(fields, tostring(value))
+    end
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', unpack(fields))
+    redis.call('ZREM', KEYS[1], member)
+end
+return #due
+"""
+
+_promote_script = None
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def _snapshot_business(business: Business) -> Dict[str, Any]:
+    return {
+        "id": business.id,
+        "name": business.name,
+        "email": business.email,
+        "address": business.address,
+        "city": business.city
+    }
+
+def _snapshot_visitor(visitor: Visitor) -> Dict[str, Any]:
+    return {
+        "id": visitor.id,
+        "name": visitor.name,
+        "email": visitor.email,
+        "phone": visitor.phone,
+        "user_id": visitor.user_id
+    }
+
+def _channel_available(channel: str, visitor: Visitor) -> bool:
+    """
+    Skip deliveries that can never succeed instead of retrying them
+    """
+
+    if channel == "email":
+        return bool(visitor.email) and sendgrid_client is not None
+    if channel == "sms":
+        return bool(visitor.phone) and twilio_client is not None
+    if channel == "push":
+        return bool(visitor.user_id)
+    return False
+
+# =====================================================
+# ENQUEUE
+# =====================================================
+
+async def enqueue_access_notification(
+    business: Business,
+    visitor: Visitor,
+    action: str,
+    details: Dict[str, Any] = None,
+    channels: List[str] = None
+) -> List[str]:
+    """
+    Queue an access notification, one outbox entry per channel, in one round trip
+    Returns the outbox entry ids; delivery happens in the dispatcher workers
+    """
+
+    try:
+        channels = [
+            channel for channel in await resolve_access_channels(business, visitor, channels)
+            if _channel_available(channel, visitor)
+        ]
+        if not channels:
+            return []
+
+        job = {
+            "action": action,
+            # JSON text, not the configured codec: retries are rebuilt from a JSON member in Lua
+            "business": codec.dumps_json(_snapshot_business(business)),
+            "visitor": codec.dumps_json(_snapshot_visitor(visitor)),
+            "details": codec.dumps_json(details or {}),
+            "attempt": 1,
+            "enqueued_at": datetime.utcnow().isoformat()
+        }
+
+        redis_client = get_redis()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for channel in channels:
+                pipe.xadd(
+                    OUTBOX_CONFIG["stream"],
+                    {**job, "channel": channel},
+                    maxlen=OUTBOX_CONFIG["max_stream_length"],
+                    approximate=True
+                )
+            entry_ids = await pipe.execute()
+    except Exception as e:
+        # Never fail the request because a notification could not be queued,
+        # including when its channels could not be resolved
+        print(f"Notification enqueue failed: {str(e)}")
+        return []
+
+    return [_decode(entry_id) for entry_id in entry_ids]
+
+# =====================================================
+# DISPATCH
+# =====================================================
+
+async def _deliver(fields: Dict[str, str]) -> bool:
+    """Run one channel delivery for an outbox entry"""
+
+    business = SimpleNamespace(**codec.decode(fields["business"]))
+    visitor = SimpleNamespace(**codec.decode(fields["visitor"]))
+    details = codec.decode(fields.get("details")) or {}
+    action = fields["action"]
+    channel = fields["channel"]
+
+    if channel == "email":
+        return await send_access_email(visitor, business, action, details)
+    if channel == "sms":
+        return await send_access_sms(visitor, business, action, details)
+    if channel == "push":
+        return await send_access_push(visitor.user_id, business, action, details)
+
+    raise ValueError(f"Unknown notification channel: {channel}")
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter"""
+    delay = min(OUTBOX_CONFIG["retry_base_delay"] * 2 ** (attempt - 1), OUTBOX_CONFIG["retry_max_delay"])
+    return delay * random.uniform(0.8, 1.2)
+
+async def _dispatch(
+    redis_client,
+    entry_id: str,
+    fields: Dict[str, str],
+    channel_limits: Dict[str, asyncio.Semaphore]
+):
+    """
+    Deliver one outbox entry, then acknowledge it together with its retry
+    or dead-letter record
+    """
+
+    attempt = int(fields.get("attempt") or 1)
+    error = None
+    retryable = False
+    limit = channel_limits.get(fields.get("channel"))
+
+    try:
+        if limit is None:
+            raise ValueError(f"Unknown notification channel: {fields.get('channel')}")
+        async with limit:
+            delivered = await asyncio.wait_for(_deliver(fields), OUTBOX_CONFIG["delivery_timeout"])
+        if not delivered:
+            # Rejected by the provider (bad address, missing template): retrying won't help
+            error = "Provider rejected the notification"
+    except asyncio.CancelledError:
+        raise
+    except ValueError as e:
+        delivered = False
+        error = str(e)
+    except Exception as e:
+        # Timeouts, throttling and provider outages
+        delivered = False
+        retryable = True
+        error = str(e) or type(e).__name__
+
+    async with redis_client.pipeline(transaction=True) as pipe:
+        if not delivered:
+            failed = {**fields, "attempt": attempt + 1, "last_error": error}
+            if not retryable or attempt >= OUTBOX_CONFIG["max_attempts"]:
+                failed["dead_lettered_at"] = datetime.utcnow().isoformat()
+                pipe.xadd(
+                    OUTBOX_CONFIG["dead_letter_stream"],
+                    failed,
+                    maxlen=OUTBOX_CONFIG["max_dead_letters"],
+                    approximate=True
+                )
+            else:
+                due = datetime.utcnow().timestamp() + _retry_delay(attempt)
+                pipe.zadd(OUTBOX_CONFIG["retry_key"], {json.dumps(failed, sort_keys=True): due})
+        pipe.xack(OUTBOX_CONFIG["stream"], OUTBOX_CONFIG["group"], entry_id)
+        await pipe.execute()
+
+async def _promote_due_retries(redis_client) -> int:
+    global _promote_script
+    if _promote_script is None or _promote_script.registered_client is not redis_client:
+        _promote_script = redis_client.register_script(PROMOTE_RETRIES_SCRIPT)
+
+    return await _promote_script(
+        keys=[OUTBOX_CONFIG["retry_key"], OUTBOX_CONFIG["stream"]],
+        args=[int(datetime.utcnow().timestamp()), OUTBOX_CONFIG["workers"], OUTBOX_CONFIG["max_stream_length"]]
+    )
+
+async def _ensure_group(redis_client):
+    try:
+        await redis_client.xgroup_create(OUTBOX_CONFIG["stream"], OUTBOX_CONFIG["group"], id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+def _parse_entries(entries) -> List[Tuple[str, Dict[str, str]]]:
+    return [
+        (_decode(entry_id), {_decode(k): _decode(v) for k, v in fields.items()})
+        for entry_id, fields in entries or []
+        if fields is not None
+    ]
+
+async def run_notification_dispatcher():
+    """
+    Background task: deliver outbox entries with a bounded worker pool
+    Each entry stays pending in the consumer group until it is delivered,
+    scheduled for retry or dead-lettered
+    """
+
+    group = OUTBOX_CONFIG["group"]
+    stream = OUTBOX_CONFIG["stream"]
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    channel_limits = {
+        channel: asyncio.Semaphore(limit)
+        for channel, limit in OUTBOX_CONFIG["channel_concurrency"].items()
+    }
+    in_flight = set()
+    in_flight_ids = set()
+
+    def start(redis_client, entry_id: str, fields: Dict[str, str]):
+        if entry_id in in_flight_ids:
+            return
+        task = asyncio.create_task(_dispatch(redis_client, entry_id, fields, channel_limits))
+        in_flight.add(task)
+        in_flight_ids.add(entry_id)
+        task.add_done_callback(in_flight.discard)
+        task.add_done_callback(lambda _: in_flight_ids.discard(entry_id))
+
+    while True:
+        try:
+            redis_client = get_redis()
+            await _ensure_group(redis_client)
+
+            # Entries this consumer read before a restart, then new ones
+            read_id = "0"
+            last_claim = asyncio.get_running_loop().time()
+
+            while True:
+                if len(in_flight) >= OUTBOX_CONFIG["workers"]:
+                    await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                await _promote_due_retries(redis_client)
+
+                loop_time = asyncio.get_running_loop().time()
+                if loop_time - last_claim >= OUTBOX_CONFIG["claim_interval"]:
+                    last_claim = loop_time
+                    _, claimed, *_ = await redis_client.xautoclaim(
+                        stream, group, consumer,
+                        min_idle_time=OUTBOX_CONFIG["claim_idle_ms"],
+                        count=OUTBOX_CONFIG["workers"] - len(in_flight)
+                    )
+                    for entry_id, fields in _parse_entries(claimed):
+                        start(redis_client, entry_id, fields)
+                    continue
+
+                response = await redis_client.xreadgroup(
+                    group, consumer,
+                    {stream: read_id},
+                    count=OUTBOX_CONFIG["workers"] - len(in_flight),
+                    block=None if read_id != ">" else OUTBOX_CONFIG["block_ms"]
+                )
+                entries = _parse_entries(response[0][1] if response else [])
+
+                if read_id != ">":
+                    # Walk our own pending list without re-reading entries still in flight
+                    if not entries:
+                        read_id = ">"
+                    else:
+                        read_id = entries[-1][0]
+
+                for entry_id, fields in entries:
+                    start(redis_client, entry_id, fields)
+        except asyncio.CancelledError:
+            for task in list(in_flight):
+                task.cancel()
+            raise
+        except Exception as e:
+            # Unacknowledged entries are picked up again from the pending list
+            print(f"Notification dispatcher error: {str(e)}")
+            await asyncio.sleep(5)
+
+# =====================================================
+# MONITORING
+# =====================================================
+
+async def get_outbox_stats() -> Dict[str, Any]:
+    """
+    Outbox depth, pending deliveries, scheduled retries and dead letters
+    """
+
+    redis_client = get_redis()
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.xlen(OUTBOX_CONFIG["stream"])
+        pipe.xpending(OUTBOX_CONFIG["stream"], OUTBOX_CONFIG["group"])
+        pipe.zcard(OUTBOX_CONFIG["retry_key"])
+        pipe.xlen(OUTBOX_CONFIG["dead_letter_stream"])
+        stream_length, pending, retries, dead_letters = await pipe.execute(raise_on_error=False)
+
+    return {
+        "stream_length": stream_length if not isinstance(stream_length, Exception) else 0,
+        "pending": pending.get("pending", 0) if isinstance(pending, dict) else 0,
+        "scheduled_retries": retries if not isinstance(retries, Exception) else 0,
+        "dead_letters": dead_letters if not isinstance(dead_letters, Exception) else 0
+    }
@@ -0,0 +1,380 @@
+# Notification Preference Resolution
+# Business defaults, user preferences and quiet hours merged into the channels to use for a send
+
+import asyncio
+import json
+from datetime import datetime, timedelta, time as dt_time
+from typing import Dict, Any, List, Optional, Iterable
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import select
+
+from ..core.database import async_session
+from ..core.local_cache import LRUCache
+from ..models.business import Business
+from ..models.user import User
+from ..schemas.dashboard import NotificationSettings
+from ..core.redis_client import get_redis
+
+# Preference cache configuration
+PREFERENCE_CACHE_CONFIG = {
+    "local_ttl": 60,              # Safety net if an invalidation is missed
+    "local_max_users": 50000,
+    "mget_chunk_size": 5000,      # Keys per MGET when resolving large recipient lists
+    "profile_chunk_size": 5000    # User ids per query when loading profile preferences
+}
+
+PREFERENCE_UPDATES_CHANNEL = "notification_prefs_updates"
+
+# Channel switches the user never set are left out so the business setting decides
+DEFAULT_USER_PREFERENCES = {
+    "marketing_emails": False
+}
+
+# Channels held back while the recipient is in quiet hours
+QUIET_HOURS_MUTED_CHANNELS = {"sms", "push"}
+
+# user_id -> stored preferences ({} when the user never saved any)
+_local_prefs = LRUCache(
+    maxsize=PREFERENCE_CACHE_CONFIG["local_max_users"],
+    ttl=PREFERENCE_CACHE_CONFIG["local_ttl"]
+)
+
+# user_id -> User.notification_preferences ({} when the column is empty)
+_local_profiles = LRUCache(
+    maxsize=PREFERENCE_CACHE_CONFIG["local_max_users"],
+    ttl=PREFERENCE_CACHE_CONFIG["local_ttl"]
+)
+
+def _prefs_key(user_id: str) -> str:
+    return f"notification_prefs:{user_id}"
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def _parse_stored(raw) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    try:
+        stored = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    return stored if isinstance(stored, dict) else {}
+
+# =====================================================
+# QUIET HOURS
+# =====================================================
+
+def get_business_notification_settings(business: Business) -> NotificationSettings:
+    """
+    Alert preferences stored under business.settings["notification_settings"]
+    """
+
+    stored = (business.settings or {}).get("notification_settings") or {}
+    try:
+        return NotificationSettings(**stored)
+    except (TypeError, ValueError):
+        return NotificationSettings()
+
+def _parse_hhmm(value: Optional[str]) -> Optional[dt_time]:
+    try:
+        return datetime.strptime(value, "%H:%M").time() if value else None
+    except ValueError:
+        return None
+
+def quiet_hours_end(
+    quiet_start: Optional[str],
+    quiet_end: Optional[str],
+    timezone_name: str,
+    now: Optional[datetime] = None
+) -> Optional[datetime]:
+    """
+    If `now` (UTC) falls inside the quiet hours, return the UTC time they end
+    Windows that wrap midnight (22:00-07:00) are supported. Returns None outside quiet hours
+    """
+
+    start = _parse_hhmm(quiet_start)
+    end = _parse_hhmm(quiet_end)
+    if start is None or end is None or start == end:
+        return None
+
+    try:
+        zone = ZoneInfo(timezone_name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        zone = ZoneInfo("UTC")
+
+    utc = ZoneInfo("UTC")
+    local_now = (now or datetime.utcnow()).replace(tzinfo=utc).astimezone(zone)
+    current = local_now.time()
+
+    if start < end:
+        in_quiet = start <= current < end
+    else:
+        in_quiet = current >= start or current < end
+
+    if not in_quiet:
+        return None
+
+    end_date = local_now.date()
+    if current >= end:
+        end_date += timedelta(days=1)
+    local_end = datetime.combine(end_date, end, tzinfo=zone)
+
+    return local_end.astimezone(utc).replace(tzinfo=None)
+
+# =====================================================
+# STORED USER PREFERENCES
+# =====================================================
+
+async def get_user_preferences(user_id: str) -> Dict[str, Any]:
+    """
+    Preferences a user saved, {} if none; in-process copy first, then Redis
+    """
+
+    stored = _local_prefs.get(user_id)
+    if stored is not None:
+        return stored
+
+    stored = _parse_stored(await get_redis().get(_prefs_key(user_id)))
+    _local_prefs.set(user_id, stored)
+    return stored
+
+async def get_user_preferences_many(user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Stored preferences for many users; everything not cached locally comes from one MGET
+    (split into chunks of mget_chunk_size for very large recipient lists)
+    """
+
+    result = {}
+    missing = []
+    for user_id in dict.fromkeys(user_ids):
+        stored = _local_prefs.get(user_id)
+        if stored is None:
+            missing.append(user_id)
+        else:
+            result[user_id] = stored
+
+    if not missing:
+        return result
+
+    chunk_size = PREFERENCE_CACHE_CONFIG["mget_chunk_size"]
+    redis_client = get_redis()
+    for start in range(0, len(missing), chunk_size):
+        chunk = missing[start:start + chunk_size]
+        values = await redis_client.mget([_prefs_key(user_id) for user_id in chunk])
+        for user_id, raw in zip(chunk, values):
+            stored = _parse_stored(raw)
+            _local_prefs.set(user_id, stored)
+            result[user_id] = stored
+
+    return result
+
+async def set_user_preferences(user_id: str, preferences: Dict[str, Any]) -> bool:
+    """
+    Save a user's preferences and tell every worker to drop its cached copy
+    """
+
+    redis_client = get_redis()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.set(_prefs_key(user_id), json.dumps(preferences))
+        pipe.publish(PREFERENCE_UPDATES_CHANNEL, user_id)
+        await pipe.execute()
+
+    _local_prefs.set(user_id, dict(preferences))
+    return True
+
+def _profile_user_id(user_id: Any) -> Optional[int]:
+    """
+    User.id is an integer column; Visitor.user_id and the preference keys carry it as a string
+    """
+
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+async def get_profile_preferences_many(user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    User.notification_preferences for many users, keyed by the ids as given; everything not
+    cached locally comes from one query per profile_chunk_size ids
+    """
+
+    result = {}
+    missing = {}
+    for user_id in dict.fromkeys(user_ids):
+        profile = _local_profiles.get(str(user_id))
+        if profile is not None:
+            result[user_id] = profile
+            continue
+
+        column_id = _profile_user_id(user_id)
+        if column_id is None:
+            # Not a users.id, so there is no profile to load
+            result[user_id] = {}
+        else:
+            missing.setdefault(column_id, []).append(user_id)
+
+    if not missing:
+        return result
+
+    chunk_size = PREFERENCE_CACHE_CONFIG["profile_chunk_size"]
+    column_ids = list(missing)
+    async with async_session() as session:
+        for start in range(0, len(column_ids), chunk_size):
+            chunk = column_ids[start:start + chunk_size]
+            rows = await session.execute(
+                select(User.id, User.notification_preferences).where(User.id.in_(chunk))
+            )
+            loaded = {column_id: prefs for column_id, prefs in rows.all()}
+            for column_id in chunk:
+                profile = loaded.get(column_id)
+                profile = profile if isinstance(profile, dict) else {}
+                for user_id in missing[column_id]:
+                    _local_profiles.set(str(user_id), profile)
+                    result[user_id] = profile
+
+    return result
+
+async def get_profile_preferences(user_id: str) -> Dict[str, Any]:
+    """
+    User.notification_preferences for one user, {} if none
+    """
+
+    profiles = await get_profile_preferences_many([user_id])
+    return profiles.get(user_id, {})
+
+def effective_user_preferences(stored: Dict[str, Any], profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Defaults, then the User.notification_preferences column, then what was saved through the API
+    """
+
+    preferences = dict(DEFAULT_USER_PREFERENCES)
+    preferences.update(profile or {})
+    preferences.update(stored or {})
+    return preferences
+
+# =====================================================
+# RESOLUTION
+# =====================================================
+
+def business_default_channels(business: Business) -> List[str]:
+    """
+    Channels a business sends visitor notifications on
+    """
+
+    settings_data = business.settings or {}
+    channels = []
+
+    if settings_data.get("email_notifications", True):
+        channels.append("email")
+    if settings_data.get("sms_notifications", False):
+        channels.append("sms")
+    if settings_data.get("push_notifications", True):
+        channels.append("push")
+
+    return channels
+
+def merge_preferences(
+    business: Business,
+    user_preferences: Optional[Dict[str, Any]],
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Channels for one recipient: business defaults, narrowed by the user's own switches
+    (users can opt out of a channel, not into one the business disabled), with SMS and
+    push held back during the user's quiet hours. Returns channels and quiet_until
+    """
+
+    channels = business_default_channels(business)
+
+    if user_preferences is not None:
+        channels = [
+            channel for channel in channels
+            if user_preferences.get(f"{channel}_notifications", True)
+        ]
+
+        quiet_until = quiet_hours_end(
+            user_preferences.get("quiet_hours_start"),
+            user_preferences.get("quiet_hours_end"),
+            user_preferences.get("timezone") or getattr(business, "timezone", None) or "UTC",
+            now
+        )
+        if quiet_until:
+            channels = [channel for channel in channels if channel not in QUIET_HOURS_MUTED_CHANNELS]
+    else:
+        quiet_until = None
+
+    return {"channels": channels, "quiet_until": quiet_until}
+
+async def resolve_preferences(
+    business: Business,
+    user_id: Optional[str] = None,
+    profile: Optional[Dict[str, Any]] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Resolve the channels for one recipient; recipients without an account get the business defaults
+    """
+
+    if not user_id:
+        return merge_preferences(business, None, now)
+
+    stored = await get_user_preferences(user_id)
+    if profile is None:
+        profile = await get_profile_preferences(user_id)
+    return merge_preferences(business, effective_user_preferences(stored, profile), now)
+
+async def resolve_preferences_many(
+    business: Business,
+    user_ids: Iterable[str],
+    now: Optional[datetime] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Resolve channels for a recipient list with a single MGET and a single profile query
+    for the uncached users
+    """
+
+    now = now or datetime.utcnow()
+    user_ids = list(dict.fromkeys(user_ids))
+    stored, profiles = await asyncio.gather(
+        get_user_preferences_many(user_ids),
+        get_profile_preferences_many(user_ids)
+    )
+
+    return {
+        user_id: merge_preferences(
+            business,
+            effective_user_preferences(stored.get(user_id), profiles.get(user_id)),
+            now
+        )
+        for user_id in user_ids
+    }
+
+def preference_cache_stats() -> Dict[str, Any]:
+    return {"stored": _local_prefs.stats(), "profiles": _local_profiles.stats()}
+
+# =====================================================
+# CROSS-WORKER INVALIDATION
+# =====================================================
+
+async def listen_for_preference_updates():
+    """
+    Background task: drop cached preferences when another worker saves new ones
+    """
+
+    while True:
+        pubsub = get_redis().pubsub()
+        try:
+            await pubsub.subscribe(PREFERENCE_UPDATES_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _local_prefs.delete(_decode(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Updates may have been missed while disconnected
+            print(f"Preference update listener error: {str(e)}")
+            _local_prefs.clear()
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.close()
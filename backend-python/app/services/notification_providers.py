@@ -0,0 +1,181 @@
+# Notification Provider Clients
+# Async SendGrid and Twilio clients over pooled keep-alive HTTP connections
+
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+
+from ..core.config import settings
+from ..core.exceptions import ExternalServiceException
+
+# Provider HTTP configuration
+PROVIDER_HTTP_CONFIG = {
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 30.0,
+    "connect_timeout": 3.0
+}
+
+# Status codes worth retrying; other 4xx responses are permanent rejections
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class AsyncRateLimiter:
+    """
+    Token bucket limiter for outbound provider calls
+    acquire() waits until a token is available instead of failing
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+def _build_http_client(base_url: str, **kwargs) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(
+            settings.NOTIFICATION_HTTP_TIMEOUT,
+            connect=PROVIDER_HTTP_CONFIG["connect_timeout"]
+        ),
+        limits=httpx.Limits(
+            max_connections=PROVIDER_HTTP_CONFIG["max_connections"],
+            max_keepalive_connections=PROVIDER_HTTP_CONFIG["max_keepalive_connections"],
+            keepalive_expiry=PROVIDER_HTTP_CONFIG["keepalive_expiry"]
+        ),
+        **kwargs
+    )
+
+class ProviderClient:
+    """Shared request handling for provider clients"""
+
+    provider = "provider"
+
+    def __init__(self, http_client: httpx.AsyncClient, rate_limiter: AsyncRateLimiter):
+        self.http_client = http_client
+        self.rate_limiter = rate_limiter
+
+    async def _post(self, path: str, **kwargs) -> httpx.Response:
+        """
+        POST to the provider, rate limited
+        Raises ExternalServiceException for transient failures so callers can retry
+        """
+
+        await self.rate_limiter.acquire()
+
+        try:
+            response = await self.http_client.post(path, **kwargs)
+        except httpx.TimeoutException as e:
+            raise ExternalServiceException(f"{self.provider} request timed out", {"error": str(e)})
+        except httpx.TransportError as e:
+            raise ExternalServiceException(f"{self.provider} connection failed", {"error": str(e)})
+
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            raise ExternalServiceException(
+                f"{self.provider} temporarily unavailable",
+                {"status_code": response.status_code, "retry_after": response.headers.get("Retry-After")}
+            )
+
+        return response
+
+    async def close(self):
+        await self.http_client.aclose()
+
+class SendGridClient(ProviderClient):
+    """SendGrid v3 mail send API"""
+
+    provider = "SendGrid"
+
+    def __init__(self, api_key: str, base_url: str, rate_per_second: float):
+        super().__init__(
+            _build_http_client(base_url, headers={"Authorization": f"Bearer {api_key}"}),
+            AsyncRateLimiter(rate_per_second)
+        )
+
+    async def send_email(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        from_email: str
+    ) -> bool:
+        """Returns True when SendGrid accepted the message"""
+
+        response = await self._post("/v3/mail/send", json={
+            "personalizations": [{"to": [{"email": to_email}]}],
+            "from": {"email": from_email},
+            "subject": subject,
+            "content": [{"type": "text/html", "value": html_content}]
+        })
+
+        return response.status_code == 202
+
+class TwilioClient(ProviderClient):
+    """Twilio programmable messaging API"""
+
+    provider = "Twilio"
+
+    def __init__(self, account_sid: str, auth_token: str, base_url: str, rate_per_second: float):
+        super().__init__(
+            _build_http_client(base_url, auth=(account_sid, auth_token)),
+            AsyncRateLimiter(rate_per_second)
+        )
+        self.account_sid = account_sid
+
+    async def send_sms(self, to: str, body: str, from_: str) -> Optional[str]:
+        """Returns the message sid, None if Twilio rejected the message"""
+
+        response = await self._post(
+            f"/2010-04-01/Accounts/{self.account_sid}/Messages.json",
+            data={"To": to, "From": from_, "Body": body}
+        )
+
+        if response.status_code != 201:
+            return None
+
+        return response.json().get("sid")
+
+# =====================================================
+# SHARED INSTANCES
+# =====================================================
+
+def create_sendgrid_client() -> Optional[SendGridClient]:
+    if not settings.SENDGRID_API_KEY:
+        return None
+    return SendGridClient(
+        api_key=settings.SENDGRID_API_KEY,
+        base_url=settings.SENDGRID_API_URL,
+        rate_per_second=settings.SENDGRID_RATE_LIMIT_PER_SECOND
+    )
+
+def create_twilio_client() -> Optional[TwilioClient]:
+    if not settings.TWILIO_ACCOUNT_SID:
+        return None
+    return TwilioClient(
+        account_sid=settings.TWILIO_ACCOUNT_SID,
+        auth_token=settings.TWILIO_AUTH_TOKEN,
+        base_url=settings.TWILIO_API_URL,
+        rate_per_second=settings.TWILIO_RATE_LIMIT_PER_SECOND
+    )
+
+async def close_provider_clients(*clients: Optional[ProviderClient]):
+    """Close pooled connections on shutdown"""
+    for client in clients:
+        if client is not None:
+            await client.close()
@@ -2,24 +2,81 @@
 # Handles email, SMS, and push notifications for access control events
 
 import asyncio
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Awaitable
 from datetime import datetime
 import json
+import re
 
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
-from twilio.rest import Client as TwilioClient
 import redis
 
+from ..core import codec
 from ..core.config import settings
+from ..core.exceptions import ExternalServiceException
+from ..core.realtime import user_notifications_channel
 from ..models.user import User
 from ..models.business import Business
 from ..models.access_control import Visitor
-from ..database import get_redis
+from ..core.redis_client import get_redis
+from .notification_providers import create_sendgrid_client, create_twilio_client, close_provider_clients
+from .email_templates import email_templates
+from .notification_preferences import (
+    resolve_preferences,
+    get_user_preferences,
+    get_profile_preferences,
+    set_user_preferences,
+    effective_user_preferences
+)
 
-# Initialize external services
-sendgrid_client = SendGridAPIClient(api_key=settings.SENDGRID_API_KEY) if settings.SENDGRID_API_KEY else None
-twilio_client = TwilioClient(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN) if settings.TWILIO_ACCOUNT_SID else None
+# Initialize external services (async clients, pooled keep-alive connections)
+sendgrid_client = create_sendgrid_client()
+twilio_client = create_twilio_client()
+
+async def close_notification_clients():
+    """Release provider connections on shutdown"""
+    await close_provider_clients(sendgrid_client, twilio_client)
+
+# Fan-out configuration
+NOTIFICATION_FANOUT_CONFIG = {
+    "deadline_seconds": 10.0,          # Shared by all channels of one notification
+    "business_email_concurrency": 5,   # Recipients emailed at once
+    "business_email_timeout": 10.0     # Per recipient, counted from when its send starts
+}
+
+async def dispatch_with_deadline(
+    jobs: Dict[str, Awaitable[bool]],
+    deadline: Optional[float] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run notification jobs concurrently under one shared deadline
+    Each job succeeds or fails on its own; jobs still running at the deadline
+    are cancelled. Returns {name: {"success": bool, "error": str or None}}
+    """
+    
+    if not jobs:
+        return {}
+    
+    tasks = {name: asyncio.ensure_future(job) for name, job in jobs.items()}
+    done, pending = await asyncio.wait(
+        tasks.values(),
+        timeout=NOTIFICATION_FANOUT_CONFIG["deadline_seconds"] if deadline is None else deadline
+    )
+    
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    
+    outcomes = {}
+    for name, task in tasks.items():
+        if task in pending:
+            outcomes[name] = {"success": False, "error": "deadline exceeded"}
+        elif task.exception() is not None:
+            error = task.exception()
+            outcomes[name] = {"success": False, "error": getattr(error, "message", None) or str(error) or type(error).__name__}
+        else:
+            outcomes[name] = {"success": bool(task.result()), "error": None}
+    
+    return outcomes
 
 # =====================================================
 # EMAIL NOTIFICATIONS
@@ -33,6 +90,8 @@ async def send_email_notification(
 ) -> bool:
     """
     Send email notification via SendGrid
+    Returns False if the message was rejected; raises ExternalServiceException
+    on timeouts, throttling and provider errors so the outbox can retry
     """
     
     if not sendgrid_client:
@@ -40,16 +99,15 @@ async def send_email_notification(
         return False
     
     try:
-        message = Mail(
-            from_email=from_email or settings.FROM_EMAIL,
-            to_emails=to_email,
+        return await sendgrid_client.send_email(
+            to_email=to_email,
             subject=subject,
-            html_content=html_content
+            html_content=html_content,
+            from_email=from_email or settings.FROM_EMAIL
         )
         
-        response = sendgrid_client.send(message)
-        return response.status_code == 202
-        
+    except ExternalServiceException:
+        raise
     except Exception as e:
         print(f"Email notification failed: {str(e)}")
         return False
@@ -105,7 +163,8 @@ async def send_access_email(
             "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M"),
             "details": details or {},
             "app_url": settings.APP_URL
-        }
+        },
+        cache_key=business.id
     )
     
     return await send_email_notification(
@@ -129,12 +188,33 @@ async def send_business_notification_email(
         # TODO: Get admin emails from business employees
         recipient_emails = [business.email]
     
-    success_count = 0
-    for email in recipient_emails:
-        if await send_email_notification(email, subject, content):
-            success_count += 1
+    # Recipients in parallel, bounded so a long list cannot exhaust the provider pool
+    concurrency = NOTIFICATION_FANOUT_CONFIG["business_email_concurrency"]
+    send_timeout = NOTIFICATION_FANOUT_CONFIG["business_email_timeout"]
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def send_bounded(email: str) -> bool:
+        async with semaphore:
+            # Time spent waiting for a slot does not count against the recipient
+            try:
+                return await asyncio.wait_for(send_email_notification(email, subject, content), send_timeout)
+            except asyncio.TimeoutError:
+                raise ExternalServiceException(f"Email send timed out after {send_timeout:g}s")
+    
+    recipients = list(dict.fromkeys(recipient_emails))
+    
+    # Each send has its own timeout, so the overall deadline only has to cover every batch
+    batches = -(-len(recipients) // concurrency)
+    outcomes = await dispatch_with_deadline(
+        {email: send_bounded(email) for email in recipients},
+        deadline=batches * send_timeout + 1
+    )
     
-    return success_count > 0
+    for email, outcome in outcomes.items():
+        if outcome["error"]:
+            print(f"Business notification to {email} failed: {outcome['error']}")
+    
+    return any(outcome["success"] for outcome in outcomes.values())
 
 # =====================================================
 # SMS NOTIFICATIONS
@@ -146,6 +226,8 @@ async def send_sms_notification(
 ) -> bool:
     """
     Send SMS notification via Twilio
+    Returns False if the message was rejected; raises ExternalServiceException
+    on timeouts, throttling and provider errors so the outbox can retry
     """
     
     if not twilio_client:
@@ -157,14 +239,16 @@ async def send_sms_notification(
         if not phone_number.startswith('+'):
             phone_number = f"+52{phone_number}"  # Mexico country code
         
-        message = twilio_client.messages.create(
+        message_sid = await twilio_client.send_sms(
+            to=phone_number,
             body=message,
-            from_=settings.TWILIO_PHONE_NUMBER,
-            to=phone_number
+            from_=settings.TWILIO_PHONE_NUMBER
         )
         
-        return message.sid is not None
+        return message_sid is not None
         
+    except ExternalServiceException:
+        raise
     except Exception as e:
         print(f"SMS notification failed: {str(e)}")
         return False
@@ -201,6 +285,109 @@ async def send_access_sms(
 # PUSH NOTIFICATIONS
 # =====================================================
 
+# Push notifications live in a capped stream per user; the stream id is the
+# notification id, and read state is a single cursor (the last read id)
+PUSH_STREAM_CONFIG = {
+    "max_length": 100,       # Approximate cap per user (XADD MAXLEN ~)
+    "page_size": 50,
+    "max_page_size": 100
+}
+
+def _push_stream_key(user_id: str) -> str:
+    return f"notification_stream:{user_id}"
+
+def _push_cursor_key(user_id: str) -> str:
+    return f"notification_cursor:{user_id}"
+
+# Append and announce in one round trip
+# KEYS[1] = user stream
+# ARGV[1] = max length, ARGV[2..5] = title, body, data (JSON), timestamp,
+# ARGV[6] = live channel, ARGV[7] = notification JSON without the id
+# Returns the new stream id
+PUSH_APPEND_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*',
+    'title', ARGV[2], 'body', ARGV[3], 'data', ARGV[4], 'timestamp', ARGV[5])
+redis.call('PUBLISH', ARGV[6], '{"id":"' .. id .. '",' .. string.sub(ARGV[7], 2))
+return id
+"""
+
+# Move the read cursor forward, never back
+# KEYS[1] = read cursor, KEYS[2] = user stream
+# ARGV[1] = last read id, empty for "everything so far"
+# Returns the cursor after the update
+PUSH_MARK_READ_SCRIPT = """
+local target = ARGV[1]
+if target == '' then
+    local last = redis.call('XREVRANGE', KEYS[2], '+', '-', 'COUNT', 1)[1]
+    if not last then
+        return redis.call('GET', KEYS[1]) or '0-0'
+    end
+    target = last[1]
+end
+
+local current = redis.call('GET', KEYS[1])
+local cur_ms, cur_seq
+if current then
+    cur_ms, cur_seq = string.match(current, '^(%d+)-(%d+)$')
+end
+-- A malformed stored cursor is overwritten rather than compared
+if cur_ms then
+    local new_ms, new_seq = string.match(target, '^(%d+)-(%d+)$')
+    cur_ms, cur_seq, new_ms, new_seq = tonumber(cur_ms), tonumber(cur_seq), tonumber(new_ms), tonumber(new_seq)
+    if new_ms < cur_ms or (new_ms == cur_ms and new_seq <= cur_seq) then
+        return current
+    end
+end
+
+redis.call('SET', KEYS[1], target)
+return target
+"""
+
+# Read cursor and the number of entries newer than it
+# KEYS[1] = user stream, KEYS[2] = read cursor
+PUSH_READ_STATE_SCRIPT = """
+local cursor = redis.call('GET', KEYS[2])
+return {cursor or '', #redis.call('XRANGE', KEYS[1], '(' .. (cursor or '0-0'), '+')}
+"""
+
+_push_scripts: Dict[str, Any] = {}
+
+def _get_push_script(redis_client, source: str):
+    script = _push_scripts.get(source)
+    if script is None or script.registered_client is not redis_client:
+        script = _push_scripts[source] = redis_client.register_script(source)
+    return script
+
+def _decode_value(value) -> Optional[str]:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def _stream_id_key(entry_id: Optional[str]):
+    """Stream ids order as (milliseconds, sequence), not as strings"""
+    if not entry_id:
+        return (0, 0)
+    milliseconds, _, sequence = entry_id.partition("-")
+    return (int(milliseconds), int(sequence or 0))
+
+def _parse_push_entry(entry_id, fields, read_cursor: Optional[str]) -> Dict[str, Any]:
+    entry_id = _decode_value(entry_id)
+    fields = {_decode_value(k): v for k, v in fields.items()}
+    
+    # Encoded with the configured codec, which may be binary
+    try:
+        data = codec.decode(fields.get("data")) or {}
+    except ValueError:
+        data = {}
+    fields = {k: _decode_value(v) for k, v in fields.items() if k != "data"}
+    
+    return {
+        "id": entry_id,
+        "title": fields.get("title"),
+        "body": fields.get("body"),
+        "data": data,
+        "timestamp": fields.get("timestamp"),
+        "read": _stream_id_key(entry_id) <= _stream_id_key(read_cursor)
+    }
+
 async def send_push_notification(
     user_id: str,
     title: str,
@@ -209,35 +396,35 @@ async def send_push_notification(
 ) -> bool:
     """
     Send push notification to mobile app
-    Uses Redis for real-time delivery
+    Appended to the user's capped stream and published to live listeners in one
+    round trip. Clients that were offline catch up with get_push_notifications(after=last_id)
     """
     
     redis_client = get_redis()
     
+    timestamp = datetime.utcnow().isoformat()
     notification = {
-        "id": f"notif_{datetime.utcnow().timestamp()}",
         "user_id": user_id,
         "title": title,
         "body": body,
         "data": data or {},
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": timestamp,
         "read": False
     }
     
     try:
-        # Store notification
-        await redis_client.lpush(
-            f"notifications:{user_id}",
-            json.dumps(notification)
-        )
-        
-        # Keep only last 100 notifications
-        await redis_client.ltrim(f"notifications:{user_id}", 0, 99)
-        
-        # Publish to real-time channel
-        await redis_client.publish(
-            f"user_notifications:{user_id}",
-            json.dumps(notification)
+        await _get_push_script(redis_client, PUSH_APPEND_SCRIPT)(
+            keys=[_push_stream_key(user_id)],
+            args=[
+                PUSH_STREAM_CONFIG["max_length"],
+                title,
+                body,
+                codec.encode(data or {}),
+                timestamp,
+                user_notifications_channel(user_id),
+                # Published as-is to browsers, so always JSON text
+                codec.dumps_json(notification)
+            ]
         )
         
         return True
@@ -246,6 +433,80 @@ async def send_push_notification(
         print(f"Push notification failed: {str(e)}")
         return False
 
+async def get_push_notifications(
+    user_id: str,
+    after: Optional[str] = None,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Page through a user's push notifications
+    With `after` (the last id the client has seen) returns newer entries oldest first,
+    so a reconnecting client resumes where it stopped; without it returns the latest
+    entries newest first. Each entry carries its read flag from the cursor
+    """
+    
+    redis_client = get_redis()
+    stream_key = _push_stream_key(user_id)
+    count = min(limit or PUSH_STREAM_CONFIG["page_size"], PUSH_STREAM_CONFIG["max_page_size"])
+    
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.get(_push_cursor_key(user_id))
+        if after:
+            pipe.xrange(stream_key, min=f"({after}", max="+", count=count)
+        else:
+            pipe.xrevrange(stream_key, max="+", min="-", count=count)
+        read_cursor, entries = await pipe.execute()
+    
+    read_cursor = _decode_value(read_cursor)
+    notifications = [_parse_push_entry(entry_id, fields, read_cursor) for entry_id, fields in entries]
+    
+    # Newest id the client now holds, the `after` of its next request
+    last_id = after
+    if notifications:
+        last_id = notifications[-1]["id"] if after else notifications[0]["id"]
+    
+    return {
+        "notifications": notifications,
+        "read_cursor": read_cursor,
+        "last_id": last_id
+    }
+
+async def mark_push_notifications_read(user_id: str, up_to: Optional[str] = None) -> Optional[str]:
+    """
+    Mark notifications read up to and including `up_to` (all of them if omitted)
+    The cursor only moves forward, so stale clients cannot unread newer entries.
+    Returns the cursor after the update
+    """
+    
+    redis_client = get_redis()
+    
+    # Reject malformed ids before they reach Redis; the cursor must be a full ms-seq id
+    if up_to and not re.fullmatch(r"\d+-\d+", up_to):
+        raise ValueError(f"Invalid stream id: {up_to}")
+    
+    cursor = await _get_push_script(redis_client, PUSH_MARK_READ_SCRIPT)(
+        keys=[_push_cursor_key(user_id), _push_stream_key(user_id)],
+        args=[up_to or ""]
+    )
+    
+    return _decode_value(cursor)
+
+async def get_push_read_state(user_id: str) -> Dict[str, Any]:
+    """
+    Read cursor and unread count (notifications newer than the cursor)
+    """
+    
+    redis_client = get_redis()
+    
+    read_cursor, unread_count = await _get_push_script(redis_client, PUSH_READ_STATE_SCRIPT)(
+        keys=[_push_stream_key(user_id), _push_cursor_key(user_id)]
+    )
+    
+    return {
+        "read_cursor": _decode_value(read_cursor) or None,
+        "unread_count": int(unread_count)
+    }
+
 async def send_access_push(
     user_id: str,
     business: Business,
@@ -294,56 +555,79 @@ async def send_access_push(
 # UNIFIED NOTIFICATION HANDLER
 # =====================================================
 
+async def resolve_access_channels(
+    business: Business,
+    visitor: Visitor,
+    channels: List[str] = None
+) -> List[str]:
+    """
+    Channels to notify a visitor on, defaulting to the business settings
+    merged with the visitor's own preferences and quiet hours
+    """
+    
+    if not channels:
+        resolved = await resolve_preferences(business, visitor.user_id)
+        channels = resolved["channels"]
+        
+        if not visitor.user_id:
+            channels = [channel for channel in channels if channel != "push"]
+    
+    return channels
+
 async def send_access_notification(
     business: Business,
     visitor: Visitor,
     action: str,
     details: Dict[str, Any] = None,
-    channels: List[str] = None
+    channels: List[str] = None,
+    deadline: Optional[float] = None
 ) -> Dict[str, bool]:
     """
-    Send notifications across multiple channels
+    Send notifications across multiple channels concurrently
+    Total latency is bounded by the slowest channel and the shared deadline.
     Returns success status for each channel
     """
     
-    if not channels:
-        # Default channels based on business settings
-        settings_data = business.settings or {}
-        channels = []
-        
-        if settings_data.get("email_notifications", True):
-            channels.append("email")
-        if settings_data.get("sms_notifications", False):
-            channels.append("sms")
-        if settings_data.get("push_notifications", True) and visitor.user_id:
-            channels.append("push")
+    channels = await resolve_access_channels(business, visitor, channels)
     
-    results = {}
+    jobs = {}
     
-    # Send email notification
+    # Email notification
     if "email" in channels:
-        results["email"] = await send_access_email(visitor, business, action, details)
+        jobs["email"] = send_access_email(visitor, business, action, details)
     
-    # Send SMS notification
+    # SMS notification
     if "sms" in channels:
-        results["sms"] = await send_access_sms(visitor, business, action, details)
+        jobs["sms"] = send_access_sms(visitor, business, action, details)
     
-    # Send push notification
+    # Push notification
     if "push" in channels and visitor.user_id:
-        results["push"] = await send_access_push(visitor.user_id, business, action, details)
+        jobs["push"] = send_access_push(visitor.user_id, business, action, details)
     
-    return results
+    outcomes = await dispatch_with_deadline(jobs, deadline)
+    
+    for channel, outcome in outcomes.items():
+        if outcome["error"]:
+            print(f"{channel} notification failed: {outcome['error']}")
+    
+    return {channel: outcome["success"] for channel, outcome in outcomes.items()}
 
 async def send_business_alert(
     business: Business,
     alert_type: str,
     message: str,
-    data: Dict[str, Any] = None
+    data: Dict[str, Any] = None,
+    immediate: bool = False
 ) -> bool:
     """
     Send alert to business administrators
+    Alerts are batched into a periodic digest unless immediate is set
     """
     
+    if not immediate:
+        from .alert_digest import queue_business_alert
+        return await queue_business_alert(business, alert_type, message, data)
+    
     # Get business admin emails from employees
     # TODO: Query business employees with admin/manager roles
     admin_emails = [business.email]
@@ -371,86 +655,18 @@ async def send_business_alert(
 # EMAIL TEMPLATES
 # =====================================================
 
-def generate_email_template(template_name: str, variables: Dict[str, Any]) -> str:
+def generate_email_template(
+    template_name: str,
+    variables: Dict[str, Any],
+    cache_key: Optional[str] = None
+) -> str:
     """
     Generate HTML email content from template
+    Templates are precompiled Jinja2 files in app/templates/email, rendered with
+    autoescaping; pass the business id as cache_key to reuse its rendered parts
     """
     
-    # Basic email templates
-    templates = {
-        "access_qr_generated.html": """
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <h2 style="color: #2563eb;">Your Access QR Code is Ready!</h2>
-            
-            <p>Hello {visitor_name},</p>
-            
-            <p>Your QR code for accessing <strong>{business_name}</strong> has been generated successfully.</p>
-            
-            <div style="background: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                <h3 style="margin-top: 0;">Visit Details:</h3>
-                <p><strong>Business:</strong> {business_name}</p>
-                <p><strong>Address:</strong> {business_address}</p>
-                <p><strong>Generated:</strong> {timestamp}</p>
-            </div>
-            
-            <p>Please present your QR code at the entrance. Have a great visit!</p>
-            
-            <p style="color: #6b7280; font-size: 12px;">
-                This QR code is valid for the time specified in your request. 
-                For support, contact the business directly.
-            </p>
-        </div>
-        """,
-        
-        "visitor_approved.html": """
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <h2 style="color: #059669;">Access Approved!</h2>
-            
-            <p>Hello {visitor_name},</p>
-            
-            <p>Great news! Your access request for <strong>{business_name}</strong> has been approved.</p>
-            
-            <p>You can now generate your QR code and visit the location.</p>
-            
-            <div style="background: #ecfdf5; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #059669;">
-                <p><strong>Next Steps:</strong></p>
-                <ol>
-                    <li>Open the AXS360 app</li>
-                    <li>Generate your access QR code</li>
-                    <li>Present it at the entrance</li>
-                </ol>
-            </div>
-            
-            <p>Welcome to {business_name}!</p>
-        </div>
-        """,
-        
-        "check_in_confirmation.html": """
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <h2 style="color: #2563eb;">Check-in Confirmed</h2>
-            
-            <p>Hello {visitor_name},</p>
-            
-            <p>You have successfully checked in to <strong>{business_name}</strong>.</p>
-            
-            <div style="background: #eff6ff; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                <p><strong>Check-in Time:</strong> {timestamp}</p>
-                <p><strong>Location:</strong> {details.location}</p>
-            </div>
-            
-            <p>Enjoy your visit! Don't forget to check out when you leave.</p>
-        </div>
-        """
-    }
-    
-    template = templates.get(template_name, "<p>Notification from AXS360</p>")
-    
-    # Replace variables
-    try:
-        return template.format(**variables)
-    except KeyError as e:
-        print(f"Template variable missing: {e}")
-        return template
+    return email_templates.render(template_name, variables, cache_key=cache_key)
 
 # =====================================================
 # NOTIFICATION PREFERENCES
@@ -464,35 +680,28 @@ async def update_notification_preferences(
     Update user notification preferences
     """
     
-    redis_client = get_redis()
-    
     try:
-        await redis_client.set(
-            f"notification_prefs:{user_id}",
-            json.dumps(preferences)
-        )
-        return True
-    except:
+        return await set_user_preferences(user_id, preferences)
+    except Exception as e:
+        print(f"Preference update failed: {str(e)}")
         return False
 
 async def get_notification_preferences(user_id: str) -> Dict[str, bool]:
     """
-    Get user notification preferences
+    Get user notification preferences (cached in process, see notification_preferences)
     """
     
-    redis_client = get_redis()
-    
     try:
-        prefs_str = await redis_client.get(f"notification_prefs:{user_id}")
-        if prefs_str:
-            return json.loads(prefs_str)
-    except:
-        pass
+        stored = await get_user_preferences(user_id)
+    except Exception:
+        stored = {}
     
-    # Default preferences
-    return {
-        "email_notifications": True,
-        "sms_notifications": False,
-        "push_notifications": True,
-        "marketing_emails": False
-    }
+    try:
+        profile = await get_profile_preferences(user_id)
+    except Exception:
+        profile = {}
+    
+    # Channels the user never switched off stay on; the business setting still applies at send time
+    preferences = {"email_notifications": True, "sms_notifications": True, "push_notifications": True}
+    preferences.update(effective_user_preferences(stored, profile))
+    return preferences
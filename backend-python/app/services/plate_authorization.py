@@ -0,0 +1,254 @@
+# Plate Authorization Cache
+# Materialized per-business set of authorized plates for gate access decisions
+#
+# The set is patched on visitor registration, approval and rejection. Nothing in the API
+# removes or deactivates a single vehicle, so a VehicleAccess row changed directly in Postgres
+# stays authorized until invalidate_business_plates() runs for its business or the Redis copy
+# expires (redis_ttl); call invalidate_business_plates() after any such out-of-band change
+
+import asyncio
+import json
+import re
+from typing import Dict, Any, Optional, Iterable
+
+from sqlalchemy.orm import Session
+
+from ..core.local_cache import LRUCache
+from ..models.access_control import Visitor, VehicleAccess
+from ..core.redis_client import get_redis
+
+# Plate cache configuration
+PLATE_CACHE_CONFIG = {
+    "redis_ttl": 7 * 24 * 60 * 60,    # Rebuild from Postgres at least weekly
+    "local_ttl": 60,                  # Safety net if an invalidation is missed
+    "local_max_businesses": 1024
+}
+
+PLATE_UPDATES_CHANNEL = "authorized_plates_updates"
+_LOADED_FIELD = "__loaded__"
+
+# business_id -> {plate: {"visitor_id", "vehicle_access_id", "visitor_name"}}
+_local_plates = LRUCache(
+    maxsize=PLATE_CACHE_CONFIG["local_max_businesses"],
+    ttl=PLATE_CACHE_CONFIG["local_ttl"]
+)
+
+def _plates_key(business_id: str) -> str:
+    return f"authorized_plates:{business_id}"
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def normalize_plate_number(plate_number: str) -> str:
+    """
+    Normalize plate text so OCR output (ABC123) matches stored plates (ABC-123)
+    """
+    return re.sub(r'[^A-Z0-9]', '', (plate_number or "").upper())
+
+def _plate_entry(visitor: Visitor, vehicle: VehicleAccess) -> Dict[str, Any]:
+    return {
+        "visitor_id": visitor.id,
+        "vehicle_access_id": vehicle.id,
+        "visitor_name": visitor.name
+    }
+
+async def _publish_update(business_id: str):
+    """Tell every worker to drop its in-process copy for this business"""
+    _local_plates.delete(business_id)
+    await get_redis().publish(PLATE_UPDATES_CHANNEL, business_id)
+
+# =====================================================
+# LOADING
+# =====================================================
+
+async def load_business_plates(db: Session, business_id: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Rebuild the authorized plate set for a business from Postgres
+    Only used on cold start or after the Redis copy expired
+    """
+
+    rows = db.query(VehicleAccess, Visitor).join(Visitor).filter(
+        Visitor.business_id == business_id,
+        Visitor.status == "approved",
+        VehicleAccess.is_active == True
+    ).all()
+
+    plates = {
+        normalize_plate_number(vehicle.plate_number): _plate_entry(visitor, vehicle)
+        for vehicle, visitor in rows
+    }
+
+    mapping = {plate: json.dumps(entry) for plate, entry in plates.items()}
+    mapping[_LOADED_FIELD] = "1"
+
+    redis_client = get_redis()
+    key = _plates_key(business_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, PLATE_CACHE_CONFIG["redis_ttl"])
+        await pipe.execute()
+
+    _local_plates.set(business_id, plates)
+    return plates
+
+async def get_business_plates(
+    business_id: str,
+    db: Optional[Session] = None
+) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Get the authorized plate map for a business
+    In-process copy first, then Redis, then Postgres rebuild if db is given
+    """
+
+    plates = _local_plates.get(business_id)
+    if plates is not None:
+        return plates
+
+    raw = await get_redis().hgetall(_plates_key(business_id))
+    if raw:
+        decoded = {_decode(field): _decode(value) for field, value in raw.items()}
+        if decoded.pop(_LOADED_FIELD, None):
+            plates = {}
+            for plate, entry in decoded.items():
+                try:
+                    plates[plate] = json.loads(entry)
+                except json.JSONDecodeError:
+                    continue
+            _local_plates.set(business_id, plates)
+            return plates
+
+    if db is not None:
+        return await load_business_plates(db, business_id)
+
+    return None
+
+async def get_authorized_vehicle(
+    business_id: str,
+    plate_number: str,
+    db: Optional[Session] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Access decision lookup: returns visitor_id, vehicle_access_id and visitor_name
+    for an authorized plate, None if the plate is not authorized for the business
+    """
+
+    plates = await get_business_plates(business_id, db)
+    if not plates:
+        return None
+
+    return plates.get(normalize_plate_number(plate_number))
+
+# =====================================================
+# MAINTENANCE
+# =====================================================
+
+async def authorize_vehicles(visitor: Visitor, vehicles: Iterable[VehicleAccess]) -> int:
+    """
+    Add an approved visitor's active vehicles to the business plate set
+    """
+
+    if visitor.status != "approved":
+        return 0
+
+    mapping = {
+        normalize_plate_number(vehicle.plate_number): json.dumps(_plate_entry(visitor, vehicle))
+        for vehicle in vehicles
+        if vehicle.is_active is not False
+    }
+
+    if not mapping:
+        return 0
+
+    redis_client = get_redis()
+    key = _plates_key(visitor.business_id)
+
+    # Only patch a materialized set; a missing one is rebuilt from Postgres on next read
+    if await redis_client.hexists(key, _LOADED_FIELD):
+        await redis_client.hset(key, mapping=mapping)
+
+    await _publish_update(visitor.business_id)
+    return len(mapping)
+
+async def _revoke_plates(
+    business_id: str,
+    visitor_id: str,
+    plate_numbers: Iterable[str]
+) -> int:
+    """
+    Remove plates from the business plate set
+    Plates re-assigned to another visitor in the meantime are left untouched
+    """
+
+    plates = [normalize_plate_number(plate) for plate in plate_numbers]
+    if not plates:
+        return 0
+
+    redis_client = get_redis()
+    key = _plates_key(business_id)
+
+    current = await redis_client.hmget(key, plates)
+    to_delete = []
+    for plate, entry in zip(plates, current):
+        if entry is None:
+            continue
+        try:
+            if json.loads(entry).get("visitor_id") == visitor_id:
+                to_delete.append(plate)
+        except json.JSONDecodeError:
+            to_delete.append(plate)
+
+    if to_delete:
+        await redis_client.hdel(key, *to_delete)
+
+    await _publish_update(business_id)
+    return len(to_delete)
+
+async def authorize_visitor(visitor: Visitor) -> int:
+    """Visitor approved: authorize all of their vehicles"""
+    return await authorize_vehicles(visitor, visitor.vehicles or [])
+
+async def revoke_visitor(visitor: Visitor) -> int:
+    """Visitor rejected or blocked: revoke all of their vehicles"""
+    return await _revoke_plates(
+        visitor.business_id,
+        visitor.id,
+        [vehicle.plate_number for vehicle in visitor.vehicles or []]
+    )
+
+async def add_vehicle(visitor: Visitor, vehicle: VehicleAccess) -> int:
+    """Vehicle registered for a visitor"""
+    return await authorize_vehicles(visitor, [vehicle])
+
+async def invalidate_business_plates(business_id: str):
+    """
+    Drop the materialized set after bulk changes; it is rebuilt from Postgres on next read
+    """
+    await get_redis().delete(_plates_key(business_id))
+    await _publish_update(business_id)
+
+# =====================================================
+# CROSS-WORKER INVALIDATION
+# =====================================================
+
+async def listen_for_plate_updates():
+    """
+    Background task: drop in-process plate sets when another worker changes them
+    """
+
+    while True:
+        pubsub = get_redis().pubsub()
+        try:
+            await pubsub.subscribe(PLATE_UPDATES_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _local_plates.delete(_decode(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Updates may have been missed while disconnected
+            print(f"Plate update listener error: {str(e)}")
+            _local_plates.clear()
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.close()
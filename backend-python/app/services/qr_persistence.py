@@ -0,0 +1,301 @@
+# QR Token Persistence Service
+# Write-behind of QR token lifecycle events from Redis to the qr_tokens table
+
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import redis
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, DBAPIError, InterfaceError, OperationalError
+
+from ..core.database import async_session
+from ..models.access_control import QRToken
+from ..core.redis_client import get_redis
+
+# Write-behind configuration
+QR_PERSISTENCE_CONFIG = {
+    "stream": "qr_token_events",
+    "group": "qr_token_writers",
+    "max_stream_length": 1000000,    # Approximate cap, only reached if the writer is down for long
+    "batch_size": 500,
+    "block_ms": 1000,
+    "claim_idle_ms": 60000,          # Take over events left pending by a dead worker or a failed flush
+    "claim_interval": 30,            # Seconds between pending event claims
+    "max_attempts": 5,               # Deliveries before an event that keeps failing is dead-lettered
+    "dead_letter_stream": "qr_token_events:dead",
+    "expiry_sweep_interval": 300     # Seconds between expired row sweeps
+}
+
+QR_EVENT_STREAM = QR_PERSISTENCE_CONFIG["stream"]
+
+logger = logging.getLogger(__name__)
+
+_qr_tokens = QRToken.__table__
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+# =====================================================
+# EVENT PRODUCERS (REDIS ONLY)
+# =====================================================
+
+def queue_token_event(pipe, event: str, access_token: str, **fields):
+    """
+    Queue a token lifecycle event on a Redis pipeline
+    Events: issued, used, expired, revoked. Postgres is written later by the writer task
+    """
+
+    entry = {"event": event, "token": access_token}
+    entry.update({key: "" if value is None else value for key, value in fields.items()})
+
+    pipe.xadd(
+        QR_EVENT_STREAM,
+        entry,
+        maxlen=QR_PERSISTENCE_CONFIG["max_stream_length"],
+        approximate=True
+    )
+
+# =====================================================
+# BATCH FLUSH
+# =====================================================
+
+def _issued_row(fields: Dict[str, str]) -> Dict[str, Any]:
+    access_type = fields.get("access_type") or "single_use"
+    return {
+        "token": fields["token"],
+        "business_id": fields["business_id"],
+        "visitor_id": fields["visitor_id"],
+        "vehicle_access_id": fields.get("vehicle_id") or None,
+        "token_type": "single_use" if access_type == "checkout_only" else access_type,
+        "access_type": "checkout_only" if access_type == "checkout_only" else "check_in",
+        "max_uses": int(fields.get("max_uses") or 0),
+        "current_uses": 0,
+        "created_at": _parse_time(fields.get("created_at")) or datetime.utcnow(),
+        "expires_at": _parse_time(fields["expires_at"]),
+        "is_active": True,
+        "visit_purpose": fields.get("visit_purpose") or None
+    }
+
+def coalesce_events(events: List[Tuple[str, Dict[str, str]]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Reduce a batch of stream events to one insert per issued token, one usage update
+    per used token and one deactivation per expired or revoked token
+    """
+
+    issued = {}
+    used = {}
+    deactivated = {}
+
+    for _, fields in events:
+        event = fields.get("event")
+        token = fields.get("token")
+        if not token:
+            continue
+
+        if event == "issued":
+            issued[token] = _issued_row(fields)
+        elif event == "used":
+            # Usage fields are absolute values from the token hash, so the latest wins
+            used[token] = {
+                "b_token": token,
+                "use_count": int(fields.get("use_count") or 0),
+                "first_used": _parse_time(fields.get("first_used")),
+                "last_used": _parse_time(fields.get("last_used"))
+            }
+        elif event in ("expired", "revoked"):
+            deactivated[token] = {"b_token": token}
+
+    return list(issued.values()), list(used.values()), list(deactivated.values())
+
+async def flush_token_events(events: List[Tuple[str, Dict[str, str]]]):
+    """
+    Write one batch of events in a single transaction
+    Every statement is idempotent, so a batch redelivered after a crash is harmless
+    """
+
+    issued, used, deactivated = coalesce_events(events)
+
+    async with async_session() as session:
+        if issued:
+            statement = insert(_qr_tokens).values(issued)
+            await session.execute(statement.on_conflict_do_nothing(index_elements=["token"]))
+
+        if used:
+            await session.execute(
+                update(_qr_tokens)
+                .where(_qr_tokens.c.token == bindparam("b_token"))
+                .values(
+                    current_uses=func.greatest(_qr_tokens.c.current_uses, bindparam("use_count")),
+                    first_used=func.coalesce(_qr_tokens.c.first_used, bindparam("first_used")),
+                    last_used=func.greatest(_qr_tokens.c.last_used, bindparam("last_used"))
+                ),
+                used
+            )
+
+        if deactivated:
+            await session.execute(
+                update(_qr_tokens)
+                .where(_qr_tokens.c.token == bindparam("b_token"))
+                .values(is_active=False),
+                deactivated
+            )
+
+        await session.commit()
+
+async def sweep_expired_tokens() -> int:
+    """
+    Deactivate rows whose tokens expired in Redis without ever being scanned
+    """
+
+    async with async_session() as session:
+        result = await session.execute(
+            update(_qr_tokens)
+            .where(_qr_tokens.c.is_active == True, _qr_tokens.c.expires_at < datetime.utcnow())
+            .values(is_active=False)
+        )
+        await session.commit()
+
+    return result.rowcount or 0
+
+# =====================================================
+# WRITER TASK
+# =====================================================
+
+async def _ensure_group(redis_client):
+    try:
+        await redis_client.xgroup_create(QR_EVENT_STREAM, QR_PERSISTENCE_CONFIG["group"], id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+def _parse_entries(response) -> List[Tuple[str, Dict[str, str]]]:
+    events = []
+    for _, entries in response or []:
+        for entry_id, fields in entries:
+            if fields is None:
+                continue
+            events.append((_decode(entry_id), {_decode(k): _decode(v) for k, v in fields.items()}))
+    return events
+
+async def _delivery_count(redis_client, entry_id: str) -> int:
+    pending = await redis_client.xpending_range(
+        QR_EVENT_STREAM, QR_PERSISTENCE_CONFIG["group"], min=entry_id, max=entry_id, count=1
+    )
+    return int(pending[0]["times_delivered"]) if pending else 0
+
+async def _dead_letter(redis_client, entry_id: str, fields: Dict[str, str], error: Exception):
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.xadd(QR_PERSISTENCE_CONFIG["dead_letter_stream"], {**fields, "entry_id": entry_id, "error": str(error)[:500]})
+        pipe.xack(QR_EVENT_STREAM, QR_PERSISTENCE_CONFIG["group"], entry_id)
+        await pipe.execute()
+
+async def _flush_and_ack(redis_client, events: List[Tuple[str, Dict[str, str]]]) -> int:
+    """
+    Flush a batch and acknowledge it. If the batch fails, retry events one by one
+    so a single bad row cannot block the stream. Events that can never be written
+    (a value the column rejects, a malformed field) are dead-lettered at once. Other
+    failing events stay pending and are claimed again later: "issued" events are
+    queued before the request commits a new visitor, so a foreign key violation is
+    usually gone on the next attempt. Events still failing after max_attempts
+    deliveries are dead-lettered too. Lost database connections are raised, leaving
+    the whole batch pending. Returns the number of events left pending
+    """
+
+    group = QR_PERSISTENCE_CONFIG["group"]
+
+    try:
+        await flush_token_events(events)
+        await redis_client.xack(QR_EVENT_STREAM, group, *[entry_id for entry_id, _ in events])
+        return 0
+    except (OperationalError, InterfaceError):
+        raise
+    except (DBAPIError, ValueError):
+        pass
+
+    pending = 0
+    for entry_id, fields in events:
+        try:
+            await flush_token_events([(entry_id, fields)])
+        except (OperationalError, InterfaceError):
+            raise
+        except (DataError, ValueError) as e:
+            logger.error(f"QR token event {entry_id} dead-lettered: {e}")
+            await _dead_letter(redis_client, entry_id, fields, e)
+            continue
+        except DBAPIError as e:
+            if await _delivery_count(redis_client, entry_id) >= QR_PERSISTENCE_CONFIG["max_attempts"]:
+                logger.error(f"QR token event {entry_id} dead-lettered: {e}")
+                await _dead_letter(redis_client, entry_id, fields, e)
+            else:
+                logger.warning(f"QR token event {entry_id} failed, will retry: {e}")
+                pending += 1
+            continue
+        await redis_client.xack(QR_EVENT_STREAM, group, entry_id)
+
+    return pending
+
+async def run_qr_token_writer():
+    """
+    Background task: drain the token event stream into Postgres in batches
+    Events stay pending in the consumer group until their batch is committed
+    """
+
+    group = QR_PERSISTENCE_CONFIG["group"]
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    last_sweep = 0.0
+    last_claim = 0.0
+
+    while True:
+        try:
+            redis_client = get_redis()
+            await _ensure_group(redis_client)
+
+            # Own pending events first (left over from a failed flush), then new ones
+            read_id = "0"
+            while True:
+                loop_time = asyncio.get_running_loop().time()
+                if loop_time - last_sweep >= QR_PERSISTENCE_CONFIG["expiry_sweep_interval"]:
+                    await sweep_expired_tokens()
+                    last_sweep = loop_time
+
+                if loop_time - last_claim >= QR_PERSISTENCE_CONFIG["claim_interval"]:
+                    last_claim = loop_time
+
+                    # Pick up events a crashed worker read but never acknowledged,
+                    # and our own events whose flush failed
+                    _, claimed, *_ = await redis_client.xautoclaim(
+                        QR_EVENT_STREAM, group, consumer,
+                        min_idle_time=QR_PERSISTENCE_CONFIG["claim_idle_ms"],
+                        count=QR_PERSISTENCE_CONFIG["batch_size"]
+                    )
+                    if claimed:
+                        read_id = "0"
+
+                response = await redis_client.xreadgroup(
+                    group, consumer,
+                    {QR_EVENT_STREAM: read_id},
+                    count=QR_PERSISTENCE_CONFIG["batch_size"],
+                    block=None if read_id == "0" else QR_PERSISTENCE_CONFIG["block_ms"]
+                )
+                events = _parse_entries(response)
+
+                if events:
+                    # Failed events wait for the next claim instead of being re-read at once
+                    if await _flush_and_ack(redis_client, events) and read_id == "0":
+                        read_id = ">"
+                elif read_id == "0":
+                    read_id = ">"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Unacknowledged events are retried from the pending list
+            logger.error(f"QR token writer error: {e}")
+            await asyncio.sleep(5)
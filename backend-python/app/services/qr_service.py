@@ -5,14 +5,24 @@ import qrcode
 import jwt
 import base64
 import io
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
 import uuid
+import hashlib
+import hmac
+import struct
+import asyncio
 import redis
-import json
+from concurrent.futures import ProcessPoolExecutor
 
+from ..core import codec
 from ..core.config import settings
-from ..database import get_redis
+from ..core.exceptions import QRCodeException
+from ..core.local_cache import LRUCache
+from ..core.revocation import revocation_registry
+from .qr_signing import sign_access_token
+from .qr_persistence import queue_token_event, QR_EVENT_STREAM, QR_PERSISTENCE_CONFIG
+from ..core.redis_client import get_redis
 
 # QR Code configuration
 QR_CODE_CONFIG = {
@@ -24,17 +34,137 @@ QR_CODE_CONFIG = {
     "back_color": "white"
 }
 
+# Rendered QR image cache, keyed by (payload, colors, size, format)
+QR_RENDER_CACHE_CONFIG = {
+    "max_entries": 1024
+}
+
+QR_IMAGE_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml"
+}
+
+_qr_render_cache = LRUCache(maxsize=QR_RENDER_CACHE_CONFIG["max_entries"])
+
+# Per-business QR analytics index
+QR_ANALYTICS_CONFIG = {
+    "retention_days": 400   # Daily counters and token index entries kept this long
+}
+
+def _qr_index_key(business_id: str) -> str:
+    return f"qr_index:{business_id}"
+
+def _qr_stats_key(business_id: str, day: str) -> str:
+    return f"qr_stats:{business_id}:{day}"
+
+def _matrix_to_svg(matrix, box_size: int, fill_color: str, back_color: str) -> bytes:
+    """
+    Build an SVG document from a QR module matrix
+    Horizontal runs of dark modules are merged into one path segment
+    """
+    
+    modules = len(matrix)
+    pixel_size = modules * box_size
+    segments = []
+    
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < modules:
+            if row[x]:
+                run_start = x
+                while x < modules and row[x]:
+                    x += 1
+                run = x - run_start
+                segments.append(f"M{run_start},{y}h{run}v1h-{run}z")
+            else:
+                x += 1
+    
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixel_size}" height="{pixel_size}" '
+        f'viewBox="0 0 {modules} {modules}" shape-rendering="crispEdges">'
+        f'<rect width="{modules}" height="{modules}" fill="{back_color}"/>'
+        f'<path fill="{fill_color}" d="{"".join(segments)}"/>'
+        f'</svg>'
+    )
+    return svg.encode()
+
+def render_qr_image(
+    data: str,
+    fill_color: str = QR_CODE_CONFIG["fill_color"],
+    back_color: str = QR_CODE_CONFIG["back_color"],
+    box_size: int = QR_CODE_CONFIG["box_size"],
+    image_format: str = "png",
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Render QR image for a payload
+    Returns data URL, raw content, content type and ETag; results are LRU cached
+    """
+    
+    content_type = QR_IMAGE_FORMATS.get(image_format)
+    if not content_type:
+        raise QRCodeException(
+            f"Unsupported QR image format: {image_format}",
+            {"supported_formats": list(QR_IMAGE_FORMATS)}
+        )
+    
+    cache_key = (data, fill_color, back_color, box_size, image_format)
+    if use_cache:
+        cached = _qr_render_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    qr = qrcode.QRCode(
+        version=QR_CODE_CONFIG["version"],
+        error_correction=QR_CODE_CONFIG["error_correction"],
+        box_size=box_size,
+        border=QR_CODE_CONFIG["border"]
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    
+    if image_format == "svg":
+        # SVG skips rasterization entirely
+        content = _matrix_to_svg(qr.get_matrix(), box_size, fill_color, back_color)
+    else:
+        qr_image = qr.make_image(fill_color=fill_color, back_color=back_color)
+        img_buffer = io.BytesIO()
+        qr_image.save(img_buffer, format="PNG")
+        content = img_buffer.getvalue()
+    
+    rendered = {
+        "data_url": f"data:{content_type};base64,{base64.b64encode(content).decode()}",
+        "content": content,
+        "content_type": content_type,
+        "etag": f'"{hashlib.sha1(content).hexdigest()}"'
+    }
+    
+    if use_cache:
+        _qr_render_cache.set(cache_key, rendered)
+    
+    return rendered
+
+def get_qr_render_cache_stats() -> Dict[str, Any]:
+    """
+    QR render cache statistics for monitoring
+    """
+    return _qr_render_cache.stats()
+
 async def generate_access_qr(
     business_id: str,
     visitor_id: str,
     vehicle_id: Optional[str] = None,
     valid_until: Optional[datetime] = None,
     access_type: str = "single_use",
-    visit_purpose: Optional[str] = None
+    visit_purpose: Optional[str] = None,
+    image_format: str = "png",
+    signed: bool = False
 ) -> Dict[str, Any]:
     """
     Generate QR code for business access
     Returns QR image and access token
+    With signed=True the QR carries a compact Ed25519 token that gate devices
+    can verify offline instead of a verification URL
     """
     
     # Set default validity (4 hours from now)
@@ -63,118 +193,383 @@ async def generate_access_qr(
         algorithm="HS256"
     )
     
-    # QR data URL
-    qr_data = f"{settings.APP_URL}/access/verify/{access_token}"
+    # QR data: verification URL, or the signed token itself for offline verification
+    signed_token = None
+    if signed:
+        signed_token = sign_access_token(
+            access_token=access_token,
+            business_id=business_id,
+            visitor_id=visitor_id,
+            access_type=access_type,
+            issued_at=datetime.utcnow(),
+            expires_at=valid_until
+        )
+        qr_data = signed_token
+    else:
+        qr_data = f"{settings.APP_URL}/access/verify/{access_token}"
     
-    # Generate QR code image
-    qr = qrcode.QRCode(**QR_CODE_CONFIG)
-    qr.add_data(qr_data)
-    qr.make(fit=True)
+    # Generate QR code image; the payload is a fresh token, so caching it only evicts reusable entries
+    qr_image = render_qr_image(qr_data, image_format=image_format, use_cache=False)
     
-    # Create QR image
-    qr_image = qr.make_image(
-        fill_color=QR_CODE_CONFIG["fill_color"],
-        back_color=QR_CODE_CONFIG["back_color"]
-    )
+    # Store token in Redis as a hash for atomic validate-and-consume
+    redis_client = get_redis()
+    async with redis_client.pipeline(transaction=True) as pipe:
+        expire_seconds = _queue_token_writes(
+            pipe,
+            access_token=access_token,
+            business_id=business_id,
+            visitor_id=visitor_id,
+            vehicle_id=vehicle_id,
+            access_type=access_type,
+            visit_purpose=visit_purpose,
+            valid_until=valid_until,
+            now=datetime.utcnow(),
+            offline=signed
+        )
+        await pipe.execute()
     
-    # Convert to base64
-    img_buffer = io.BytesIO()
-    qr_image.save(img_buffer, format="PNG")
-    img_buffer.seek(0)
-    qr_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+    return {
+        "qr_code": qr_image["data_url"],
+        "qr_etag": qr_image["etag"],
+        "qr_data": qr_data,
+        "access_token": access_token,
+        "jwt_token": jwt_token,
+        "signed_token": signed_token,
+        "valid_until": valid_until,
+        "expires_in_seconds": expire_seconds
+    }
+
+def _queue_token_writes(
+    pipe,
+    access_token: str,
+    business_id: str,
+    visitor_id: str,
+    vehicle_id: Optional[str],
+    access_type: str,
+    visit_purpose: Optional[str],
+    valid_until: datetime,
+    now: datetime,
+    record_stats: bool = True,
+    persist: bool = True,
+    offline: bool = False
+) -> int:
+    """
+    Queue the token hash and business analytics index writes on a pipeline
+    persist=False skips the write-behind "issued" event, for callers that insert the row themselves.
+    offline=True keeps the hash past expiry so offline scans can still be reconciled against it.
+    Returns the token validity in seconds
+    """
     
-    # Store token in Redis for quick validation
-    redis_client = get_redis()
     token_data = {
         "business_id": business_id,
         "visitor_id": visitor_id,
-        "vehicle_id": vehicle_id,
+        "vehicle_id": vehicle_id or "",
         "access_type": access_type,
-        "visit_purpose": visit_purpose,
-        "created_at": datetime.utcnow().isoformat(),
+        "visit_purpose": visit_purpose or "",
+        "created_at": now.isoformat(),
         "expires_at": valid_until.isoformat(),
-        "is_used": False,
-        "use_count": 0
+        "expires_at_ts": _to_epoch(valid_until),
+        "is_used": 0,
+        "use_count": 0,
+        "max_uses": 1 if access_type == "single_use" else 0
     }
     
-    # Store with expiration
-    expire_seconds = int((valid_until - datetime.utcnow()).total_seconds())
-    await redis_client.setex(
-        f"qr_token:{access_token}",
-        expire_seconds,
-        json.dumps(token_data)
-    )
+    expire_seconds = int((valid_until - now).total_seconds())
+    retention_seconds = QR_ANALYTICS_CONFIG["retention_days"] * 86400
+    token_key = f"qr_token:{access_token}"
+    index_key = _qr_index_key(business_id)
+    
+    pipe.hset(token_key, mapping=token_data)
+    retain_seconds = settings.QR_OFFLINE_RECONCILE_GRACE_SECONDS if offline else 0
+    pipe.expire(token_key, expire_seconds + retain_seconds)
+    pipe.zadd(index_key, {access_token: _to_epoch(now)})
+    
+    # Durable history is written to Postgres by the write-behind task
+    if persist:
+        queue_token_event(
+            pipe, "issued", access_token,
+            business_id=business_id,
+            visitor_id=visitor_id,
+            vehicle_id=vehicle_id,
+            access_type=access_type,
+            visit_purpose=visit_purpose,
+            created_at=token_data["created_at"],
+            expires_at=token_data["expires_at"],
+            max_uses=token_data["max_uses"]
+        )
     
-    return {
-        "qr_code": f"data:image/png;base64,{qr_base64}",
-        "qr_data": qr_data,
-        "access_token": access_token,
-        "jwt_token": jwt_token,
-        "valid_until": valid_until,
-        "expires_in_seconds": expire_seconds
+    if record_stats:
+        stats_key = _qr_stats_key(business_id, now.date().isoformat())
+        pipe.zremrangebyscore(index_key, "-inf", _to_epoch(now) - retention_seconds)
+        pipe.hincrby(stats_key, "generated", 1)
+        pipe.expire(stats_key, retention_seconds)
+    
+    return expire_seconds
+
+def _to_epoch(value: datetime) -> int:
+    """Naive datetimes in this service are UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+def _parse_token_hash(raw: Dict[Any, Any]) -> Dict[str, Any]:
+    """
+    Convert a Redis token hash into the token dict used by callers
+    """
+    
+    token_data = {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in raw.items()
+    }
+    
+    for field in ("vehicle_id", "visit_purpose"):
+        token_data[field] = token_data.get(field) or None
+    token_data["is_used"] = token_data.get("is_used") == "1"
+    for field in ("use_count", "max_uses", "expires_at_ts"):
+        token_data[field] = int(token_data.get(field) or 0)
+    
+    return token_data
+
+async def _migrate_legacy_token(redis_client, token_key: str) -> bool:
+    """
+    Convert a token stored as a JSON string (pre-hash format) into a hash,
+    keeping its remaining TTL
+    """
+    
+    try:
+        token_data_str = await redis_client.get(token_key)
+    except redis.ResponseError:
+        # Already migrated by a concurrent request
+        return True
+    
+    if not token_data_str:
+        return False
+    
+    try:
+        legacy = codec.decode(token_data_str)
+        expires_at = datetime.fromisoformat(legacy["expires_at"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    
+    ttl_ms = await redis_client.pttl(token_key)
+    mapping = {
+        "business_id": legacy.get("business_id") or "",
+        "visitor_id": legacy.get("visitor_id") or "",
+        "vehicle_id": legacy.get("vehicle_id") or "",
+        "access_type": legacy.get("access_type") or "single_use",
+        "visit_purpose": legacy.get("visit_purpose") or "",
+        "created_at": legacy.get("created_at") or "",
+        "expires_at": legacy["expires_at"],
+        "expires_at_ts": _to_epoch(expires_at),
+        "is_used": 1 if legacy.get("is_used") else 0,
+        "use_count": int(legacy.get("use_count", 0)),
+        "max_uses": 1 if legacy.get("access_type", "single_use") == "single_use" else 0
     }
+    
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(token_key)
+        pipe.hset(token_key, mapping=mapping)
+        if ttl_ms and ttl_ms > 0:
+            pipe.pexpire(token_key, ttl_ms)
+        await pipe.execute()
+    
+    return True
+
+# Atomic validate-and-consume
+# KEYS[1] = token hash, KEYS[2] = token event stream
+# ARGV[1] = use time (epoch seconds), ARGV[2] = use time (ISO), ARGV[3] = use day (YYYY-MM-DD),
+# ARGV[4] = analytics retention (seconds), ARGV[5] = access token, ARGV[6] = stream max length
+# Returns {1, HGETALL} on success or {0, reason}; HSET/HINCRBY keep the key TTL
+# The use time is the scan time, which is in the past for reconciled offline scans. Expired
+# hashes are left to their TTL, which outlives expiry for offline-verifiable tokens
+# First use is also counted in the business daily stats hash (qr_stats:<business>:<day>),
+# whose key is derived from the token, so this script assumes a non-clustered Redis
+QR_CONSUME_SCRIPT = """
+local key_type = redis.call('TYPE', KEYS[1]).ok
+if key_type == 'none' then
+    return {0, 'not_found'}
+end
+if key_type == 'string' then
+    return {0, 'legacy'}
+end
+
+local fields = redis.call('HMGET', KEYS[1], 'expires_at_ts', 'access_type', 'is_used', 'use_count', 'max_uses')
+local expires_at = tonumber(fields[1]) or 0
+local access_type = fields[2]
+local is_used = fields[3]
+local use_count = tonumber(fields[4]) or 0
+local max_uses = tonumber(fields[5]) or 0
+
+if expires_at > 0 and tonumber(ARGV[1]) > expires_at then
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[6], '*', 'event', 'expired', 'token', ARGV[5])
+    return {0, 'expired'}
+end
+
+if access_type == 'single_use' and is_used == '1' then
+    return {0, 'used'}
+end
+
+if max_uses > 0 and use_count >= max_uses then
+    return {0, 'exhausted'}
+end
+
+redis.call('HINCRBY', KEYS[1], 'use_count', 1)
+redis.call('HSET', KEYS[1], 'is_used', '1', 'last_used', ARGV[2])
+if use_count == 0 then
+    redis.call('HSET', KEYS[1], 'first_used', ARGV[2])
+    local business_id = redis.call('HGET', KEYS[1], 'business_id')
+    if business_id then
+        local stats_key = 'qr_stats:' .. business_id .. ':' .. ARGV[3]
+        redis.call('HINCRBY', stats_key, 'used', 1)
+        redis.call('EXPIRE', stats_key, tonumber(ARGV[4]))
+    end
+end
+
+local usage = redis.call('HMGET', KEYS[1], 'use_count', 'first_used')
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[6], '*',
+    'event', 'used', 'token', ARGV[5],
+    'use_count', usage[1], 'first_used', usage[2] or ARGV[2], 'last_used', ARGV[2])
+
+return {1, redis.call('HGETALL', KEYS[1])}
+"""
+
+_consume_script = None
+
+def _get_consume_script(redis_client):
+    global _consume_script
+    if _consume_script is None or _consume_script.registered_client is not redis_client:
+        _consume_script = redis_client.register_script(QR_CONSUME_SCRIPT)
+    return _consume_script
+
+async def consume_qr_token(access_token: str, used_at: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """
+    Atomically validate and consume a QR access token in one round trip
+    Checks expiry, single-use state and use count, then increments and marks
+    the token as used. Returns token data if access is granted, None otherwise.
+    used_at is the scan time of a reconciled offline scan; expiry is checked against it
+    """
+    
+    redis_client = get_redis()
+    token_key = f"qr_token:{access_token}"
+    script = _get_consume_script(redis_client)
+    
+    if used_at is not None and used_at.tzinfo is not None:
+        used_at = used_at.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    for _ in range(2):
+        now = min(used_at, datetime.utcnow()) if used_at else datetime.utcnow()
+        result = await script(
+            keys=[token_key, QR_EVENT_STREAM],
+            args=[
+                _to_epoch(now),
+                now.isoformat(),
+                now.date().isoformat(),
+                QR_ANALYTICS_CONFIG["retention_days"] * 86400,
+                access_token,
+                QR_PERSISTENCE_CONFIG["max_stream_length"]
+            ]
+        )
+        
+        status_flag, payload = result[0], result[1]
+        if int(status_flag) == 1:
+            return _parse_token_hash(dict(zip(payload[::2], payload[1::2])))
+        
+        reason = payload.decode() if isinstance(payload, bytes) else payload
+        if reason != "legacy" or not await _migrate_legacy_token(redis_client, token_key):
+            return None
+    
+    return None
 
 async def validate_qr_token(access_token: str) -> Optional[Dict[str, Any]]:
     """
-    Validate QR access token
+    Validate QR access token without consuming it
     Returns token data if valid, None if invalid/expired
+    Gate scans must use consume_qr_token, which is race-free
     """
     
     redis_client = get_redis()
     
     # Get token from Redis
     token_key = f"qr_token:{access_token}"
-    token_data_str = await redis_client.get(token_key)
+    try:
+        raw = await redis_client.hgetall(token_key)
+    except redis.ResponseError:
+        # Legacy JSON string token
+        if not await _migrate_legacy_token(redis_client, token_key):
+            return None
+        raw = await redis_client.hgetall(token_key)
     
-    if not token_data_str:
+    if not raw:
         return None
     
     try:
-        token_data = json.loads(token_data_str)
-        
-        # Check expiration
-        expires_at = datetime.fromisoformat(token_data["expires_at"])
-        if datetime.utcnow() > expires_at:
-            # Token expired, remove from Redis
-            await redis_client.delete(token_key)
-            return None
-        
-        # Check if single-use token already used
-        if token_data["access_type"] == "single_use" and token_data["is_used"]:
-            return None
-        
-        return token_data
-        
-    except (json.JSONDecodeError, KeyError, ValueError):
+        token_data = _parse_token_hash(raw)
+    except ValueError:
+        return None
+    
+    # Check expiration
+    if token_data["expires_at_ts"] and _to_epoch(datetime.utcnow()) > token_data["expires_at_ts"]:
         return None
+    
+    # Check if single-use token already used
+    if token_data["access_type"] == "single_use" and token_data["is_used"]:
+        return None
+    
+    if token_data["max_uses"] and token_data["use_count"] >= token_data["max_uses"]:
+        return None
+    
+    return token_data
 
-async def mark_token_used(access_token: str) -> bool:
+def _revocation_id(access_token: str) -> str:
+    return f"qr:{access_token}"
+
+async def revoke_qr_token(access_token: str) -> bool:
     """
-    Mark QR token as used
-    Returns True if successful, False if token invalid
+    Revoke a QR access token before it expires
+    Deletes the Redis token and records the revocation, so signed and JWT copies
+    of the token that verify without Redis are rejected as well
     """
     
     redis_client = get_redis()
     token_key = f"qr_token:{access_token}"
     
-    token_data_str = await redis_client.get(token_key)
-    if not token_data_str:
-        return False
-    
     try:
-        token_data = json.loads(token_data_str)
-        token_data["is_used"] = True
-        token_data["use_count"] += 1
-        token_data["last_used"] = datetime.utcnow().isoformat()
-        
-        # Update in Redis
-        await redis_client.set(token_key, json.dumps(token_data))
-        return True
-        
-    except (json.JSONDecodeError, KeyError):
+        expires_at_ts = await redis_client.hget(token_key, "expires_at_ts")
+    except redis.ResponseError:
+        # Legacy JSON string token
+        if not await _migrate_legacy_token(redis_client, token_key):
+            return False
+        expires_at_ts = await redis_client.hget(token_key, "expires_at_ts")
+    
+    if expires_at_ts is None:
         return False
+    
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(token_key)
+        queue_token_event(pipe, "revoked", access_token)
+        await pipe.execute()
+    
+    ttl = int(expires_at_ts) - _to_epoch(datetime.utcnow())
+    await revocation_registry.revoke(_revocation_id(access_token), ttl)
+    return True
+
+async def is_qr_token_revoked(access_token: str) -> bool:
+    """
+    Revocation check for tokens verified without Redis (signed QR, JWT)
+    Answered in-process unless the revocation filter reports a possible match
+    """
+    
+    return await revocation_registry.is_revoked(_revocation_id(access_token))
 
-async def generate_business_qr(business_id: str) -> Dict[str, Any]:
+async def mark_token_used(access_token: str) -> bool:
+    """
+    Mark QR token as used
+    Returns True if successful, False if token invalid or already consumed
+    """
+    
+    return await consume_qr_token(access_token) is not None
+
+async def generate_business_qr(business_id: str, image_format: str = "png") -> Dict[str, Any]:
     """
     Generate QR code for business registration/info
     Used for quick business access setup
@@ -183,24 +578,17 @@ async def generate_business_qr(business_id: str) -> Dict[str, Any]:
     # Business QR data
     qr_data = f"{settings.APP_URL}/business/{business_id}/info"
     
-    # Generate QR code
-    qr = qrcode.QRCode(**QR_CODE_CONFIG)
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    
-    qr_image = qr.make_image(
+    # Payload never changes, so this is served from the render cache after the first call
+    qr_image = render_qr_image(
+        qr_data,
         fill_color="#2563eb",  # Blue color for business QR
-        back_color="white"
+        back_color="white",
+        image_format=image_format
     )
     
-    # Convert to base64
-    img_buffer = io.BytesIO()
-    qr_image.save(img_buffer, format="PNG")
-    img_buffer.seek(0)
-    qr_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-    
     return {
-        "qr_code": f"data:image/png;base64,{qr_base64}",
+        "qr_code": qr_image["data_url"],
+        "qr_etag": qr_image["etag"],
         "qr_url": qr_data,
         "business_id": business_id,
         "expires_at": None  # Business QR codes don't expire
@@ -224,120 +612,404 @@ async def verify_jwt_token(jwt_token: str) -> Optional[Dict[str, Any]]:
         if datetime.utcnow() > expires_at:
             return None
         
+        if await is_qr_token_revoked(payload["access_token"]):
+            return None
+        
         return payload
         
     except (jwt.InvalidTokenError, KeyError, ValueError):
         return None
 
-async def generate_checkout_qr(
+# =====================================================
+# LAZY CHECKOUT QR
+# =====================================================
+
+# business (16s) | visitor (16s) | check-in log (16s) | expires_at (I), followed by a 16 byte HMAC
+_CHECKOUT_TOKEN_FORMAT = struct.Struct(">16s16s16sI")
+_CHECKOUT_MAC_LENGTH = 16
+_CHECKOUT_NAMESPACE = uuid.UUID("6f1c1e9a-4d1b-4c55-9a3e-2f0a4c8e7b21")
+CHECKOUT_VALIDITY = timedelta(hours=24)
+
+def _checkout_mac(payload: bytes) -> bytes:
+    return hmac.new(settings.SECRET_KEY.encode(), b"checkout:" + payload, hashlib.sha256).digest()[:_CHECKOUT_MAC_LENGTH]
+
+def mint_checkout_token(
     business_id: str,
     visitor_id: str,
     checkin_log_id: str
 ) -> Dict[str, Any]:
     """
-    Generate checkout QR for visitors who checked in
-    Allows easy checkout process
+    Mint a checkout token at check-in without touching Redis or rendering an image
+    The token is a stateless signed id; the Redis token and QR image are only
+    created if the visitor opens their checkout QR
     """
     
-    # Checkout valid for 24 hours
-    valid_until = datetime.utcnow() + timedelta(hours=24)
+    valid_until = datetime.utcnow() + CHECKOUT_VALIDITY
     
-    checkout_token = str(uuid.uuid4())
+    try:
+        payload = _CHECKOUT_TOKEN_FORMAT.pack(
+            uuid.UUID(business_id).bytes,
+            uuid.UUID(visitor_id).bytes,
+            uuid.UUID(checkin_log_id).bytes,
+            _to_epoch(valid_until)
+        )
+    except (ValueError, struct.error) as e:
+        raise QRCodeException(f"Cannot mint checkout token: {str(e)}")
     
-    # Checkout token payload
-    token_payload = {
+    checkout_token = base64.urlsafe_b64encode(payload + _checkout_mac(payload)).rstrip(b"=").decode()
+    
+    return {
         "checkout_token": checkout_token,
-        "business_id": business_id,
-        "visitor_id": visitor_id,
-        "checkin_log_id": checkin_log_id,
-        "access_type": "checkout_only",
-        "issued_at": datetime.utcnow().isoformat(),
-        "expires_at": valid_until.isoformat()
+        "checkout_qr_url": f"{settings.API_V1_STR}/api/access/checkout-qr/{checkout_token}",
+        "valid_until": valid_until
     }
+
+def decode_checkout_token(checkout_token: str) -> Optional[Dict[str, Any]]:
+    """
+    Verify a checkout token's MAC and expiry
+    Returns business, visitor and check-in ids, None if invalid or expired
+    """
     
-    # Generate JWT
-    jwt_token = jwt.encode(
-        token_payload,
-        settings.SECRET_KEY,
-        algorithm="HS256"
-    )
+    try:
+        raw = base64.urlsafe_b64decode(checkout_token + "=" * (-len(checkout_token) % 4))
+    except (ValueError, TypeError):
+        return None
     
-    # QR data
-    qr_data = f"{settings.APP_URL}/access/checkout/{checkout_token}"
+    if len(raw) != _CHECKOUT_TOKEN_FORMAT.size + _CHECKOUT_MAC_LENGTH:
+        return None
     
-    # Generate QR image
-    qr = qrcode.QRCode(**QR_CODE_CONFIG)
-    qr.add_data(qr_data)
-    qr.make(fit=True)
+    payload, mac = raw[:_CHECKOUT_TOKEN_FORMAT.size], raw[_CHECKOUT_TOKEN_FORMAT.size:]
+    if not hmac.compare_digest(mac, _checkout_mac(payload)):
+        return None
     
-    qr_image = qr.make_image(
-        fill_color="#dc2626",  # Red color for checkout
-        back_color="white"
-    )
+    business_bytes, visitor_bytes, checkin_bytes, expires_at = _CHECKOUT_TOKEN_FORMAT.unpack(payload)
+    if _to_epoch(datetime.utcnow()) > expires_at:
+        return None
     
-    # Convert to base64
-    img_buffer = io.BytesIO()
-    qr_image.save(img_buffer, format="PNG")
-    img_buffer.seek(0)
-    qr_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+    checkin_log_id = str(uuid.UUID(bytes=checkin_bytes))
+    return {
+        "business_id": str(uuid.UUID(bytes=business_bytes)),
+        "visitor_id": str(uuid.UUID(bytes=visitor_bytes)),
+        "checkin_log_id": checkin_log_id,
+        # Deterministic, so repeated opens map to the same Redis token
+        "access_token": str(uuid.uuid5(_CHECKOUT_NAMESPACE, checkin_log_id)),
+        "valid_until": datetime.utcfromtimestamp(expires_at)
+    }
+
+# Claim the one-time creation of a checkout token
+# KEYS[1] = creation marker, KEYS[2] = token hash; ARGV[1] = marker TTL (seconds)
+# Returns 1 if the caller must create the token hash, 0 if it exists or was created before
+CHECKOUT_CLAIM_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('SET', KEYS[1], '1', 'EX', ARGV[1], 'NX')
+    return 0
+end
+if redis.call('SET', KEYS[1], '1', 'EX', ARGV[1], 'NX') then
+    return 1
+end
+return 0
+"""
+
+_checkout_claim_script = None
+
+def _get_checkout_claim_script(redis_client):
+    global _checkout_claim_script
+    if _checkout_claim_script is None or _checkout_claim_script.registered_client is not redis_client:
+        _checkout_claim_script = redis_client.register_script(CHECKOUT_CLAIM_SCRIPT)
+    return _checkout_claim_script
+
+async def get_checkout_qr(checkout_token: str, image_format: str = "png") -> Optional[Dict[str, Any]]:
+    """
+    Render a checkout QR on demand
+    Creates the consumable Redis token on first open; the image comes from the render cache
+    """
+    
+    claims = decode_checkout_token(checkout_token)
+    if not claims:
+        return None
+    
+    access_token = claims["access_token"]
+    if await is_qr_token_revoked(access_token):
+        return None
     
-    # Store in Redis
     redis_client = get_redis()
-    expire_seconds = int((valid_until - datetime.utcnow()).total_seconds())
+    now = datetime.utcnow()
+    
+    # Only the first open creates the token: concurrent opens cannot reset a consumed one,
+    # and a token that was consumed, revoked or purged is never recreated
+    created_key = f"checkout_created:{access_token}"
+    ttl = max(int((claims["valid_until"] - now).total_seconds()), 1)
+    claimed = await _get_checkout_claim_script(redis_client)(
+        keys=[created_key, f"qr_token:{access_token}"],
+        args=[ttl]
+    )
+    if int(claimed):
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                _queue_token_writes(
+                    pipe,
+                    access_token=access_token,
+                    business_id=claims["business_id"],
+                    visitor_id=claims["visitor_id"],
+                    vehicle_id=None,
+                    access_type="checkout_only",
+                    visit_purpose=None,
+                    valid_until=claims["valid_until"],
+                    now=now
+                )
+                await pipe.execute()
+        except Exception:
+            # Let the next open retry the creation
+            await redis_client.delete(created_key)
+            raise
     
-    await redis_client.setex(
-        f"checkout_token:{checkout_token}",
-        expire_seconds,
-        json.dumps(token_payload)
+    qr_data = f"{settings.APP_URL}/access/verify/{access_token}"
+    qr_image = render_qr_image(
+        qr_data,
+        fill_color="#dc2626",  # Red color for checkout
+        back_color="white",
+        image_format=image_format
     )
     
     return {
-        "qr_code": f"data:image/png;base64,{qr_base64}",
+        "qr_image": qr_image,
         "qr_data": qr_data,
-        "checkout_token": checkout_token,
-        "jwt_token": jwt_token,
-        "valid_until": valid_until
+        "access_token": access_token,
+        "valid_until": claims["valid_until"]
     }
 
+# =====================================================
+# BULK ISSUANCE
+# =====================================================
+
+BULK_QR_CONFIG = {
+    "pipeline_chunk": 500,   # Redis commands are flushed every N tokens
+    "render_chunk": 100      # QR images per worker pool job
+}
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=settings.QR_RENDER_WORKERS)
+    return _render_pool
+
+def shutdown_render_pool():
+    """Stop the bulk render worker processes (called on application shutdown)"""
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+
+def _render_qr_chunk(payloads: List[str], image_format: str) -> List[bytes]:
+    """Worker pool job: render a chunk of QR payloads (no shared cache across processes)"""
+    return [
+        render_qr_image(payload, image_format=image_format, use_cache=False)["content"]
+        for payload in payloads
+    ]
+
+async def iter_rendered_qr_images(
+    payloads: List[str],
+    image_format: str = "png"
+) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Render many QR images in the worker pool
+    All chunks are submitted up front; results are yielded in input order as they complete
+    """
+    
+    loop = asyncio.get_running_loop()
+    pool = _get_render_pool()
+    chunk_size = BULK_QR_CONFIG["render_chunk"]
+    
+    jobs = [
+        (offset, loop.run_in_executor(pool, _render_qr_chunk, payloads[offset:offset + chunk_size], image_format))
+        for offset in range(0, len(payloads), chunk_size)
+    ]
+    
+    for offset, job in jobs:
+        for index, content in enumerate(await job):
+            yield offset + index, content
+
+async def issue_access_tokens_bulk(
+    business_id: str,
+    entries: List[Dict[str, Any]],
+    access_type: str = "single_use",
+    signed: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Issue many QR access tokens with pipelined Redis writes (no image rendering)
+    Each entry needs visitor_id and may set vehicle_id, visit_purpose and valid_until.
+    No "issued" events are queued: the caller inserts the QRToken rows in the same
+    transaction as the visitors they reference
+    """
+    
+    redis_client = get_redis()
+    now = datetime.utcnow()
+    default_valid_until = now + timedelta(hours=4)
+    chunk_size = BULK_QR_CONFIG["pipeline_chunk"]
+    issued = []
+    
+    for offset in range(0, len(entries), chunk_size):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for entry in entries[offset:offset + chunk_size]:
+                access_token = str(uuid.uuid4())
+                valid_until = entry.get("valid_until") or default_valid_until
+                
+                expire_seconds = _queue_token_writes(
+                    pipe,
+                    access_token=access_token,
+                    business_id=business_id,
+                    visitor_id=entry["visitor_id"],
+                    vehicle_id=entry.get("vehicle_id"),
+                    access_type=access_type,
+                    visit_purpose=entry.get("visit_purpose"),
+                    valid_until=valid_until,
+                    now=now,
+                    record_stats=False,
+                    persist=False,
+                    offline=signed
+                )
+                
+                signed_token = None
+                if signed:
+                    signed_token = sign_access_token(
+                        access_token=access_token,
+                        business_id=business_id,
+                        visitor_id=entry["visitor_id"],
+                        access_type=access_type,
+                        issued_at=now,
+                        expires_at=valid_until
+                    )
+                
+                issued.append({
+                    "visitor_id": entry["visitor_id"],
+                    "access_token": access_token,
+                    "signed_token": signed_token,
+                    "qr_data": signed_token or f"{settings.APP_URL}/access/verify/{access_token}",
+                    "valid_until": valid_until,
+                    "expires_in_seconds": expire_seconds
+                })
+            await pipe.execute()
+    
+    # One analytics update for the whole batch
+    if issued:
+        retention_seconds = QR_ANALYTICS_CONFIG["retention_days"] * 86400
+        stats_key = _qr_stats_key(business_id, now.date().isoformat())
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(_qr_index_key(business_id), "-inf", _to_epoch(now) - retention_seconds)
+            pipe.hincrby(stats_key, "generated", len(issued))
+            pipe.expire(stats_key, retention_seconds)
+            await pipe.execute()
+    
+    return issued
+
+async def discard_access_tokens_bulk(business_id: str, issued: List[Dict[str, Any]]):
+    """
+    Undo issue_access_tokens_bulk when the caller could not commit the matching rows,
+    so no scannable token is left without its visitor and QRToken records
+    """
+    
+    if not issued:
+        return
+    
+    redis_client = get_redis()
+    chunk_size = BULK_QR_CONFIG["pipeline_chunk"]
+    tokens = [token["access_token"] for token in issued]
+    stats_key = _qr_stats_key(business_id, datetime.utcnow().date().isoformat())
+    
+    for offset in range(0, len(tokens), chunk_size):
+        chunk = tokens[offset:offset + chunk_size]
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(*[f"qr_token:{access_token}" for access_token in chunk])
+            pipe.zrem(_qr_index_key(business_id), *chunk)
+            await pipe.execute()
+    
+    await redis_client.hincrby(stats_key, "generated", -len(tokens))
+
 async def get_qr_analytics(business_id: str, days: int = 30) -> Dict[str, Any]:
     """
     Get QR code usage analytics for a business
+    Reads one daily counter hash per day in the period, O(days) with no keyspace scan
     """
     
     redis_client = get_redis()
     
-    # Get all QR tokens for business (from last 30 days)
-    pattern = f"qr_token:*"
-    keys = await redis_client.keys(pattern)
+    today = datetime.utcnow().date()
+    period = [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+    
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for day in period:
+            pipe.hmget(_qr_stats_key(business_id, day), "generated", "used")
+        daily_counters = await pipe.execute()
     
     total_generated = 0
     total_used = 0
     usage_by_day = {}
+    used_by_day = {}
     
-    for key in keys:
-        token_data_str = await redis_client.get(key)
-        if token_data_str:
-            try:
-                token_data = json.loads(token_data_str)
-                if token_data.get("business_id") == business_id:
-                    total_generated += 1
-                    if token_data.get("is_used"):
-                        total_used += 1
-                    
-                    # Count by day
-                    created_date = datetime.fromisoformat(token_data["created_at"]).date()
-                    day_str = created_date.isoformat()
-                    usage_by_day[day_str] = usage_by_day.get(day_str, 0) + 1
-                    
-            except (json.JSONDecodeError, KeyError):
-                continue
+    for day, (generated, used) in zip(period, daily_counters):
+        generated = int(generated or 0)
+        used = int(used or 0)
+        total_generated += generated
+        total_used += used
+        
+        if generated:
+            usage_by_day[day] = generated
+        if used:
+            used_by_day[day] = used
     
     usage_rate = (total_used / total_generated * 100) if total_generated > 0 else 0
     
     return {
         "total_qr_generated": total_generated,
         "total_qr_used": total_used,
-        "usage_rate_percentage": round(usage_rate, 2),
+        "usage_rate_percentage": round(min(usage_rate, 100.0), 2),
         "daily_usage": usage_by_day,
+        "daily_used": used_by_day,
         "period_days": days
     }
+
+async def get_business_qr_tokens(
+    business_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 100
+) -> List[Dict[str, Any]]:
+    """
+    List QR tokens issued by a business in a time range, newest first
+    Uses the per-business sorted set index; tokens already expired from Redis are skipped
+    """
+    
+    redis_client = get_redis()
+    
+    max_score = _to_epoch(until) if until else "+inf"
+    min_score = _to_epoch(since) if since else "-inf"
+    
+    tokens = await redis_client.zrevrangebyscore(
+        _qr_index_key(business_id),
+        max_score,
+        min_score,
+        start=0,
+        num=limit,
+        withscores=True
+    )
+    if not tokens:
+        return []
+    
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for token, _ in tokens:
+            token = token.decode() if isinstance(token, bytes) else token
+            pipe.hgetall(f"qr_token:{token}")
+        raw_tokens = await pipe.execute(raise_on_error=False)
+    
+    results = []
+    for (token, created_ts), raw in zip(tokens, raw_tokens):
+        if not raw or isinstance(raw, Exception):
+            continue
+        token_data = _parse_token_hash(raw)
+        token_data["access_token"] = token.decode() if isinstance(token, bytes) else token
+        token_data["created_ts"] = int(created_ts)
+        results.append(token_data)
+    
+    return results
@@ -0,0 +1,172 @@
+# Signed QR Token Service
+# Compact Ed25519-signed access tokens that gate devices can verify offline
+
+import base64
+import hashlib
+import struct
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Union
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+from ..core.config import settings
+from ..core.exceptions import QRCodeException
+
+# Token layout (big endian, 59 bytes) followed by a 64 byte Ed25519 signature:
+#   version (B) | key_id (B) | access_type (B) | token (16s) | business (16s) |
+#   visitor (16s) | issued_at (I) | expires_at (I)
+SIGNED_TOKEN_PREFIX = "AXS1:"
+SIGNED_TOKEN_VERSION = 1
+_PAYLOAD_FORMAT = struct.Struct(">BBB16s16s16sII")
+_SIGNATURE_LENGTH = 64
+
+ACCESS_TYPE_CODES = {
+    "single_use": 0,
+    "multi_use": 1,
+    "time_limited": 2,
+    "checkout_only": 3
+}
+ACCESS_TYPE_NAMES = {code: name for name, code in ACCESS_TYPE_CODES.items()}
+
+_private_key: Optional[Ed25519PrivateKey] = None
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _to_epoch(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+def get_signing_key() -> Ed25519PrivateKey:
+    """
+    Load the QR signing key
+    QR_SIGNING_PRIVATE_KEY is a base64 32 byte seed; without it a key is derived
+    from SECRET_KEY so development setups work out of the box
+    """
+
+    global _private_key
+    if _private_key is None:
+        if settings.QR_SIGNING_PRIVATE_KEY:
+            seed = _b64decode(settings.QR_SIGNING_PRIVATE_KEY.strip())
+        else:
+            seed = hashlib.sha256(f"qr-signing:{settings.SECRET_KEY}".encode()).digest()
+
+        if len(seed) != 32:
+            raise QRCodeException("QR_SIGNING_PRIVATE_KEY must decode to 32 bytes")
+
+        _private_key = Ed25519PrivateKey.from_private_bytes(seed)
+
+    return _private_key
+
+def get_public_keys() -> Dict[str, Any]:
+    """
+    Public verification keys for gate devices, keyed by key id
+    """
+
+    public_bytes = get_signing_key().public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    return {
+        "algorithm": "Ed25519",
+        "token_prefix": SIGNED_TOKEN_PREFIX,
+        "keys": {
+            str(settings.QR_SIGNING_KEY_ID): _b64encode(public_bytes)
+        }
+    }
+
+def sign_access_token(
+    access_token: str,
+    business_id: str,
+    visitor_id: str,
+    access_type: str,
+    issued_at: datetime,
+    expires_at: datetime
+) -> str:
+    """
+    Build a compact signed token small enough to be the QR payload itself
+    """
+
+    try:
+        payload = _PAYLOAD_FORMAT.pack(
+            SIGNED_TOKEN_VERSION,
+            settings.QR_SIGNING_KEY_ID,
+            ACCESS_TYPE_CODES.get(access_type, ACCESS_TYPE_CODES["single_use"]),
+            uuid.UUID(access_token).bytes,
+            uuid.UUID(business_id).bytes,
+            uuid.UUID(visitor_id).bytes,
+            _to_epoch(issued_at),
+            _to_epoch(expires_at)
+        )
+    except (ValueError, struct.error) as e:
+        raise QRCodeException(f"Cannot sign QR token: {str(e)}")
+
+    signature = get_signing_key().sign(payload)
+    return SIGNED_TOKEN_PREFIX + _b64encode(payload + signature)
+
+def is_signed_token(qr_data: str) -> bool:
+    return bool(qr_data) and qr_data.startswith(SIGNED_TOKEN_PREFIX)
+
+def verify_signed_token(
+    signed_token: str,
+    public_keys: Optional[Dict[int, Union[Ed25519PublicKey, bytes]]] = None,
+    now: Optional[datetime] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Verify signature and expiry of a signed QR token
+    Needs only public keys, so the same code runs on gate devices without Redis.
+    Returns the decoded claims, or None if the token is malformed, forged or expired
+    """
+
+    if not is_signed_token(signed_token):
+        return None
+
+    try:
+        raw = _b64decode(signed_token[len(SIGNED_TOKEN_PREFIX):])
+    except (ValueError, TypeError):
+        return None
+
+    if len(raw) != _PAYLOAD_FORMAT.size + _SIGNATURE_LENGTH:
+        return None
+
+    payload, signature = raw[:_PAYLOAD_FORMAT.size], raw[_PAYLOAD_FORMAT.size:]
+    (version, key_id, access_type_code, token_bytes, business_bytes,
+     visitor_bytes, issued_at, expires_at) = _PAYLOAD_FORMAT.unpack(payload)
+
+    if version != SIGNED_TOKEN_VERSION:
+        return None
+
+    # Resolve verification key
+    if public_keys is None:
+        if key_id != settings.QR_SIGNING_KEY_ID:
+            return None
+        public_key = get_signing_key().public_key()
+    else:
+        public_key = public_keys.get(key_id)
+        if public_key is None:
+            return None
+        if isinstance(public_key, bytes):
+            public_key = Ed25519PublicKey.from_public_bytes(public_key)
+
+    try:
+        public_key.verify(signature, payload)
+    except InvalidSignature:
+        return None
+
+    now_ts = _to_epoch(now or datetime.utcnow())
+    if now_ts > expires_at:
+        return None
+
+    return {
+        "access_token": str(uuid.UUID(bytes=token_bytes)),
+        "business_id": str(uuid.UUID(bytes=business_bytes)),
+        "visitor_id": str(uuid.UUID(bytes=visitor_bytes)),
+        "access_type": ACCESS_TYPE_NAMES.get(access_type_code, "single_use"),
+        "key_id": key_id,
+        "issued_at": datetime.utcfromtimestamp(issued_at),
+        "expires_at": datetime.utcfromtimestamp(expires_at)
+    }
@@ -0,0 +1,155 @@
+# Redis Payload Codec Benchmark
+# Encode/decode throughput and stored size of the payloads the app keeps in Redis, per codec
+#
+# Usage (from backend-python/):
+#   python -m benchmarks.codec_benchmark --iterations 20000
+#   python -m benchmarks.codec_benchmark --payload face_data --json
+
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from app.core import codec
+
+def _face_data() -> Dict[str, Any]:
+    """face_data:{business_id}:{visitor_id}, written by register_face"""
+    return {
+        "visitor_id": str(uuid.uuid4()),
+        "business_id": str(uuid.uuid4()),
+        "visitor_name": "Maria Fernanda Lopez",
+        "face_encoding": [random.uniform(-0.3, 0.3) for _ in range(128)],
+        "registered_at": datetime.utcnow().isoformat(),
+        "is_active": True,
+        "last_recognition": datetime.utcnow().isoformat(),
+        "recognition_count": 42
+    }
+
+def _checkout_token() -> Dict[str, Any]:
+    """checkout_token:{token}, written by generate_checkout_qr"""
+    now = datetime.utcnow()
+    return {
+        "checkout_token": str(uuid.uuid4()),
+        "business_id": str(uuid.uuid4()),
+        "visitor_id": str(uuid.uuid4()),
+        "checkin_log_id": str(uuid.uuid4()),
+        "access_type": "checkout_only",
+        "issued_at": now.isoformat(),
+        "expires_at": (now + timedelta(hours=24)).isoformat()
+    }
+
+def _push_data() -> Dict[str, Any]:
+    """The data field of a push notification stream entry"""
+    return {
+        "type": "access_granted",
+        "business_id": str(uuid.uuid4()),
+        "visitor_id": str(uuid.uuid4()),
+        "access_point": "Main gate",
+        "method": "qr_code",
+        "timestamp": datetime.utcnow()
+    }
+
+def _alert() -> Dict[str, Any]:
+    """One queued entry of the alert digest"""
+    return {
+        "type": "unauthorized_access",
+        "message": "Unregistered plate ABC-123-D denied at Main gate",
+        "data": {"plate_number": "ABC123D", "confidence": 0.91, "access_point_id": str(uuid.uuid4())},
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def _cached_user() -> Dict[str, Any]:
+    """user:{id} in the CacheManager user tier"""
+    return {
+        "id": str(uuid.uuid4()),
+        "email": "maria.lopez@example.com",
+        "first_name": "Maria",
+        "last_name": "Lopez",
+        "phone": "+525512345678",
+        "role": "business_admin",
+        "is_active": True,
+        "is_verified": True,
+        "notification_preferences": {"email_notifications": True, "sms_notifications": False},
+        "created_at": datetime.utcnow().isoformat()
+    }
+
+PAYLOADS: Dict[str, Callable[[], Dict[str, Any]]] = {
+    "face_data": _face_data,
+    "checkout_token": _checkout_token,
+    "push_data": _push_data,
+    "alert": _alert,
+    "cached_user": _cached_user
+}
+
+def _baseline_encode(value: Any) -> str:
+    """What the code did before the codec layer"""
+    return json.dumps(value, default=str)
+
+def _measure(function: Callable[[Any], Any], argument: Any, iterations: int) -> float:
+    """Operations per second"""
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(argument)
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed else 0.0
+
+def run_benchmark(payloads: List[str], iterations: int = 10000) -> Dict[str, Any]:
+    """Measure the stdlib baseline and every available codec on each payload shape"""
+
+    results = {}
+    for name in payloads:
+        value = PAYLOADS[name]()
+        rows = {}
+
+        encoded = _baseline_encode(value)
+        rows["stdlib_json"] = {
+            "bytes": len(encoded.encode("utf-8")),
+            "encode_per_sec": round(_measure(_baseline_encode, value, iterations)),
+            "decode_per_sec": round(_measure(json.loads, encoded, iterations))
+        }
+
+        for codec_name, payload_codec in codec.CODECS.items():
+            encoded = codec.encode(value, payload_codec)
+            rows[codec_name] = {
+                "bytes": len(encoded),
+                "encode_per_sec": round(_measure(lambda item: codec.encode(item, payload_codec), value, iterations)),
+                "decode_per_sec": round(_measure(codec.decode, encoded, iterations))
+            }
+
+        results[name] = rows
+
+    return {"iterations": iterations, "payloads": results}
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render the benchmark report as plain text"""
+
+    lines = [f"Codec benchmark - {report['iterations']} iterations per measurement"]
+    for name, rows in report["payloads"].items():
+        baseline = rows["stdlib_json"]
+        lines.append(f"  {name}")
+        for codec_name, row in rows.items():
+            lines.append(
+                f"    {codec_name:<12} {row['bytes']:>6} bytes ({row['bytes'] / baseline['bytes']:.2f}x)  "
+                f"encode {row['encode_per_sec']:>9}/s ({row['encode_per_sec'] / baseline['encode_per_sec']:.1f}x)  "
+                f"decode {row['decode_per_sec']:>9}/s ({row['decode_per_sec'] / baseline['decode_per_sec']:.1f}x)"
+            )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Redis payload codecs")
+    parser.add_argument("--payload", choices=sorted(PAYLOADS), action="append", help="Payload shape (repeatable, default all)")
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the generated face encoding")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    report = run_benchmark(args.payload or list(PAYLOADS), args.iterations)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+if __name__ == "__main__":
+    main()
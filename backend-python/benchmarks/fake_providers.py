@@ -0,0 +1,116 @@
+# Fake Notification Providers
+# Local stand-in for the SendGrid and Twilio HTTP APIs, for throughput tests without network
+#
+# Usage (from backend-python/):
+#   python -m benchmarks.fake_providers --port 8025 --latency-ms 150 --error-rate 0.02
+#   SENDGRID_API_URL=http://127.0.0.1:8025 TWILIO_API_URL=http://127.0.0.1:8025 uvicorn main:app
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+# Fake provider behaviour, overridden from the command line
+FAKE_PROVIDER_CONFIG = {
+    "latency_ms": 100.0,       # Mean response latency
+    "jitter_ms": 30.0,
+    "error_rate": 0.0,         # Share of requests answered with 503
+    "throttle_rate": 0.0       # Share of requests answered with 429
+}
+
+app = FastAPI(title="Fake notification providers")
+counters = Counter()
+started_at = time.monotonic()
+
+async def _simulate() -> Optional[Response]:
+    """Sleep like a provider would and maybe fail; None means success"""
+
+    latency = max(0.0, random.gauss(FAKE_PROVIDER_CONFIG["latency_ms"], FAKE_PROVIDER_CONFIG["jitter_ms"]))
+    await asyncio.sleep(latency / 1000)
+
+    roll = random.random()
+    if roll < FAKE_PROVIDER_CONFIG["error_rate"]:
+        counters["errors"] += 1
+        return JSONResponse({"errors": [{"message": "Service unavailable"}]}, status_code=503)
+    if roll < FAKE_PROVIDER_CONFIG["error_rate"] + FAKE_PROVIDER_CONFIG["throttle_rate"]:
+        counters["throttled"] += 1
+        return JSONResponse({"errors": [{"message": "Too many requests"}]}, status_code=429, headers={"Retry-After": "1"})
+
+    return None
+
+@app.post("/v3/mail/send")
+async def sendgrid_mail_send(request: Request):
+    """SendGrid v3 mail send: 202 with an empty body"""
+
+    payload = await request.json()
+    if not payload.get("personalizations") or not payload.get("from"):
+        return JSONResponse({"errors": [{"message": "Bad request"}]}, status_code=400)
+
+    failure = await _simulate()
+    if failure is not None:
+        return failure
+
+    counters["emails"] += 1
+    return Response(status_code=202, headers={"X-Message-Id": uuid.uuid4().hex})
+
+@app.post("/2010-04-01/Accounts/{account_sid}/Messages.json")
+async def twilio_create_message(account_sid: str, request: Request):
+    """Twilio create message: 201 with the message resource"""
+
+    form = await request.form()
+    if not form.get("To") or not form.get("Body"):
+        return JSONResponse({"code": 21604, "message": "A 'To' phone number is required."}, status_code=400)
+
+    failure = await _simulate()
+    if failure is not None:
+        return failure
+
+    counters["sms"] += 1
+    return JSONResponse({
+        "sid": "SM" + uuid.uuid4().hex,
+        "account_sid": account_sid,
+        "to": form["To"],
+        "from": form.get("From"),
+        "status": "queued"
+    }, status_code=201)
+
+@app.get("/stats")
+async def stats():
+    """Accepted and failed requests since start"""
+
+    elapsed = time.monotonic() - started_at
+    accepted = counters["emails"] + counters["sms"]
+    return {
+        **counters,
+        "elapsed_sec": round(elapsed, 3),
+        "accepted_per_sec": round(accepted / elapsed, 2) if elapsed else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run fake SendGrid and Twilio endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=FAKE_PROVIDER_CONFIG["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=FAKE_PROVIDER_CONFIG["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=FAKE_PROVIDER_CONFIG["error_rate"])
+    parser.add_argument("--throttle-rate", type=float, default=FAKE_PROVIDER_CONFIG["throttle_rate"])
+    args = parser.parse_args()
+
+    FAKE_PROVIDER_CONFIG.update({
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "throttle_rate": args.throttle_rate
+    })
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
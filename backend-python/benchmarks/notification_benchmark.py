@@ -0,0 +1,117 @@
+# Notification Provider Throughput Benchmark
+# Drives the async SendGrid/Twilio clients against the fake provider server
+#
+# Usage (from backend-python/, with benchmarks.fake_providers running):
+#   python -m benchmarks.notification_benchmark --url http://127.0.0.1:8025 --count 1000 --concurrency 50
+#   python -m benchmarks.notification_benchmark --channel sms --rate 100 --json
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+
+from app.core.exceptions import ExternalServiceException
+from app.services.notification_providers import SendGridClient, TwilioClient
+
+def _latency_summary(values: List[float]) -> Dict[str, float]:
+    """Summarize latencies in milliseconds"""
+
+    if not values:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0}
+
+    ordered = sorted(values)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[p95_index] * 1000, 3)
+    }
+
+async def run_benchmark(
+    url: str,
+    channel: str = "email",
+    count: int = 500,
+    concurrency: int = 50,
+    rate: float = 1000.0
+) -> Dict[str, Any]:
+    """
+    Send `count` messages with at most `concurrency` in flight
+    `rate` is the client-side rate limit, as configured per provider account
+    """
+
+    if channel == "email":
+        client = SendGridClient(api_key="fake", base_url=url, rate_per_second=rate)
+        send = lambda index: client.send_email(
+            to_email=f"visitor{index}@example.com",
+            subject="Benchmark",
+            html_content="<p>Benchmark message</p>",
+            from_email="noreply@example.com"
+        )
+    else:
+        client = TwilioClient(account_sid="ACfake", auth_token="fake", base_url=url, rate_per_second=rate)
+        send = lambda index: client.send_sms(to=f"+5255{index:08d}", body="Benchmark message", from_="+15550000000")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    outcomes = {"accepted": 0, "rejected": 0, "transient_errors": 0}
+
+    async def one(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await send(index)
+                outcomes["accepted" if result else "rejected"] += 1
+            except ExternalServiceException:
+                outcomes["transient_errors"] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(index) for index in range(count)))
+    finally:
+        await client.close()
+    wall_time = time.perf_counter() - start
+
+    return {
+        "channel": channel,
+        "count": count,
+        "concurrency": concurrency,
+        "rate_limit_per_sec": rate,
+        "outcomes": outcomes,
+        "latency": _latency_summary(latencies),
+        "throughput_per_sec": round(count / wall_time, 2) if wall_time else 0.0,
+        "wall_time_sec": round(wall_time, 3)
+    }
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render the benchmark report as plain text"""
+
+    latency = report["latency"]
+    outcomes = report["outcomes"]
+    return "\n".join([
+        f"Notification benchmark - {report['channel']}, {report['count']} messages, "
+        f"{report['concurrency']} in flight, limit {report['rate_limit_per_sec']}/s",
+        f"  accepted {outcomes['accepted']}, rejected {outcomes['rejected']}, "
+        f"transient errors {outcomes['transient_errors']}",
+        f"  latency mean {latency['mean_ms']} ms, p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms",
+        f"  throughput {report['throughput_per_sec']} messages/sec (wall time {report['wall_time_sec']}s)"
+    ])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the async notification provider clients")
+    parser.add_argument("--url", default="http://127.0.0.1:8025", help="Fake provider base URL")
+    parser.add_argument("--channel", choices=["email", "sms"], default="email")
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=1000.0, help="Client-side rate limit per second")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args.url, args.channel, args.count, args.concurrency, args.rate))
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# Plate Recognition Benchmark Harness
+# Measures accuracy, per-stage latency and throughput of the plate pipeline
+#
+# Usage (from backend-python/):
+#   python -m benchmarks.plate_benchmark --count 200 --workers 4
+#   python -m benchmarks.plate_benchmark --count 50 --save-corpus /tmp/plates --json
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import re
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from app.services.plate_recognition import (
+    recognize_plate,
+    recognize_with_opencv,
+    preprocess_plate_image,
+    find_plate_regions,
+    extract_plate_roi,
+    perform_ocr_on_plate,
+    validate_plate_format
+)
+from benchmarks.plate_corpus import PlateSample, generate_corpus
+
+STAGES = ["preprocess", "region_find", "ocr"]
+
+def normalize_plate(plate_text: Optional[str]) -> str:
+    """Strip separators so ABC-12-34 and ABC1234 compare equal"""
+    return re.sub(r'[^A-Z0-9]', '', (plate_text or "").upper())
+
+def encode_image(image: np.ndarray) -> str:
+    """Encode a BGR image as the base64 data URL accepted by recognize_plate"""
+    ok, buffer = cv2.imencode(".png", image)
+    if not ok:
+        raise ValueError("Could not encode benchmark image")
+    return "data:image/png;base64," + base64.b64encode(buffer.tobytes()).decode()
+
+def run_staged_pipeline(image: np.ndarray) -> Dict[str, Any]:
+    """
+    Run the local OpenCV pipeline stage by stage, timing each stage
+    Mirrors recognize_with_opencv so stage costs can be attributed
+    """
+
+    timings = {}
+
+    start = time.perf_counter()
+    processed = preprocess_plate_image(image)
+    timings["preprocess"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    regions = find_plate_regions(processed)
+    timings["region_find"] = time.perf_counter() - start
+
+    best_text = None
+    best_confidence = 0.0
+
+    start = time.perf_counter()
+    for region in regions:
+        plate_roi = extract_plate_roi(processed, region)
+        plate_text = perform_ocr_on_plate(plate_roi)
+
+        if plate_text:
+            confidence = validate_plate_format(plate_text)
+            if confidence > best_confidence:
+                best_confidence = confidence
+                best_text = plate_text
+    timings["ocr"] = time.perf_counter() - start
+
+    return {
+        "plate_number": best_text,
+        "regions_found": len(regions),
+        "timings": timings
+    }
+
+async def _time_async(coroutine) -> Dict[str, Any]:
+    """Await a recognizer coroutine and attach its wall time"""
+    start = time.perf_counter()
+    result = await coroutine
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+def benchmark_samples(samples: List[PlateSample]) -> Dict[str, Any]:
+    """
+    Benchmark one process worth of samples
+    Returns raw per-sample measurements for aggregation
+    """
+
+    staged_timings = {stage: [] for stage in STAGES}
+    staged_correct = 0
+    regions_found = 0
+
+    opencv_latency = []
+    opencv_correct = 0
+    full_latency = []
+    full_correct = 0
+
+    loop = asyncio.new_event_loop()
+
+    try:
+        for sample in samples:
+            truth = normalize_plate(sample.plate_text)
+
+            # Stage by stage local pipeline
+            staged = run_staged_pipeline(sample.image)
+            for stage in STAGES:
+                staged_timings[stage].append(staged["timings"][stage])
+            if staged["regions_found"]:
+                regions_found += 1
+            if normalize_plate(staged["plate_number"]) == truth:
+                staged_correct += 1
+
+            # recognize_with_opencv as called by recognize_plate
+            opencv_result = loop.run_until_complete(_time_async(recognize_with_opencv(sample.image)))
+            opencv_latency.append(opencv_result["elapsed"])
+            if opencv_result.get("success") and normalize_plate(opencv_result.get("plate_number")) == truth:
+                opencv_correct += 1
+
+            # Full recognize_plate, including base64 decode and text enhancement
+            image_data = encode_image(sample.image)
+            full_result = loop.run_until_complete(_time_async(recognize_plate(image_data)))
+            full_latency.append(full_result["elapsed"])
+            if full_result.get("success") and normalize_plate(full_result.get("plate_number")) == truth:
+                full_correct += 1
+    finally:
+        loop.close()
+
+    return {
+        "samples": len(samples),
+        "staged_timings": staged_timings,
+        "staged_correct": staged_correct,
+        "regions_found": regions_found,
+        "opencv_latency": opencv_latency,
+        "opencv_correct": opencv_correct,
+        "full_latency": full_latency,
+        "full_correct": full_correct
+    }
+
+def _timed_benchmark(samples: List[PlateSample]) -> Dict[str, Any]:
+    """Process pool entry point: benchmark one shard of the corpus"""
+    start = time.perf_counter()
+    measurements = benchmark_samples(samples)
+    measurements["wall_time"] = time.perf_counter() - start
+    return measurements
+
+def _latency_summary(values: List[float]) -> Dict[str, float]:
+    """Summarize latencies in milliseconds"""
+
+    if not values:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0}
+
+    ordered = sorted(values)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[p95_index] * 1000, 3)
+    }
+
+def _merge(shards: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-process measurements"""
+
+    merged = {
+        "samples": 0,
+        "staged_timings": {stage: [] for stage in STAGES},
+        "staged_correct": 0,
+        "regions_found": 0,
+        "opencv_latency": [],
+        "opencv_correct": 0,
+        "full_latency": [],
+        "full_correct": 0
+    }
+
+    for shard in shards:
+        merged["samples"] += shard["samples"]
+        merged["staged_correct"] += shard["staged_correct"]
+        merged["regions_found"] += shard["regions_found"]
+        merged["opencv_correct"] += shard["opencv_correct"]
+        merged["full_correct"] += shard["full_correct"]
+        merged["opencv_latency"].extend(shard["opencv_latency"])
+        merged["full_latency"].extend(shard["full_latency"])
+        for stage in STAGES:
+            merged["staged_timings"][stage].extend(shard["staged_timings"][stage])
+
+    return merged
+
+def run_benchmark(samples: List[PlateSample], workers: int = 1) -> Dict[str, Any]:
+    """
+    Run the benchmark over a corpus, sharded across `workers` processes
+    """
+
+    workers = max(1, min(workers, len(samples)))
+    shards_input = [samples[index::workers] for index in range(workers)]
+
+    start = time.perf_counter()
+    if workers == 1:
+        shards = [_timed_benchmark(samples)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shards = list(executor.map(_timed_benchmark, shards_input))
+    total_wall_time = time.perf_counter() - start
+
+    merged = _merge(shards)
+    sample_count = merged["samples"] or 1
+
+    # Per-core throughput: each worker is pinned to one process, so its own
+    # samples / benchmark time is the single-core rate
+    per_core_rates = [
+        shard["samples"] / sum(shard["full_latency"])
+        for shard in shards if sum(shard["full_latency"]) > 0
+    ]
+
+    return {
+        "corpus": {"count": len(samples), "workers": workers},
+        "accuracy": {
+            "staged_pipeline": round(merged["staged_correct"] / sample_count, 4),
+            "recognize_with_opencv": round(merged["opencv_correct"] / sample_count, 4),
+            "recognize_plate": round(merged["full_correct"] / sample_count, 4),
+            "region_detection_rate": round(merged["regions_found"] / sample_count, 4)
+        },
+        "stage_latency": {
+            stage: _latency_summary(merged["staged_timings"][stage]) for stage in STAGES
+        },
+        "recognize_with_opencv_latency": _latency_summary(merged["opencv_latency"]),
+        "recognize_plate_latency": _latency_summary(merged["full_latency"]),
+        "throughput": {
+            "recognize_plate_images_per_sec_per_core": round(statistics.mean(per_core_rates), 2) if per_core_rates else 0.0,
+            "wall_time_sec": round(total_wall_time, 3),
+            "cpu_count": os.cpu_count()
+        }
+    }
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render the benchmark report as a plain text table"""
+
+    lines = [
+        f"Plate recognition benchmark - {report['corpus']['count']} images, "
+        f"{report['corpus']['workers']} worker(s)",
+        "",
+        "Accuracy",
+    ]
+    for name, value in report["accuracy"].items():
+        lines.append(f"  {name:<28} {value * 100:6.2f}%")
+
+    lines.append("")
+    lines.append(f"{'Latency (ms)':<32} {'mean':>9} {'p50':>9} {'p95':>9}")
+    rows = [(f"stage: {stage}", report["stage_latency"][stage]) for stage in STAGES]
+    rows.append(("recognize_with_opencv", report["recognize_with_opencv_latency"]))
+    rows.append(("recognize_plate", report["recognize_plate_latency"]))
+    for name, summary in rows:
+        lines.append(f"  {name:<30} {summary['mean_ms']:>9} {summary['p50_ms']:>9} {summary['p95_ms']:>9}")
+
+    throughput = report["throughput"]
+    lines.append("")
+    lines.append(f"Throughput: {throughput['recognize_plate_images_per_sec_per_core']} images/sec per core "
+                 f"(wall time {throughput['wall_time_sec']}s, {throughput['cpu_count']} CPUs available)")
+
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local plate recognition pipeline")
+    parser.add_argument("--count", type=int, default=100, help="Number of synthetic images")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus random seed")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (one per core)")
+    parser.add_argument("--save-corpus", metavar="DIR", help="Also write the corpus images and labels to DIR")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    samples = generate_corpus(args.count, seed=args.seed, output_dir=args.save_corpus)
+    report = run_benchmark(samples, workers=args.workers)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# Synthetic Plate Corpus Generator
+# Renders Mexican plate formats onto varied backgrounds for recognition benchmarks
+
+import json
+import os
+import random
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from app.services.plate_recognition import MEXICO_PLATE_PATTERNS
+
+# Corpus rendering configuration
+CORPUS_CONFIG = {
+    "image_size": (800, 600),      # Width, height of the full scene
+    "plate_size": (520, 110),      # Width, height of the rendered plate
+    "plate_scale": (0.35, 0.75),   # Plate width relative to scene width
+    "perspective_jitter": 0.08,    # Max corner displacement relative to plate size
+    "blur_kernels": [1, 3, 5],     # Gaussian blur kernel sizes (1 = no blur)
+    "noise_sigma": (0.0, 18.0),    # Gaussian pixel noise standard deviation
+    "font_candidates": [
+        "DejaVuSans-Bold.ttf",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+        "Arial Bold.ttf",
+        "arialbd.ttf"
+    ]
+}
+
+# Pattern tokens used by MEXICO_PLATE_PATTERNS
+_PATTERN_TOKEN = re.compile(r'\[A-Z\]\{(\d+)\}|\\d\{(\d+)\}|(-)')
+
+_LETTERS = "ABCDEFGHJKLMNPRSTUVWXYZ"  # Mexican plates avoid I, O and Q
+_DIGITS = "0123456789"
+
+@dataclass
+class PlateSample:
+    """Single synthetic scene with its ground truth"""
+    image: np.ndarray              # BGR scene, ready for recognize_with_opencv
+    plate_text: str                # Ground truth, formatted like ABC-12-34
+    pattern: str                   # Source pattern from MEXICO_PLATE_PATTERNS
+    corners: List[Tuple[int, int]] # Plate corners in the scene (tl, tr, br, bl)
+
+def random_plate_text(pattern: str, rng: random.Random) -> str:
+    """
+    Build a random plate string that matches one of MEXICO_PLATE_PATTERNS
+    """
+
+    parts = []
+    for letters, digits, hyphen in _PATTERN_TOKEN.findall(pattern):
+        if letters:
+            parts.append("".join(rng.choice(_LETTERS) for _ in range(int(letters))))
+        elif digits:
+            parts.append("".join(rng.choice(_DIGITS) for _ in range(int(digits))))
+        elif hyphen:
+            parts.append("-")
+
+    plate_text = "".join(parts)
+
+    if not re.match(pattern, plate_text):
+        raise ValueError(f"Unsupported plate pattern: {pattern}")
+
+    return plate_text
+
+def _load_font(size: int) -> ImageFont.ImageFont:
+    """
+    Load the first available bold TrueType font, falling back to PIL default
+    """
+
+    for candidate in CORPUS_CONFIG["font_candidates"]:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except (OSError, IOError):
+            continue
+
+    return ImageFont.load_default()
+
+def _draw_centered(draw: ImageDraw.ImageDraw, center: Tuple[int, int], text: str, fill, font):
+    """
+    Draw text centered on a point; works for the bitmap default font, which has no anchor support
+    """
+
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    x = center[0] - (left + right) / 2
+    y = center[1] - (top + bottom) / 2
+    draw.text((x, y), text, fill=fill, font=font)
+
+def render_plate(plate_text: str, rng: random.Random) -> np.ndarray:
+    """
+    Render a flat plate image (BGR) with border, state header and plate text
+    """
+
+    width, height = CORPUS_CONFIG["plate_size"]
+
+    # Off-white plate body with slight color variation
+    tint = rng.randint(225, 255)
+    plate = Image.new("RGB", (width, height), (tint, tint, rng.randint(215, 255)))
+    draw = ImageDraw.Draw(plate)
+
+    # Border and header band
+    draw.rectangle([3, 3, width - 4, height - 4], outline=(20, 20, 20), width=4)
+    header_font = _load_font(16)
+    _draw_centered(draw, (width // 2, 14), "MEXICO", (120, 20, 20), header_font)
+
+    # Plate characters
+    text_font = _load_font(64)
+    _draw_centered(draw, (width // 2, height // 2 + 10), plate_text, (10, 10, 10), text_font)
+
+    return cv2.cvtColor(np.array(plate), cv2.COLOR_RGB2BGR)
+
+def render_background(rng: random.Random, np_rng: np.random.Generator) -> np.ndarray:
+    """
+    Render a cluttered scene background (BGR): gradient, shapes and texture
+    """
+
+    width, height = CORPUS_CONFIG["image_size"]
+
+    # Vertical gradient between two random colors
+    top = np.array([rng.randint(0, 255) for _ in range(3)], dtype=np.float32)
+    bottom = np.array([rng.randint(0, 255) for _ in range(3)], dtype=np.float32)
+    ramp = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None, None]
+    background = (top * (1 - ramp) + bottom * ramp).repeat(width, axis=1)
+
+    # Random clutter (car body panels, poles, signs)
+    for _ in range(rng.randint(3, 10)):
+        color = tuple(rng.randint(0, 255) for _ in range(3))
+        x1, y1 = rng.randint(0, width), rng.randint(0, height)
+        x2, y2 = x1 + rng.randint(20, 300), y1 + rng.randint(20, 200)
+        cv2.rectangle(background, (x1, y1), (x2, y2), color, thickness=-1)
+
+    # Low frequency texture
+    texture = np_rng.normal(0, 12, (height // 8, width // 8, 3)).astype(np.float32)
+    background += cv2.resize(texture, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    return np.clip(background, 0, 255).astype(np.uint8)
+
+def compose_scene(
+    plate: np.ndarray,
+    background: np.ndarray,
+    rng: random.Random
+) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+    """
+    Warp the plate into the background with a random perspective transform
+    """
+
+    scene_h, scene_w = background.shape[:2]
+    plate_h, plate_w = plate.shape[:2]
+
+    # Target plate size and position
+    target_w = int(scene_w * rng.uniform(*CORPUS_CONFIG["plate_scale"]))
+    target_h = int(target_w * plate_h / plate_w)
+    x0 = rng.randint(0, scene_w - target_w)
+    y0 = rng.randint(0, scene_h - target_h)
+
+    # Jitter each corner for a perspective effect
+    jitter = CORPUS_CONFIG["perspective_jitter"]
+
+    def jittered(x: int, y: int) -> Tuple[float, float]:
+        dx = rng.uniform(-jitter, jitter) * target_w
+        dy = rng.uniform(-jitter, jitter) * target_h
+        return (
+            float(min(max(x + dx, 0), scene_w - 1)),
+            float(min(max(y + dy, 0), scene_h - 1))
+        )
+
+    destination = np.float32([
+        jittered(x0, y0),
+        jittered(x0 + target_w, y0),
+        jittered(x0 + target_w, y0 + target_h),
+        jittered(x0, y0 + target_h)
+    ])
+    source = np.float32([[0, 0], [plate_w, 0], [plate_w, plate_h], [0, plate_h]])
+
+    transform = cv2.getPerspectiveTransform(source, destination)
+    warped = cv2.warpPerspective(plate, transform, (scene_w, scene_h))
+    mask = cv2.warpPerspective(
+        np.full((plate_h, plate_w), 255, dtype=np.uint8),
+        transform,
+        (scene_w, scene_h)
+    )
+
+    scene = background.copy()
+    scene[mask > 0] = warped[mask > 0]
+
+    corners = [(int(x), int(y)) for x, y in destination]
+    return scene, corners
+
+def degrade_scene(scene: np.ndarray, rng: random.Random, np_rng: np.random.Generator) -> np.ndarray:
+    """
+    Apply camera-like degradation: blur and gaussian noise
+    """
+
+    kernel = rng.choice(CORPUS_CONFIG["blur_kernels"])
+    if kernel > 1:
+        scene = cv2.GaussianBlur(scene, (kernel, kernel), 0)
+
+    sigma = rng.uniform(*CORPUS_CONFIG["noise_sigma"])
+    if sigma > 0:
+        noise = np_rng.normal(0, sigma, scene.shape).astype(np.float32)
+        scene = np.clip(scene.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+    return scene
+
+def generate_sample(rng: random.Random, np_rng: np.random.Generator) -> PlateSample:
+    """
+    Generate one synthetic plate scene with ground truth
+    """
+
+    pattern = rng.choice(MEXICO_PLATE_PATTERNS)
+    plate_text = random_plate_text(pattern, rng)
+
+    plate = render_plate(plate_text, rng)
+    background = render_background(rng, np_rng)
+    scene, corners = compose_scene(plate, background, rng)
+    scene = degrade_scene(scene, rng, np_rng)
+
+    return PlateSample(image=scene, plate_text=plate_text, pattern=pattern, corners=corners)
+
+def generate_corpus(
+    count: int,
+    seed: int = 0,
+    output_dir: Optional[str] = None
+) -> List[PlateSample]:
+    """
+    Generate a reproducible corpus of synthetic plate scenes
+    Optionally writes PNG images plus a labels.json manifest to output_dir
+    """
+
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+
+    samples = [generate_sample(rng, np_rng) for _ in range(count)]
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        labels = []
+
+        for index, sample in enumerate(samples):
+            filename = f"plate_{index:05d}.png"
+            cv2.imwrite(os.path.join(output_dir, filename), sample.image)
+            labels.append({
+                "file": filename,
+                "plate_text": sample.plate_text,
+                "pattern": sample.pattern,
+                "corners": sample.corners
+            })
+
+        with open(os.path.join(output_dir, "labels.json"), "w") as labels_file:
+            json.dump(labels, labels_file, indent=2)
+
+    return samples
@@ -10,12 +10,24 @@ from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 import time
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.core.database import engine, create_db_and_tables
-from app.core.redis_client import redis_client
+from app.core.redis_client import redis_client, listen_for_cache_invalidations, cache_stats
+from app.core.revocation import revocation_registry
+from app.core.rate_limit import rate_limiter
+from app.core.realtime import realtime_hub
+from app.services.plate_authorization import listen_for_plate_updates
+from app.services.notification_preferences import listen_for_preference_updates
+from app.services.qr_persistence import run_qr_token_writer
+from app.services.qr_service import shutdown_render_pool
+from app.services.notification_outbox import run_notification_dispatcher
+from app.services.notification_service import close_notification_clients
+from app.services.alert_digest import run_alert_digest_flusher
+from app.services.email_templates import email_templates
 from app.api.v1.api import api_router
 from app.core.security import get_current_user
 from app.core.exceptions import (
@@ -43,18 +55,39 @@ async def lifespan(app: FastAPI):
     await create_db_and_tables()
     logger.info("Database initialized successfully")
     
-    # Test Redis connection
+    # Create the shared Redis pool before anything uses it
     try:
-        await redis_client.ping()
+        await redis_client.connect()
         logger.info("Redis connection established")
     except Exception as e:
+        # The pool reconnects on demand once Redis is reachable
         logger.error(f"Redis connection failed: {e}")
     
+    # Compile email templates once
+    logger.info(f"Loaded {email_templates.load()} email templates")
+    
+    # Start background listeners
+    background_tasks = [
+        asyncio.create_task(listen_for_plate_updates()),
+        asyncio.create_task(listen_for_preference_updates()),
+        asyncio.create_task(revocation_registry.run()),
+        asyncio.create_task(realtime_hub.run()),
+        asyncio.create_task(listen_for_cache_invalidations()),
+        asyncio.create_task(run_qr_token_writer()),
+        asyncio.create_task(run_notification_dispatcher()),
+        asyncio.create_task(run_alert_digest_flusher())
+    ]
+    
     logger.info("AXS360 API Server started successfully")
     yield
     
     # Shutdown
     logger.info("Shutting down AXS360 API Server...")
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await close_notification_clients()
+    shutdown_render_pool()
     await redis_client.close()
     logger.info("AXS360 API Server shut down successfully")
 
@@ -99,25 +132,25 @@ async def add_process_time_header(request: Request, call_next):
 # Rate Limiting Middleware
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
-    if request.url.path.startswith("/api/"):
-        client_ip = request.client.host
-        key = f"rate_limit:{client_ip}"
-        
-        try:
-            current = await redis_client.get(key)
-            if current is None:
-                await redis_client.setex(key, 60, 1)
-            else:
-                current_count = int(current)
-                if current_count >= settings.RATE_LIMIT_PER_MINUTE:
-                    raise RateLimitException("Rate limit exceeded")
-                await redis_client.incr(key)
-        except Exception as e:
-            if isinstance(e, RateLimitException):
-                raise
-            logger.warning(f"Rate limiting error: {e}")
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
     
-    return await call_next(request)
+    # Most requests are answered by the per-worker bucket, the rest by one Redis call; fails open
+    result = await rate_limiter.check(request)
+    if result is not None and not result.allowed:
+        return JSONResponse(
+            status_code=429,
+            content={
+                "error": "Rate Limit Exceeded",
+                "message": "Rate limit exceeded"
+            },
+            headers=result.headers()
+        )
+    
+    response = await call_next(request)
+    if result is not None:
+        response.headers.update(result.headers())
+    return response
 
 # Exception Handlers
 @app.exception_handler(ValidationException)
@@ -208,7 +241,10 @@ async def health_check():
             "services": {
                 "database": "healthy",
                 "redis": "healthy"
-            }
+            },
+            "cache": cache_stats(),
+            "redis_pool": redis_client.pool_stats(),
+            "rate_limit": rate_limiter.stats()
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
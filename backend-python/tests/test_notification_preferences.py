@@ -0,0 +1,84 @@
+"""
+Preference resolution for visitors linked to a registered user
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import notification_preferences
+
+class FakeRedis:
+    """Nothing saved through the API, so only the profile column applies"""
+
+    async def get(self, key):
+        return None
+
+    async def mget(self, keys):
+        return [None] * len(keys)
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+class FakeSession:
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self.queried_ids = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement):
+        ids = list(statement.compile().params.values())[0]
+        self.queried_ids.extend(ids)
+        # Postgres returns users.id as an integer
+        return FakeResult([(user_id, self.profiles[user_id]) for user_id in ids if user_id in self.profiles])
+
+@pytest.fixture
+def session(monkeypatch):
+    fake_session = FakeSession({42: {"sms_notifications": False}, 7: None})
+    monkeypatch.setattr(notification_preferences, "get_redis", lambda: FakeRedis())
+    monkeypatch.setattr(notification_preferences, "async_session", lambda: fake_session)
+    notification_preferences._local_prefs.clear()
+    notification_preferences._local_profiles.clear()
+    return fake_session
+
+@pytest.fixture
+def business():
+    return SimpleNamespace(
+        settings={"email_notifications": True, "sms_notifications": True, "push_notifications": True},
+        timezone="UTC"
+    )
+
+@pytest.mark.asyncio
+async def test_resolve_preferences_applies_profile_for_registered_visitor(session, business):
+    visitor = SimpleNamespace(user_id="42")
+
+    resolved = await notification_preferences.resolve_preferences(business, visitor.user_id)
+
+    assert session.queried_ids == [42]
+    assert resolved["channels"] == ["email", "push"]
+
+@pytest.mark.asyncio
+async def test_resolve_preferences_many_keys_profiles_by_visitor_user_id(session, business):
+    resolved = await notification_preferences.resolve_preferences_many(business, ["42", "7", "guest"])
+
+    assert sorted(session.queried_ids) == [7, 42]
+    assert resolved["42"]["channels"] == ["email", "push"]
+    # No profile and nothing saved: the business setting decides, SMS included
+    assert resolved["7"]["channels"] == ["email", "sms", "push"]
+    assert resolved["guest"]["channels"] == ["email", "sms", "push"]
+
+@pytest.mark.asyncio
+async def test_profile_is_cached_after_first_load(session, business):
+    await notification_preferences.resolve_preferences(business, "42")
+    await notification_preferences.resolve_preferences(business, "42")
+
+    assert session.queried_ids == [42]